@@ -0,0 +1,69 @@
+"""
+Microbenchmark: escape_md vs. the previous per-character implementation.
+
+Run from the repository root:
+    python -m benchmarks.bench_escape_md [--number N]
+
+Speedups measured here: about 11x on a long diary entry, 5-7x on names and
+plain sentences, about 3x on short punctuated mantras and 2x on numbers. On
+short strings the per-call cost of str() and the function call dominates.
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+# Let `python benchmarks/bench_escape_md.py` find the src package too
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.data import MANTRAS_DATA
+from src.utils.utils import _ESCAPE_CHARS, escape_md
+
+
+def legacy_escape_md(text: object) -> str:
+    """The character-by-character escape_md this module replaced (including its skip bug)."""
+    text_str = str(text)
+    escaped: list[str] = []
+    prev_was_escape = False
+    for ch in text_str:
+        if ch in _ESCAPE_CHARS and not prev_was_escape:
+            escaped.append(f"\\{ch}")
+            prev_was_escape = True
+        else:
+            escaped.append(ch)
+            prev_was_escape = (ch == "\\")
+    return ''.join(escaped)
+
+
+DIARY_ENTRY = (
+    "Сегодня утром я встретил восход у реки, поблагодарил предков и Хуыцау за новый день. "
+    "Фарн уæ хæдзары! Днём помог соседу (починили забор), вечером записал мысли в дневник - "
+    "спокойно и светло."
+)
+
+CASES = {
+    "names/cities": ["Алан", "Заурбек", "Владикавказ", "Дзæуджыхъæу", "Неизвестно"],
+    "numbers": [0, 7, 42, 1500],
+    "mantras": [text for _, text, _ in MANTRAS_DATA] + [tr for _, _, tr in MANTRAS_DATA if tr],
+    "plain sentence": ["Сегодня был тихий день у реки и благодарность семье"],
+    "diary entry": [DIARY_ENTRY],
+    "long diary": [DIARY_ENTRY * 10],
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000, help="passes over each case")
+    args = parser.parse_args()
+
+    print(f"{'case':<16} {'legacy, us':>11} {'escape_md, us':>14} {'speedup':>8}")
+    for name, texts in CASES.items():
+        legacy = min(timeit.repeat(lambda: [legacy_escape_md(t) for t in texts], number=args.number, repeat=5))
+        current = min(timeit.repeat(lambda: [escape_md(t) for t in texts], number=args.number, repeat=5))
+        per_call = args.number * len(texts)
+        print(f"{name:<16} {legacy / per_call * 1e6:>11.2f} {current / per_call * 1e6:>14.2f} "
+              f"{legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
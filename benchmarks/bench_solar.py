@@ -0,0 +1,50 @@
+"""
+Benchmark: vectorized NOAA sunrise/sunset vs. get_sun_times in a loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_solar [--locations N] [--days D]
+"""
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from src.utils.solar import sun_events
+from src.utils.utils import get_sun_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--locations", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    # get_sun_times logs every event astral cannot place on the UTC date
+    logging.getLogger("src.utils.utils").setLevel(logging.CRITICAL)
+
+    rng = np.random.default_rng(1853)
+    lats = rng.uniform(-60.0, 60.0, args.locations)
+    lons = rng.uniform(-180.0, 180.0, args.locations)
+    first = date(2026, 1, 1)
+    days = [first + timedelta(days=i) for i in range(args.days)]
+
+    started = time.perf_counter()
+    for lat, lon in zip(lats, lons):
+        for day in days:
+            get_sun_times(float(lat), float(lon), "UTC", target_date=day)
+    loop_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    events = sun_events(lats[:, None], lons[:, None], np.array(days, dtype="datetime64[D]")[None, :])
+    vector_time = time.perf_counter() - started
+
+    pairs = args.locations * args.days
+    print(f"{pairs} location-days")
+    print(f"get_sun_times loop: {loop_time:8.3f}s ({loop_time / pairs * 1e6:7.1f} us each)")
+    print(f"sun_events:         {vector_time:8.3f}s ({vector_time / pairs * 1e6:7.1f} us each)")
+    print(f"speedup: {loop_time / vector_time:.0f}x, events shape {events.sunrise.shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: precompiled message templates vs. string concatenation.
+
+Run from the repository root:
+    python -m benchmarks.bench_templates [--number N]
+"""
+import argparse
+import os
+import timeit
+from datetime import date, datetime
+
+# src.config.config refuses to import without a token; nothing here talks to Telegram
+os.environ.setdefault("API_TOKEN", "123456:BENCHMARK")
+
+from benchmarks.legacy_messages import legacy_daily_plan, legacy_diary, legacy_group_stats, legacy_user_stats
+from src.bot import messages
+from src.database.models import DiaryEntry, GroupStats, UserStats
+
+PLAN_ARGS = (
+    date(2026, 3, 9), "Владикавказ", "06:41", "18:12",
+    "Хорз уæд! Фарн уæ хæдзары (æмæ бонæй-бонмæ).", "Бузныг, Хуыцау, ацы бонæн.",
+    {"mindfulness": True, "nature": False, "service": True},
+)
+USER_STATS = UserStats(days_active=5, diary_entries=3, tasks_done_total=11,
+                       categories_done={"mindfulness": 5, "nature": 2, "service": 4}, streak=4)
+GROUP_STATS = GroupStats(total_users_active=1280, total_tasks_done=5731,
+                         categories_done={"mindfulness": 2500, "nature": 0, "service": 3231})
+DIARY = [
+    DiaryEntry(entry_id=i, user_id=1, timestamp=datetime(2026, 3, i + 1, 21, 15),
+               entry_text="Сегодня был тихий день. Прогулка у реки (1.5 км), благодарность семье!")
+    for i in range(5)
+]
+
+CASES = {
+    "daily_plan": (lambda: legacy_daily_plan(*PLAN_ARGS), lambda: messages.render_daily_plan(*PLAN_ARGS)),
+    "user_stats": (lambda: legacy_user_stats(USER_STATS), lambda: messages.render_user_stats(USER_STATS)),
+    "group_stats": (lambda: legacy_group_stats(GROUP_STATS), lambda: messages.render_group_stats(GROUP_STATS)),
+    "diary": (lambda: legacy_diary(DIARY), lambda: messages.render_diary(DIARY)),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000, help="renders per measurement")
+    args = parser.parse_args()
+
+    print(f"{'message':<12} {'concat, us':>11} {'template, us':>13} {'speedup':>8}")
+    for name, (legacy, compiled) in CASES.items():
+        assert legacy() == compiled()
+        legacy_time = min(timeit.repeat(legacy, number=args.number, repeat=5)) / args.number
+        compiled_time = min(timeit.repeat(compiled, number=args.number, repeat=5)) / args.number
+        print(f"{name:<12} {legacy_time * 1e6:>11.2f} {compiled_time * 1e6:>13.2f} "
+              f"{legacy_time / compiled_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
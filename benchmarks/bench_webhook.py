@@ -0,0 +1,106 @@
+"""
+Benchmark: webhook server under a local fake Telegram client.
+
+Starts WebhookServer on localhost with a stub handler that simulates work,
+posts updates from concurrent connections the way Telegram does and reports
+acknowledgement latency, throughput and processing latency.
+
+Run from the repository root:
+    python -m benchmarks.bench_webhook [--updates N] [--concurrency C] [--handler-ms MS]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+
+# src.config.config refuses to import without a token; nothing here talks to Telegram
+os.environ.setdefault("API_TOKEN", "123456:BENCHMARK")
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+
+from src.bot.webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "benchmark-secret"
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "🗓️ План дня",
+            "chat": {"id": update_id % 500, "type": "private"},
+            "from": {"id": update_id % 500, "is_bot": False, "first_name": "Алан"},
+        },
+    }
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def run(updates: int, concurrency: int, handler_ms: float, workers: int, queue_size: int) -> None:
+    bot = Bot("123456:BENCHMARK")
+    dp = Dispatcher()
+
+    async def handler(message: Message):
+        await asyncio.sleep(handler_ms / 1000)
+
+    dp.message.register(handler)
+    server = WebhookServer(dp, bot, {
+        "base_url": "", "path": "/telegram/webhook", "host": "127.0.0.1", "port": 0,
+        "secret_token": SECRET, "queue_size": queue_size, "workers": workers,
+        "drain_timeout": 60.0, "drop_pending_updates": True,
+    })
+    await server.start(register_webhook=False)
+    url = f"http://127.0.0.1:{server.port}/telegram/webhook"
+
+    ack_latencies = []
+    statuses = {}
+    pending = iter(range(updates))
+
+    async def client(session: aiohttp.ClientSession) -> None:
+        for update_id in pending:
+            started = time.perf_counter()
+            async with session.post(url, json=make_update(update_id), headers={SECRET_HEADER: SECRET}) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            ack_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    posted = time.perf_counter() - started
+    await server.stop()
+    drained = time.perf_counter() - started
+    await bot.session.close()
+
+    stats = server.get_stats()
+    print(f"{updates} updates, {concurrency} connections, handler {handler_ms} ms, {workers} workers")
+    print(f"statuses: {statuses}")
+    print(f"ack latency: p50 {percentile(ack_latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(ack_latencies, 99) * 1000:.2f} ms")
+    print(f"accepted {updates / posted:.0f} updates/s; all processed after {drained:.2f}s")
+    print(f"receipt-to-done latency: p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=40, help="Telegram uses up to 40 connections by default")
+    parser.add_argument("--handler-ms", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    args = parser.parse_args()
+    # aiogram logs every handled update at INFO
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args.updates, args.concurrency, args.handler_ms, args.workers, args.queue_size))
+
+
+if __name__ == "__main__":
+    main()
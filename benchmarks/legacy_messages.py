@@ -0,0 +1,78 @@
+"""
+String-concatenation message builders used before precompiled templates.
+
+Kept as the baseline for benchmarks/bench_templates.py and as the reference
+the template tests compare against byte for byte. The plan's practice lines
+are no longer pre-escaped, since escape_md now escapes backslashes.
+"""
+from src.config.config import ACTIVITY_CATEGORIES, CATEGORY_EMOJI_MAP, CATEGORY_NAMES_MAP
+from src.utils.utils import escape_md
+
+
+def legacy_daily_plan(day, city, sunrise_str, sunset_str, morning_text, evening_text, activity_status):
+    rings = []
+    for cat_code in ACTIVITY_CATEGORIES:
+        emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
+        cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
+        completed = activity_status.get(cat_code, False)
+        rings.append(f"{emoji} {('🟢' if completed else '⚪️')} {escape_md(cat_name)}")
+    rings_text = " \\| ".join(rings) if rings else escape_md("Активность не записана")
+
+    plan_text = f"🗓️ *План на {escape_md(day.strftime('%d.%m'))}* \\({escape_md(city)}\\)\n\n"
+    plan_text += f"☀️ Восход: `{escape_md(sunrise_str)}` \\| 🌙 Закат: `{escape_md(sunset_str)}`\n\n"
+    plan_text += f"🌅 *Утро \\(до ~12:00\\)*\n"
+    if morning_text:
+        plan_text += f"   _{escape_md(morning_text)}_\n"
+    plan_text += escape_md("   Практика: Настройся на день с благодарностью.\n\n")
+    plan_text += f"🌍 *День*\n"
+    plan_text += escape_md("   ⚡ Практика: Выполни ежедневную задачу.\n")
+    plan_text += f"   🎯 Отметь выполнение категорий ниже:\n\n"
+    plan_text += f"🌃 *Вечер \\(после ~18:00\\)*\n"
+    if evening_text:
+        plan_text += f"   _{escape_md(evening_text)}_\n"
+    plan_text += escape_md("   🧘 Практика: Заверши день рефлексией в '✍️ Дневник'.\n\n")
+    plan_text += f"💚 *Прогресс дня:*\n   {rings_text}"
+    return plan_text
+
+
+def legacy_user_stats(stats):
+    stats_text = f"📊 *Твоя статистика за 7 дней:*\n\n"
+    stats_text += f"☀️ Активных дней: *{escape_md(stats.days_active)}* из 7\n"
+    stats_text += f"✍️ Записей в дневнике: *{escape_md(stats.diary_entries)}*\n"
+    stats_text += f"🔥 Текущий стрик: *{escape_md(stats.streak)}* дня\\(ей\\)\n\n"
+    stats_text += f"🎯 *Выполнено практик по категориям:*\n"
+    for cat_code in ACTIVITY_CATEGORIES:
+        count = stats.categories_done.get(cat_code, 0)
+        emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
+        cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
+        stats_text += f"   {emoji} {escape_md(cat_name)}: *{escape_md(count)}*\n"
+    stats_text += f"\n📈 Общее число выполненных практик: *{escape_md(stats.tasks_done_total)}*"
+    return stats_text
+
+
+def legacy_group_stats(stats):
+    response = f"🌍 *Статистика сообщества за 7 дней:*\n\n"
+    response += f"👥 Активных участников: *{escape_md(stats.total_users_active)}*\n\n"
+    response += f"🎯 *Всего выполнено практик:*\n"
+    for cat_code in ACTIVITY_CATEGORIES:
+        count = stats.categories_done.get(cat_code, 0)
+        if count > 0:
+            emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
+            cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
+            response += f"   {emoji} {escape_md(cat_name)}: *{escape_md(count)}*\n"
+    response += f"\n📈 Общее число практик: *{escape_md(stats.total_tasks_done)}*"
+    return response
+
+
+def legacy_diary(entries):
+    response_text = escape_md("📖 Ваши последние 5 записей:\n")
+    for entry in reversed(entries):
+        try:
+            ts_formatted = entry.timestamp.strftime('%d.%m.%y %H:%M')
+        except (ValueError, TypeError):
+            ts_formatted = str(entry.timestamp)
+        response_text += f"\n*{escape_md(ts_formatted)}*\n"
+        response_text += f"{escape_md(entry.entry_text)}\n"
+    if len(response_text) > 4090:
+        response_text = response_text[:4090] + "\n" + escape_md("...")
+    return response_text
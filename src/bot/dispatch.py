@@ -0,0 +1,112 @@
+"""
+Per-user update lanes for FarnPathBot.
+
+Updates are sharded by the sending user onto lanes: one user's updates are
+handled strictly one after another in arrival order, while different users'
+updates run in parallel, bounded by a global concurrency limit. The lane is
+entered before the FSM state is loaded, so a state change made by one update
+is seen by the user's next update.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, User
+
+from src.config.config import DISPATCH_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+class _Lane:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Updates of this user in the lane, including the one being handled
+        self.pending = 0
+
+
+class UserLaneMiddleware(BaseMiddleware):
+    """Outer update middleware: ordered per-user lanes, parallel across users."""
+
+    def __init__(self, settings: Dict[str, Any] = DISPATCH_SETTINGS):
+        self.max_concurrency = settings["max_concurrency"]
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._lanes: Dict[int, _Lane] = {}
+        self.in_flight = 0
+        self.processed = 0
+        self.max_backlog = 0
+        # Seconds from arrival to the start of handling, for the latest updates
+        self._waits: Deque[float] = deque(maxlen=1024)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        arrived = asyncio.get_running_loop().time()
+        if user is None:
+            return await self._handle(handler, event, data, arrived)
+
+        lane = self._lanes.get(user.id)
+        if lane is None:
+            lane = self._lanes[user.id] = _Lane()
+        lane.pending += 1
+        self.max_backlog = max(self.max_backlog, lane.pending - 1)
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, which keeps the user's updates in order
+            async with lane.lock:
+                return await self._handle(handler, event, data, arrived)
+        finally:
+            lane.pending -= 1
+            if lane.pending == 0:
+                del self._lanes[user.id]
+
+    async def _handle(self, handler, event: TelegramObject, data: Dict[str, Any], arrived: float) -> Any:
+        async with self._semaphore:
+            self._waits.append(asyncio.get_running_loop().time() - arrived)
+            self.in_flight += 1
+            try:
+                return await handler(event, data)
+            finally:
+                self.in_flight -= 1
+                self.processed += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lane backlog, concurrency and queueing delay metrics."""
+        backlogs = [lane.pending - 1 for lane in self._lanes.values()]
+        waits = sorted(self._waits)
+        stats: Dict[str, Any] = {
+            "lanes": len(backlogs),
+            "backlog": sum(backlogs),
+            "max_lane_backlog": max(backlogs, default=0),
+            "max_backlog_seen": self.max_backlog,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "processed": self.processed,
+        }
+        for p in (50, 99):
+            stats[f"wait_p{p}_ms"] = waits[min(len(waits) - 1, int(p / 100 * len(waits)))] * 1000 if waits else 0.0
+        return stats
+
+
+def register_before_fsm(dispatcher: Dispatcher, *middlewares: BaseMiddleware) -> None:
+    """
+    Add outer update middlewares after aiogram's user context and before its FSM middleware.
+
+    Anything registered with dp.update.outer_middleware() normally runs after
+    the FSM state has been read.
+    """
+    manager = dispatcher.update.outer_middleware
+    fsm_registered = dispatcher.fsm in manager
+    if fsm_registered:
+        manager.unregister(dispatcher.fsm)
+    for middleware in middlewares:
+        manager.register(middleware)
+    if fsm_registered:
+        manager.register(dispatcher.fsm)
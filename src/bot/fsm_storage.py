@@ -0,0 +1,252 @@
+"""
+Persistent FSM storage for FarnPathBot.
+
+SQLiteStorage keeps aiogram FSM states and data in the fsm_state table so a
+user halfway through a diary entry is still there after a restart. Reads and
+writes go to an in-memory LRU cache; changed keys are written back in batches
+(one write unit through the group-commit queue) every flush_interval_ms or
+once flush_batch_size keys are dirty, and on close. States not used (read or
+changed) for ttl_seconds expire; expired rows are purged by a scheduled job.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from src.config.config import FSM_STORAGE_SETTINGS
+from src.database.instrumentation import spawn_detached
+from src.database.queries import QueryCatalog, query_catalog
+
+logger = logging.getLogger(__name__)
+
+
+def key_to_str(key: StorageKey) -> str:
+    """Compact text form of a storage key, used as the table's primary key."""
+    return ":".join((
+        str(key.bot_id), str(key.chat_id), str(key.user_id),
+        str(key.thread_id or ""), key.business_connection_id or "", key.destiny,
+    ))
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    expires_at: float = float("inf")
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+@dataclass
+class FSMStorageStats:
+    """Counters of the FSM storage."""
+    hits: int = 0
+    misses: int = 0
+    flushes: int = 0
+    flushed_keys: int = 0
+    failed_flushes: int = 0
+    expired: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Cache hits and misses, write-back and expiry counts."""
+        return dict(self.__dict__)
+
+
+class SQLiteStorage(BaseStorage):
+    """aiogram FSM storage on the fsm_state table with a write-back LRU cache."""
+
+    def __init__(
+        self,
+        catalog: QueryCatalog = query_catalog,
+        settings: Dict[str, Any] = FSM_STORAGE_SETTINGS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.catalog = catalog
+        self.settings = settings
+        self.clock = clock
+        self.stats = FSMStorageStats()
+        self._cache: "OrderedDict[str, _Record]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        # Keys being written back; like dirty keys they must stay cached
+        self._flushing: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def _get(self, key: StorageKey) -> Tuple[str, _Record]:
+        """Cached record of a key, loaded from the table on a miss."""
+        skey = key_to_str(key)
+        now = self.clock()
+        record = self._cache.get(skey)
+        if record is not None:
+            self.stats.hits += 1
+            self._cache.move_to_end(skey)
+            if record.expires_at <= now:
+                self.stats.expired += 1
+                record = self._cache[skey] = _Record()
+        else:
+            self.stats.misses += 1
+            row = await self.catalog.fetch_one("fsm_load", (skey, int(now)))
+            # A concurrent load of the same key may have finished first
+            record = self._cache.get(skey)
+            if record is None:
+                record = _Record(row[0], json.loads(row[1]) if row[1] else {}, row[2]) if row else _Record()
+                self._evict(reserve=1)
+                self._cache[skey] = record
+        # Reading a state keeps it alive too; the new expiry is only written back
+        # once less than half of the TTL is left, so most reads stay writes-free
+        if not record.empty and record.expires_at - now < self.settings["ttl_seconds"] / 2:
+            self._changed(skey, record)
+        return skey, record
+
+    def _changed(self, skey: str, record: _Record) -> None:
+        """Mark a record dirty and schedule its write-back."""
+        record.expires_at = self.clock() + self.settings["ttl_seconds"]
+        self._dirty.add(skey)
+        self._ensure_running()
+        if len(self._dirty) >= self.settings["flush_batch_size"]:
+            self._wakeup.set()
+
+    def _evict(self, reserve: int = 0) -> None:
+        """Drop least recently used clean records beyond cache_size (leaving room for `reserve` more)."""
+        excess = len(self._cache) + reserve - self.settings["cache_size"]
+        if excess <= 0:
+            return
+        pinned = self._dirty | self._flushing
+        for skey in list(islice((skey for skey in self._cache if skey not in pinned), excess)):
+            del self._cache[skey]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        skey, record = await self._get(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._changed(skey, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._get(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        # Fail here, in the handler that stored it, rather than later in the flusher
+        json.dumps(data, ensure_ascii=False)
+        skey, record = await self._get(key)
+        record.data = data.copy()
+        self._changed(skey, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, record = await self._get(key)
+        return record.data.copy()
+
+    def _ensure_running(self) -> None:
+        """Make sure a write-back task is running on the current loop before a change is queued."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = spawn_detached(self._run(), name="fsm-storage-flusher")
+
+    async def _run(self) -> None:
+        """Flush dirty records every flush_interval_ms, or sooner when a batch fills up."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.settings["flush_interval_ms"] / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all dirty records back in one unit. Returns the number of keys written."""
+        if not self._dirty:
+            return 0
+        keys, self._dirty = self._dirty, set()
+        self._flushing = keys
+        try:
+            statements: List[Tuple[str, tuple]] = []
+            for skey in list(keys):
+                record = self._cache[skey]
+                if record.empty:
+                    statements.append(("fsm_delete", (skey,)))
+                    continue
+                try:
+                    data = json.dumps(record.data, ensure_ascii=False) if record.data else None
+                except (TypeError, ValueError) as e:
+                    # Data mutated in place after set_data; retrying would fail the same way
+                    keys.discard(skey)
+                    logger.error(f"FSM data of {skey} is not JSON-serializable, not persisted: {e}")
+                    continue
+                statements.append(("fsm_save", (skey, record.state, data, int(record.expires_at))))
+            if statements:
+                await self.catalog.execute_unit(statements)
+        except asyncio.CancelledError:
+            self._dirty |= keys
+            raise
+        except Exception as e:
+            # Keep them dirty; the next flush retries with their latest values
+            self._dirty |= keys
+            self.stats.failed_flushes += 1
+            logger.error(f"FSM state flush of {len(keys)} keys failed: {e}")
+            return 0
+        finally:
+            self._flushing = set()
+        self.stats.flushes += 1
+        self.stats.flushed_keys += len(keys)
+        self._evict()
+        return len(keys)
+
+    async def purge_expired(self) -> int:
+        """Delete expired states from the table and the cache."""
+        now = self.clock()
+        result = await self.catalog.execute("fsm_purge_expired", (int(now),))
+        for skey in [skey for skey, record in self._cache.items() if record.expires_at <= now]:
+            if skey not in self._dirty:
+                del self._cache[skey]
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired FSM states")
+        return result.rowcount
+
+    def register_jobs(self, scheduler) -> None:
+        """Add the periodic purge of expired states to an AsyncIOScheduler."""
+        scheduler.add_job(
+            self._purge_safely, 'interval',
+            minutes=self.settings["purge_interval_minutes"], id="fsm_state_purge",
+        )
+
+    async def _purge_safely(self) -> None:
+        """Purge job; a failed purge is logged and retried on the next interval."""
+        try:
+            await self.purge_expired()
+        except Exception as e:
+            logger.error(f"FSM state purge failed: {e}")
+
+    async def close(self) -> None:
+        """Stop the flusher and write back everything that is still dirty."""
+        if self._task is not None:
+            if self._loop is asyncio.get_running_loop():
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def clear(self) -> None:
+        """Forget cached records (dirty ones are lost; flush first)."""
+        self._cache.clear()
+        self._dirty.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get counters and cache occupancy."""
+        stats = self.stats.as_dict()
+        stats["cached"] = len(self._cache)
+        stats["dirty"] = len(self._dirty)
+        return stats
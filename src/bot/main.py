@@ -16,24 +16,44 @@ import pytz
 from aiogram import Bot, Dispatcher, F
 from aiogram.client.default import DefaultBotProperties
 from aiogram.filters import Command, StateFilter
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import (
-    Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton,
-    ReplyKeyboardMarkup, KeyboardButton, ContentType, WebAppInfo
-)
-from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message, CallbackQuery, ContentType, InaccessibleMessage
+from aiogram.exceptions import TelegramBadRequest
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from src.config.config import API_TOKEN, GEOPY_USER_AGENT, ACTIVITY_CATEGORIES, CATEGORY_EMOJI_MAP, CATEGORY_NAMES_MAP
+from src.config.config import (
+    API_TOKEN, BOT_MODE, CATEGORY_NAMES_MAP,
+    QUERY_CATALOG_SETTINGS
+)
+from src.database.caches import purge_expired_caches
+from src.database.community import community_aggregator
 from src.database.connection import db_manager
+from src.database.instrumentation import query_budget
+from src.database.maintenance import db_maintenance
+from src.database.mantra_catalog import mantra_catalog
+from src.database.migrations import run_migrations
+from src.database.queries import query_catalog
+from src.database.snapshot import analytics_snapshot
+from src.database.write_queue import write_queue
 from src.database.repository import (
     UserRepository, ActivityRepository, MantraRepository, 
     DiaryRepository, StatsRepository
 )
-from src.utils.utils import escape_md, get_sun_times
-from src.utils.keyboards import get_main_menu_keyboard
+from src.bot.messages import (
+    render_daily_plan, render_diary, render_group_stats, render_user_stats, replace_progress_rings
+)
+from src.bot.dispatch import UserLaneMiddleware, register_before_fsm
+from src.bot.fsm_storage import SQLiteStorage
+from src.bot.outbound import OutboundMiddleware, outbound_queue
+from src.bot.throttling import ThrottlingMiddleware
+from src.bot.webhook import WebhookServer
+from src.utils.sun_times import sun_times_service
+from src.utils.utils import escape_md
+from src.database.models import mask_to_status, status_to_mask
+from src.utils.keyboards import (
+    GROUP_STATS, LOCATION_REQUEST, REMOVE, PrebuiltPayloadSession, get_main_menu_keyboard, keyboard_registry
+)
 
 # Configure logging
 logging.basicConfig(
@@ -46,9 +66,20 @@ logger = logging.getLogger(__name__)
 if not API_TOKEN:
     raise ValueError("API_TOKEN not found in environment variables")
 
-bot = Bot(token=API_TOKEN, default=DefaultBotProperties(parse_mode="MarkdownV2"))
-storage = MemoryStorage()
+bot = Bot(
+    token=API_TOKEN,
+    session=PrebuiltPayloadSession(),
+    default=DefaultBotProperties(parse_mode="MarkdownV2")
+)
+# Replies and notifications go out through the flood-controlled outbound queue
+bot.session.middleware(OutboundMiddleware(outbound_queue))
+# FSM states survive restarts; the cache keeps lookups in memory. The dispatcher's
+# shutdown hook closes the storage, writing back unflushed states
+storage = SQLiteStorage()
 dp = Dispatcher(storage=storage)
+# Flooders are dropped first; the rest wait in their user's lane, ahead of the FSM state read
+user_lanes = UserLaneMiddleware()
+register_before_fsm(dp, ThrottlingMiddleware(), user_lanes)
 scheduler = AsyncIOScheduler(timezone="UTC")
 
 # FSM States
@@ -57,6 +88,7 @@ class DiaryStates(StatesGroup):
 
 # Handlers
 @dp.message(Command("start"))
+@query_budget(1)
 async def handle_start(message: Message, state: FSMContext):
     """Handle /start command."""
     user_id = message.from_user.id
@@ -78,6 +110,7 @@ async def handle_start(message: Message, state: FSMContext):
         await message.answer("Произошла ошибка. Попробуйте позже 🙏")
 
 @dp.message(F.text.in_({"❓ Помощь", "/help"}))
+@query_budget(0)
 async def handle_help(message: Message):
     """Handle help command."""
     help_text = escape_md(
@@ -93,6 +126,7 @@ async def handle_help(message: Message):
     await message.answer(help_text, reply_markup=get_main_menu_keyboard())
 
 @dp.message(F.text.in_({"✨ Мантра", "/mantras"}))
+@query_budget(1)
 async def handle_mantras_button(message: Message):
     """Handle mantra request."""
     try:
@@ -110,77 +144,44 @@ async def handle_mantras_button(message: Message):
         await message.answer(escape_md("Произошла ошибка при получении мантры 🙏"))
 
 @dp.message(F.text.in_({"🗓️ План дня", "/today"}))
+@query_budget(2)
 async def handle_daily_plan(message: Message):
     """Handle daily plan request."""
     user_id = message.from_user.id
     
     try:
-        user_data = await UserRepository.get_user_data(user_id)
+        # User row and today's progress mask in one round trip
+        user_data, activity_status = await UserRepository.get_user_with_today_status(user_id)
         if not user_data:
             await message.answer(escape_md("Не нашел ваши данные. Попробуйте /start."))
             return
 
         # Get sun times
-        sun_times = get_sun_times(
-            user_data.location_lat or 0, 
-            user_data.location_lon or 0, 
-            user_data.timezone or "UTC", 
-            user_data.location_city or "Default"
-        )
+        sun_times = sun_times_service.get(user_data.location_lat, user_data.location_lon, user_data.timezone)
         
         sunrise_str = sun_times["sunrise"].strftime('%H:%M') if sun_times["sunrise"] else "н/д"
         sunset_str = sun_times["sunset"].strftime('%H:%M') if sun_times["sunset"] else "н/д"
 
-        # Get activity status
-        activity_status = await ActivityRepository.get_daily_activity_status(user_id)
-        
-        # Build progress rings
-        rings = []
-        for cat_code in ACTIVITY_CATEGORIES:
-            emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
-            cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
-            completed = activity_status.get(cat_code, False)
-            rings.append(f"{emoji} {('🟢' if completed else '⚪️')} {escape_md(cat_name)}")
-        rings_text = " \\| ".join(rings) if rings else escape_md("Активность не записана")
-
         # Get mantras based on time of day
         now_time = datetime.now(pytz.timezone(user_data.timezone or "UTC")).time()
         morning_mantra_cat = "Личный рост" if now_time < time(12, 0) else "Единство с природой"
         evening_mantra_cat = "Благодарность" if now_time >= time(18, 0) else "Служение"
 
-        morning_mantra = await MantraRepository.get_random_mantra_by_category(morning_mantra_cat)
-        evening_mantra = await MantraRepository.get_random_mantra_by_category(evening_mantra_cat)
-
-        # Build plan text
-        plan_text = f"🗓️ *План на {escape_md(date.today().strftime('%d.%m'))}* \\({escape_md(user_data.location_city or 'Неизвестно')}\\)\n\n"
-        plan_text += f"☀️ Восход: `{escape_md(sunrise_str)}` \\| 🌙 Закат: `{escape_md(sunset_str)}`\n\n"
-        plan_text += f"🌅 *Утро \\(до ~12:00\\)*\n"
-        if morning_mantra:
-            plan_text += f"   _{escape_md(morning_mantra.ossetian_text)}_\n"
-        plan_text += escape_md("   Практика: Настройся на день с благодарностью\\.\n\n")
-        plan_text += f"🌍 *День*\n"
-        plan_text += escape_md("   ⚡ Практика: Выполни ежедневную задачу\\.\n")
-        plan_text += f"   🎯 Отметь выполнение категорий ниже:\n\n"
-        plan_text += f"🌃 *Вечер \\(после ~18:00\\)*\n"
-        if evening_mantra:
-            plan_text += f"   _{escape_md(evening_mantra.ossetian_text)}_\n"
-        plan_text += escape_md("   🧘 Практика: Заверши день рефлексией в '✍️ Дневник'\\.\n\n")
-        plan_text += f"💚 *Прогресс дня:*\n   {rings_text}"
-
-        # Create inline keyboard
-        inline_kb_buttons = []
-        for cat_code in ACTIVITY_CATEGORIES:
-            emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
-            cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
-            completed = activity_status.get(cat_code, False)
-            inline_kb_buttons.append(
-                InlineKeyboardButton(
-                    text=f"{'✅' if completed else emoji} {cat_name}", 
-                    callback_data=f"log_activity:{cat_code}"
-                )
-            )
-        inline_kb = InlineKeyboardMarkup(inline_keyboard=[inline_kb_buttons])
+        morning_mantra, evening_mantra = await MantraRepository.get_random_mantras_by_categories(
+            [morning_mantra_cat, evening_mantra_cat]
+        )
+
+        plan_text = render_daily_plan(
+            date.today(),
+            user_data.location_city or 'Неизвестно',
+            sunrise_str,
+            sunset_str,
+            morning_mantra.ossetian_text if morning_mantra else None,
+            evening_mantra.ossetian_text if evening_mantra else None,
+            activity_status,
+        )
 
+        inline_kb = keyboard_registry.activity_keyboard(status_to_mask(activity_status))
         await message.answer(plan_text, reply_markup=inline_kb)
         
     except Exception as e:
@@ -188,20 +189,20 @@ async def handle_daily_plan(message: Message):
         await message.answer(escape_md("Произошла ошибка при получении плана дня 🙏"))
 
 @dp.callback_query(F.data.startswith("log_activity:"))
+# The log + mask write unit counts as two; a cold profile cache adds the timezone read
+@query_budget(3)
 async def process_log_activity_callback(callback_query: CallbackQuery):
-    """Handle activity logging callback."""
+    """Handle activity logging callback: one write, then the plan is edited in place."""
     try:
         category_to_log = callback_query.data.split(":")[1]
         user_id = callback_query.from_user.id
 
-        success = await ActivityRepository.log_daily_activity(user_id, category_to_log)
+        mask = await ActivityRepository.log_daily_activity_and_get_mask(user_id, category_to_log)
         
-        if success:
+        if mask is not None:
             cat_name = CATEGORY_NAMES_MAP.get(category_to_log, category_to_log)
             await callback_query.answer(f"✅ {cat_name} отмечено!")
-            
-            # Update the message
-            await handle_daily_plan(callback_query.message)
+            await update_plan_progress(callback_query.message, mask)
         else:
             await callback_query.answer("❌ Ошибка при отметке активности", show_alert=True)
             
@@ -209,13 +210,39 @@ async def process_log_activity_callback(callback_query: CallbackQuery):
         logger.error(f"Error in activity callback: {e}")
         await callback_query.answer("❌ Произошла ошибка", show_alert=True)
 
+async def update_plan_progress(message: Optional[Message], mask: int):
+    """
+    Re-render only the progress line and keyboard of a sent daily plan.
+
+    The activity is already logged and the callback answered, so a failed
+    edit is only logged.
+    """
+    # Telegram no longer gives us the plan's content (e.g. it was deleted)
+    if message is None or isinstance(message, InaccessibleMessage):
+        return
+    keyboard = keyboard_registry.activity_keyboard(mask)
+    plan_text = replace_progress_rings(message.md_text, mask_to_status(mask))
+    try:
+        if plan_text is not None:
+            await message.edit_text(plan_text, reply_markup=keyboard)
+        else:
+            await message.edit_reply_markup(reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # A repeated tap on an already completed category changes nothing
+        if "message is not modified" not in str(e):
+            logger.warning(f"Could not update daily plan progress: {e}")
+    except Exception as e:
+        logger.warning(f"Could not update daily plan progress: {e}")
+
 @dp.message(F.text.in_({"✍️ Дневник", "/diary"}))
+@query_budget(0)
 async def handle_diary_button(message: Message, state: FSMContext):
     """Handle diary button."""
     await message.answer(escape_md("📝 Что у тебя на сердце? Напиши:"))
     await state.set_state(DiaryStates.waiting_for_entry)
 
 @dp.message(DiaryStates.waiting_for_entry)
+@query_budget(2)
 async def process_diary_entry_message(message: Message, state: FSMContext):
     """Process diary entry."""
     user_id = message.from_user.id
@@ -234,6 +261,7 @@ async def process_diary_entry_message(message: Message, state: FSMContext):
         await state.clear()
 
 @dp.message(Command('mydiary'))
+@query_budget(1)
 async def handle_mydiary(message: Message):
     """Handle mydiary command."""
     user_id = message.from_user.id
@@ -244,19 +272,7 @@ async def handle_mydiary(message: Message):
             await message.answer(escape_md("В вашем дневнике пока нет записей. Используйте кнопку '✍️ Дневник'."))
             return
         
-        response_text = escape_md("📖 Ваши последние 5 записей:\n")
-        for entry in reversed(entries):
-            try:
-                ts_formatted = entry.timestamp.strftime('%d.%m.%y %H:%M')
-            except (ValueError, TypeError):
-                ts_formatted = str(entry.timestamp)
-            
-            response_text += f"\n*{escape_md(ts_formatted)}*\n"
-            response_text += f"{escape_md(entry.entry_text)}\n"
-        
-        if len(response_text) > 4090:
-            response_text = response_text[:4090] + "\n" + escape_md("...")
-        
+        response_text = render_diary(entries)
         await message.answer(response_text)
         
     except Exception as e:
@@ -264,15 +280,10 @@ async def handle_mydiary(message: Message):
         await message.answer(escape_md("Произошла ошибка при получении записей дневника 🙏"))
 
 @dp.message(F.text == "📍 Локация")
+@query_budget(0)
 async def handle_location_button(message: Message):
     """Handle location button."""
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📍 Отправить мою геолокацию", request_location=True)],
-            [KeyboardButton(text="🚫 Отмена")]
-        ],
-        resize_keyboard=True, one_time_keyboard=True
-    )
+    keyboard = keyboard_registry.get(LOCATION_REQUEST)
     await message.answer(
         escape_md("Чтобы точнее показывать время восхода/заката, нужна твоя геолокация 🌍.\n"
                   "Нажми кнопку 'Отправить...' или 'Отмена' 👇"),
@@ -280,11 +291,13 @@ async def handle_location_button(message: Message):
     )
 
 @dp.message(F.text == "🚫 Отмена")
+@query_budget(0)
 async def handle_location_cancel(message: Message):
     """Handle location cancel."""
     await message.answer("Хорошо, оставим настройки локации по умолчанию.", reply_markup=get_main_menu_keyboard())
 
 @dp.message(StateFilter(None), F.content_type == ContentType.LOCATION)
+@query_budget(1)
 async def handle_user_location(message: Message):
     """Handle user location."""
     user_id = message.from_user.id
@@ -292,7 +305,7 @@ async def handle_user_location(message: Message):
     lon = message.location.longitude
     
     logger.info(f"Received location from user {user_id}: lat={lat}, lon={lon}")
-    await message.answer(escape_md("⏳ Определяю город и часовой пояс..."), reply_markup=types.ReplyKeyboardRemove())
+    await message.answer(escape_md("⏳ Определяю город и часовой пояс..."), reply_markup=keyboard_registry.get(REMOVE))
 
     # For now, use default values - geocoding can be added later
     city = "Неизвестно"
@@ -301,7 +314,7 @@ async def handle_user_location(message: Message):
     try:
         await UserRepository.update_user_location(user_id, lat, lon, city, tz_str)
         await message.answer(
-            escape_md(f"📍 Локация сохранена: *{city}*\nЧасовой пояс: `{tz_str}`\nСпасибо\\! 🙏"),
+            f"📍 Локация сохранена: *{escape_md(city)}*\nЧасовой пояс: `{escape_md(tz_str)}`\nСпасибо\\! 🙏",
             reply_markup=get_main_menu_keyboard()
         )
     except Exception as e:
@@ -309,6 +322,7 @@ async def handle_user_location(message: Message):
         await message.answer(escape_md("Не удалось сохранить локацию. Попробуйте позже."), reply_markup=get_main_menu_keyboard())
 
 @dp.message(F.text.in_({"📊 Статистика", "/stats"}))
+@query_budget(2)
 async def handle_stats_button(message: Message):
     """Handle stats button."""
     user_id = message.from_user.id
@@ -319,26 +333,12 @@ async def handle_stats_button(message: Message):
             await message.answer(escape_md("Не нашел ваши данные. Попробуйте /start."))
             return
 
-        stats = await ActivityRepository.get_user_weekly_stats(user_id)
+        stats = await ActivityRepository.get_user_weekly_stats(user_id, user_data)
 
-        stats_text = f"📊 *Твоя статистика за 7 дней:*\n\n"
-        stats_text += f"☀️ Активных дней: *{escape_md(stats.days_active)}* из 7\n"
-        stats_text += f"✍️ Записей в дневнике: *{escape_md(stats.diary_entries)}*\n"
-        stats_text += f"🔥 Текущий стрик: *{escape_md(stats.streak)}* дня\\(ей\\)\n\n"
-        stats_text += f"🎯 *Выполнено практик по категориям:*\n"
-        
-        for cat_code in ACTIVITY_CATEGORIES:
-            count = stats.categories_done.get(cat_code, 0)
-            emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
-            cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
-            stats_text += f"   {emoji} {escape_md(cat_name)}: *{escape_md(count)}*\n"
-
-        stats_text += f"\n📈 Общее число выполненных практик: *{escape_md(stats.tasks_done_total)}*"
+        stats_text = render_user_stats(stats)
 
         # Group stats button
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🌍 Общая статистика", callback_data="show_group_stats")]
-        ])
+        keyboard = keyboard_registry.get(GROUP_STATS)
 
         await message.answer(stats_text, reply_markup=keyboard)
         
@@ -347,24 +347,13 @@ async def handle_stats_button(message: Message):
         await message.answer(escape_md("Произошла ошибка при получении статистики 🙏"))
 
 @dp.callback_query(F.data == "show_group_stats")
+@query_budget(1)
 async def process_show_group_stats(callback_query: CallbackQuery):
     """Handle group stats callback."""
     try:
         stats = await StatsRepository.get_group_weekly_stats()
         
-        response = f"🌍 *Статистика сообщества за 7 дней:*\n\n"
-        response += f"👥 Активных участников: *{escape_md(stats.total_users_active)}*\n\n"
-        response += f"🎯 *Всего выполнено практик:*\n"
-        
-        for cat_code in ACTIVITY_CATEGORIES:
-            count = stats.categories_done.get(cat_code, 0)
-            if count > 0:
-                emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
-                cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
-                response += f"   {emoji} {escape_md(cat_name)}: *{escape_md(count)}*\n"
-
-        response += f"\n📈 Общее число практик: *{escape_md(stats.total_tasks_done)}*"
-
+        response = render_group_stats(stats)
         await callback_query.message.answer(response)
         await callback_query.answer()
         
@@ -373,19 +362,14 @@ async def process_show_group_stats(callback_query: CallbackQuery):
         await callback_query.answer("❌ Произошла ошибка при получении статистики", show_alert=True)
 
 # Scheduler job
-async def reset_daily_activities_job():
-    """Reset daily activities job."""
+async def compact_daily_activities_job():
+    """Fold activity rows older than yesterday into the daily summary history."""
     try:
-        cutoff = (date.today() - timedelta(days=1)).isoformat()
-        async with db_manager.get_cursor() as cursor:
-            await cursor.execute(
-                "DELETE FROM daily_activity WHERE activity_date < ?",
-                (cutoff,)
-            )
-            await cursor.connection.commit()
-        logger.info(f"Daily reset: deleted old activity records")
+        cutoff = date.today().toordinal() - 1
+        removed = await ActivityRepository.compact_activity_history(cutoff)
+        logger.info(f"Daily compaction: folded {removed} old activity records into daily_summary")
     except Exception as e:
-        logger.error(f"Error in daily reset job: {e}")
+        logger.error(f"Error in daily compaction job: {e}")
 
 # Main function
 async def main():
@@ -393,20 +377,43 @@ async def main():
     try:
         # Initialize database
         await db_manager.get_connection()
+        await run_migrations()
+        await mantra_catalog.sync_from_data()
+        await community_aggregator.rebuild()
+        await analytics_snapshot.refresh()
+        if QUERY_CATALOG_SETTINGS["explain_on_startup"]:
+            await query_catalog.explain_all()
         logger.info("Database initialized")
         
+        keyboard_registry.build()
+        await sun_times_service.precompute()
+        await outbound_queue.start()
+
         # Setup scheduler
-        scheduler.add_job(reset_daily_activities_job, 'cron', hour=0, minute=5, timezone='UTC')
+        scheduler.add_job(compact_daily_activities_job, 'cron', hour=0, minute=5, timezone='UTC')
+        scheduler.add_job(purge_expired_caches, 'interval', minutes=5)
+        db_maintenance.register_jobs(scheduler)
+        analytics_snapshot.register_jobs(scheduler)
+        mantra_catalog.register_jobs(scheduler)
+        sun_times_service.register_jobs(scheduler)
+        storage.register_jobs(scheduler)
         scheduler.start()
         logger.info("Scheduler started")
         
         # Start bot
-        logger.info("Starting bot polling...")
-        await dp.start_polling(bot, skip_updates=True)
+        if BOT_MODE == "webhook":
+            logger.info("Starting bot in webhook mode...")
+            await WebhookServer(dp, bot).serve()
+        else:
+            logger.info("Starting bot polling...")
+            await dp.start_polling(bot, skip_updates=True)
         
     except Exception as e:
         logger.error(f"Error in main: {e}")
     finally:
+        await outbound_queue.close()
+        await write_queue.close()
+        await analytics_snapshot.close()
         await db_manager.close()
         if scheduler.running:
             scheduler.shutdown(wait=False)
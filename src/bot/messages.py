@@ -0,0 +1,162 @@
+"""
+Reply messages of FarnPathBot.
+
+Each message is a MarkdownTemplate compiled at import; category labels and
+progress rings depend only on configuration and are escaped once here too.
+Handlers pass the dynamic values and send the rendered text.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+from src.config.config import ACTIVITY_CATEGORIES, CATEGORY_EMOJI_MAP, CATEGORY_NAMES_MAP
+from src.database.models import DiaryEntry, GroupStats, UserStats
+from src.utils.templates import MarkdownTemplate, Static
+from src.utils.utils import escape_md
+
+# Telegram caps messages at 4096 characters
+DIARY_MAX_LENGTH = 4090
+
+# Start of each category's count line, "   <emoji> <name>: *", escaped once
+_CATEGORY_COUNT_PREFIXES: Dict[str, str] = {
+    cat_code: f"   {CATEGORY_EMOJI_MAP.get(cat_code, '❓')} {escape_md(CATEGORY_NAMES_MAP.get(cat_code, cat_code))}: *"
+    for cat_code in ACTIVITY_CATEGORIES
+}
+
+# Progress ring per category: (not done, done)
+_PROGRESS_RINGS: Dict[str, tuple] = {
+    cat_code: tuple(
+        f"{CATEGORY_EMOJI_MAP.get(cat_code, '❓')} {'🟢' if completed else '⚪️'} "
+        f"{escape_md(CATEGORY_NAMES_MAP.get(cat_code, cat_code))}"
+        for completed in (False, True)
+    )
+    for cat_code in ACTIVITY_CATEGORIES
+}
+_NO_PROGRESS = escape_md("Активность не записана")
+# Last line of the daily plan, followed by the rings
+_PROGRESS_HEADER = "💚 *Прогресс дня:*\n   "
+
+DAILY_PLAN = MarkdownTemplate(
+    "🗓️ *План на {date}* \\({city}\\)\n\n"
+    "☀️ Восход: `{sunrise}` \\| 🌙 Закат: `{sunset}`\n\n"
+    "🌅 *Утро \\(до ~12:00\\)*\n"
+    "{morning_mantra!r}",
+    Static("   Практика: Настройся на день с благодарностью.\n\n"),
+    "🌍 *День*\n",
+    Static("   ⚡ Практика: Выполни ежедневную задачу.\n"),
+    "   🎯 Отметь выполнение категорий ниже:\n\n"
+    "🌃 *Вечер \\(после ~18:00\\)*\n"
+    "{evening_mantra!r}",
+    Static("   🧘 Практика: Заверши день рефлексией в '✍️ Дневник'.\n\n"),
+    _PROGRESS_HEADER + "{rings!r}",
+)
+MANTRA_LINE = MarkdownTemplate("   _{text}_\n")
+
+USER_STATS = MarkdownTemplate(
+    "📊 *Твоя статистика за 7 дней:*\n\n"
+    "☀️ Активных дней: *{days_active}* из 7\n"
+    "✍️ Записей в дневнике: *{diary_entries}*\n"
+    "🔥 Текущий стрик: *{streak}* дня\\(ей\\)\n\n"
+    "🎯 *Выполнено практик по категориям:*\n"
+    "{categories!r}"
+    "\n📈 Общее число выполненных практик: *{total}*"
+)
+GROUP_STATS = MarkdownTemplate(
+    "🌍 *Статистика сообщества за 7 дней:*\n\n"
+    "👥 Активных участников: *{active_users}*\n\n"
+    "🎯 *Всего выполнено практик:*\n"
+    "{categories!r}"
+    "\n📈 Общее число практик: *{total}*"
+)
+
+DIARY = MarkdownTemplate(Static("📖 Ваши последние 5 записей:\n"), "{entries!r}")
+DIARY_ENTRY = MarkdownTemplate("\n*{timestamp}*\n{text}\n")
+_DIARY_TRUNCATED = "\n" + escape_md("...")
+
+
+def render_progress_rings(activity_status: Dict[str, bool]) -> str:
+    """Today's progress line: one ring per category."""
+    rings = " \\| ".join(
+        _PROGRESS_RINGS[cat_code][bool(activity_status.get(cat_code, False))]
+        for cat_code in ACTIVITY_CATEGORIES
+    )
+    return rings or _NO_PROGRESS
+
+
+def render_daily_plan(
+    day: date,
+    city: str,
+    sunrise: str,
+    sunset: str,
+    morning_mantra: Optional[str],
+    evening_mantra: Optional[str],
+    activity_status: Dict[str, bool],
+) -> str:
+    """Daily plan message."""
+    return DAILY_PLAN.render(
+        date=day.strftime('%d.%m'),
+        city=city,
+        sunrise=sunrise,
+        sunset=sunset,
+        morning_mantra=MANTRA_LINE.render(text=morning_mantra) if morning_mantra else "",
+        evening_mantra=MANTRA_LINE.render(text=evening_mantra) if evening_mantra else "",
+        rings=render_progress_rings(activity_status),
+    )
+
+
+def replace_progress_rings(plan_text: str, activity_status: Dict[str, bool]) -> Optional[str]:
+    """
+    Daily plan with only its progress line re-rendered.
+
+    `plan_text` is the MarkdownV2 of a sent plan (e.g. Message.md_text);
+    returns None if it has no progress line.
+    """
+    head, header, _ = plan_text.rpartition(_PROGRESS_HEADER)
+    if not header:
+        return None
+    return head + header + render_progress_rings(activity_status)
+
+
+def _render_category_counts(categories_done: Dict[str, int], skip_zero: bool) -> str:
+    # One line per category; a plain join is cheaper than a template render per line
+    return "".join([
+        f"{_CATEGORY_COUNT_PREFIXES[cat_code]}{escape_md(count)}*\n"
+        for cat_code in ACTIVITY_CATEGORIES
+        for count in (categories_done.get(cat_code, 0),)
+        if count > 0 or not skip_zero
+    ])
+
+
+def render_user_stats(stats: UserStats) -> str:
+    """Personal weekly statistics message."""
+    return USER_STATS.render(
+        days_active=stats.days_active,
+        diary_entries=stats.diary_entries,
+        streak=stats.streak,
+        categories=_render_category_counts(stats.categories_done, skip_zero=False),
+        total=stats.tasks_done_total,
+    )
+
+
+def render_group_stats(stats: GroupStats) -> str:
+    """Community weekly statistics message (categories nobody practised are left out)."""
+    return GROUP_STATS.render(
+        active_users=stats.total_users_active,
+        categories=_render_category_counts(stats.categories_done, skip_zero=True),
+        total=stats.total_tasks_done,
+    )
+
+
+def render_diary(entries: List[DiaryEntry]) -> str:
+    """Latest diary entries, oldest first, truncated to fit one message."""
+    rendered = []
+    for entry in reversed(entries):
+        try:
+            ts_formatted = entry.timestamp.strftime('%d.%m.%y %H:%M')
+        except (ValueError, TypeError):
+            ts_formatted = str(entry.timestamp)
+        rendered.append(DIARY_ENTRY.render(timestamp=ts_formatted, text=entry.entry_text))
+
+    text = DIARY.render(entries="".join(rendered))
+    if len(text) > DIARY_MAX_LENGTH:
+        text = text[:DIARY_MAX_LENGTH] + _DIARY_TRUNCATED
+    return text
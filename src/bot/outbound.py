@@ -0,0 +1,310 @@
+"""
+Outbound message delivery for FarnPathBot.
+
+Bot API calls that send to a chat go through OutboundQueue instead of straight
+to Telegram. A dispatcher task releases queued calls in priority order
+(interactive replies before broadcasts) as soon as both the global token bucket
+and the chat's own bucket allow it, which keeps the bot under Telegram's flood
+limits. Each chat has at most one call in flight, so its messages arrive in
+order. A 429 response pauses the whole queue for its retry_after and the call
+is retried.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from itertools import islice
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from src.config.config import OUTBOUND_SETTINGS, PERFORMANCE_SETTINGS
+from src.utils.performance import TokenBucket, api_limiter
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+
+# Bot API methods counted against the flood limits (sendChatAction is not a message)
+RATE_LIMITED_PREFIXES = ("send", "copy", "forward", "edit")
+UNLIMITED_METHODS = frozenset({"sendChatAction"})
+
+
+class Priority(IntEnum):
+    """Delivery lanes, most urgent first."""
+    INTERACTIVE = 0
+    BROADCAST = 1
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "outbound_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def priority(lane: Priority) -> Iterator[None]:
+    """Queue the Bot API calls made inside the block in `lane`."""
+    token = _current_priority.set(lane)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+@dataclass
+class OutboundStats:
+    """Counters of the outbound queue."""
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    retry_after: int = 0
+    dropped: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Sent, failed, retried and dropped request counts."""
+        return dict(self.__dict__)
+
+
+@dataclass
+class _Job:
+    chat_id: ChatId
+    lane: Priority
+    call: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    enqueued_at: float
+    retries: int = 0
+
+
+class _ChatState:
+    __slots__ = ("bucket", "in_flight")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.in_flight = False
+
+
+class OutboundQueue:
+    """Priority lanes of outgoing Bot API calls, released under global and per-chat token buckets."""
+
+    def __init__(self, settings: Dict[str, Any] = OUTBOUND_SETTINGS, global_bucket: TokenBucket = api_limiter):
+        self.settings = settings
+        self.global_bucket = global_bucket
+        self.stats = OutboundStats()
+        self._lanes: List[Deque[_Job]] = [deque() for _ in Priority]
+        self._chats: Dict[ChatId, _ChatState] = {}
+        self._in_flight: Set[asyncio.Task] = set()
+        self._paused_until = 0.0
+        self._pruned_at = time.monotonic()
+        # Seconds from submit to a successful send, for the latest calls
+        self._latencies: Deque[float] = deque(maxlen=1024)
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._dispatcher is not None
+
+    @property
+    def depth(self) -> int:
+        """Calls waiting in all lanes."""
+        return sum(len(lane) for lane in self._lanes)
+
+    async def start(self) -> None:
+        """Start the dispatcher task."""
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._run())
+            logger.info("Outbound queue started")
+
+    async def submit(self, chat_id: ChatId, call: Callable[[], Awaitable[Any]], lane: Optional[Priority] = None) -> Any:
+        """Queue `call` for `chat_id` and return its result once it has been sent."""
+        if self._dispatcher is None:
+            return await call()
+        job = _Job(
+            chat_id, _current_priority.get() if lane is None else lane, call,
+            asyncio.get_running_loop().create_future(), time.monotonic(),
+        )
+        self._lanes[job.lane].append(job)
+        self._wakeup.set()
+        return await job.future
+
+    def _chat(self, chat_id: ChatId) -> _ChatState:
+        state = self._chats.get(chat_id)
+        if state is None:
+            # Groups and channels have negative ids (or @usernames) and a per-minute limit
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.settings["chat_rate"], self.settings["chat_burst"])
+            else:
+                bucket = TokenBucket(self.settings["group_rate"], self.settings["group_burst"])
+            state = self._chats[chat_id] = _ChatState(bucket)
+        return state
+
+    def _pick(self) -> Tuple[Optional[_Job], Optional[float]]:
+        """Take the first sendable job, or return how long until one may become sendable."""
+        blocked: Set[ChatId] = set()
+        earliest: Optional[float] = None
+        for lane in self._lanes:
+            for index, job in enumerate(islice(lane, self.settings["scan_limit"])):
+                # Later jobs of a blocked chat must wait too, to keep the chat's order
+                if job.chat_id in blocked:
+                    continue
+                state = self._chat(job.chat_id)
+                if state.in_flight:
+                    blocked.add(job.chat_id)
+                    continue
+                wait = state.bucket.wait_time()
+                if wait > 0:
+                    blocked.add(job.chat_id)
+                    earliest = wait if earliest is None else min(earliest, wait)
+                    continue
+                del lane[index]
+                return job, None
+        return None, earliest
+
+    async def _wait(self, timeout: Optional[float]) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        """Dispatcher loop: release jobs as the buckets allow."""
+        while True:
+            pause = max(self._paused_until - time.monotonic(), self.global_bucket.wait_time())
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if len(self._in_flight) >= self.settings["max_in_flight"]:
+                await self._wait(None)
+                continue
+
+            job, delay = self._pick()
+            if job is None:
+                await self._wait(delay)
+                continue
+            if job.future.done():
+                # The caller has gone away (e.g. its handler was cancelled)
+                self.stats.dropped += 1
+                continue
+
+            state = self._chats[job.chat_id]
+            state.bucket.try_acquire()
+            self.global_bucket.try_acquire()
+            state.in_flight = True
+            task = asyncio.create_task(self._send(job, state))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            self._prune()
+
+    async def _send(self, job: _Job, state: _ChatState) -> None:
+        """Make one call and settle its future, re-queueing it on flood control."""
+        try:
+            result = await job.call()
+        except TelegramRetryAfter as e:
+            self.stats.retry_after += 1
+            # Telegram does not say which limit tripped, so everything waits
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Flood control in chat {job.chat_id}: outbound queue paused for {e.retry_after}s")
+            if job.retries < self.settings["max_retries"]:
+                job.retries += 1
+                self.stats.retried += 1
+                self._lanes[job.lane].appendleft(job)
+            else:
+                self.stats.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            self.stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats.sent += 1
+            self._latencies.append(time.monotonic() - job.enqueued_at)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            state.in_flight = False
+            self._wakeup.set()
+
+    def _prune(self) -> None:
+        """Drop the state of idle chats once a minute."""
+        now = time.monotonic()
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        queued = {job.chat_id for lane in self._lanes for job in lane}
+        idle = [
+            chat_id for chat_id, state in self._chats.items()
+            if not state.in_flight and chat_id not in queued and state.bucket.full
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    async def close(self) -> None:
+        """Send what is queued (up to drain_timeout), then stop the dispatcher."""
+        if self._dispatcher is None:
+            return
+        deadline = time.monotonic() + self.settings["drain_timeout"]
+        while (self.depth or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self.depth or self._in_flight:
+            logger.warning(f"Outbound drain timed out; {self.depth} queued calls dropped")
+
+        tasks = [self._dispatcher, *self._in_flight]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for lane in self._lanes:
+            for job in lane:
+                job.future.cancel()
+            lane.clear()
+        self._dispatcher = None
+        logger.info(f"Outbound queue stopped: {self.stats.as_dict()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counters, lane depths and send latency percentiles."""
+        stats: Dict[str, Any] = self.stats.as_dict()
+        for lane in Priority:
+            stats[f"{lane.name.lower()}_depth"] = len(self._lanes[lane])
+        stats["in_flight"] = len(self._in_flight)
+        stats["chats"] = len(self._chats)
+        stats["paused_for"] = max(0.0, self._paused_until - time.monotonic())
+        latencies = sorted(self._latencies)
+        for p in (50, 95, 99):
+            stats[f"p{p}_ms"] = (
+                latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+            )
+        return stats
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """Bot session middleware that routes calls sending to a chat through an OutboundQueue."""
+
+    def __init__(self, queue: OutboundQueue):
+        self.queue = queue
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        chat_id = getattr(method, "chat_id", None)
+        api_method = method.__api_method__
+        if (
+            chat_id is None
+            or not PERFORMANCE_SETTINGS["enable_rate_limiting"]
+            or not api_method.startswith(RATE_LIMITED_PREFIXES)
+            or api_method in UNLIMITED_METHODS
+        ):
+            return await make_request(bot, method)
+        return await self.queue.submit(chat_id, lambda: make_request(bot, method))
+
+
+# Global outbound queue
+outbound_queue = OutboundQueue()
@@ -0,0 +1,51 @@
+"""
+Per-user anti-flood middleware for FarnPathBot.
+
+Registered as an outer update middleware, it runs before filters, handlers and
+any database work. Updates from a user over the configured rate are dropped;
+a throttled button press is still answered so the client stops its spinner.
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+from src.config.config import PERFORMANCE_SETTINGS, THROTTLING_SETTINGS
+from src.utils.performance import KeyedRateLimiter
+
+logger = logging.getLogger(__name__)
+
+THROTTLED_NOTICE = "⏳ Не так быстро, подождите немного 🙏"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drop updates from users who exceed their per-user rate."""
+
+    def __init__(self, settings: Dict[str, Any] = THROTTLING_SETTINGS):
+        self.limiter = KeyedRateLimiter(settings["rate"], settings["burst"], settings["max_keys"])
+        self.throttled = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        if user is None or not PERFORMANCE_SETTINGS["enable_rate_limiting"]:
+            return await handler(event, data)
+
+        wait = self.limiter.hit(user.id)
+        if wait == 0.0:
+            return await handler(event, data)
+
+        self.throttled += 1
+        logger.debug(f"Throttled update from user {user.id} for {wait:.2f}s")
+        if isinstance(event, Update) and event.callback_query is not None:
+            await event.callback_query.answer(THROTTLED_NOTICE)
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get the number of dropped updates and tracked users."""
+        return {"throttled": self.throttled, "tracked_users": len(self.limiter)}
@@ -0,0 +1,184 @@
+"""
+Webhook serving mode for FarnPathBot.
+
+An embedded aiohttp server receives updates from Telegram, checks the secret
+token header, puts each update on a bounded queue and answers 200 at once;
+worker tasks feed queued updates to the dispatcher in the background. When the
+queue is full the server answers 503 and Telegram redelivers the update later.
+On shutdown the server stops accepting updates and drains the queue before
+closing.
+"""
+import asyncio
+import hmac
+import logging
+import signal
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+from aiohttp import web
+
+from src.config.config import WEBHOOK_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+@dataclass
+class WebhookStats:
+    """Counters of the webhook server."""
+    received: int = 0
+    processed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    invalid: int = 0
+    overflows: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Received, processed and rejected update counts."""
+        return dict(self.__dict__)
+
+
+class WebhookServer:
+    """aiohttp webhook endpoint with a bounded update queue and background workers."""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, settings: Dict[str, Any] = WEBHOOK_SETTINGS):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.settings = settings
+        self.stats = WebhookStats()
+        self.queue: "asyncio.Queue[tuple]" = asyncio.Queue(maxsize=settings["queue_size"])
+        # Seconds from receipt to the end of processing, for the latest updates
+        self._latencies: Deque[float] = deque(maxlen=1024)
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._accepting = False
+        self._stop_requested = asyncio.Event()
+
+        self.app = web.Application()
+        self.app.router.add_post(settings["path"], self.handle_update)
+
+    @property
+    def port(self) -> Optional[int]:
+        """Port the server is bound to (useful with port 0)."""
+        if self._runner is None or not self._runner.addresses:
+            return None
+        return self._runner.addresses[0][1]
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Validate, enqueue and acknowledge one update."""
+        if not self._accepting:
+            return web.Response(status=503)
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token.encode(), self.settings["secret_token"].encode()):
+            self.stats.rejected += 1
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError as e:
+            # Acknowledged anyway: Telegram would redeliver a malformed update forever
+            self.stats.invalid += 1
+            logger.warning(f"Ignoring malformed webhook update: {e}")
+            return web.Response()
+
+        try:
+            self.queue.put_nowait((update, asyncio.get_running_loop().time()))
+        except asyncio.QueueFull:
+            self.stats.overflows += 1
+            return web.Response(status=503)
+        self.stats.received += 1
+        return web.Response()
+
+    async def _worker(self) -> None:
+        """Feed queued updates to the dispatcher."""
+        loop = asyncio.get_running_loop()
+        while True:
+            update, received_at = await self.queue.get()
+            try:
+                response = await self.dispatcher.feed_update(self.bot, update)
+                # A handler may answer with a method, as it could in a webhook response
+                if isinstance(response, TelegramMethod):
+                    await self.bot(response)
+                self.stats.processed += 1
+            except Exception as e:
+                self.stats.failed += 1
+                logger.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                self._latencies.append(loop.time() - received_at)
+                self.queue.task_done()
+
+    async def start(self, register_webhook: bool = True) -> None:
+        """Start workers and the HTTP server, then point Telegram at it."""
+        if not self.settings["secret_token"]:
+            raise ValueError("WEBHOOK_SECRET_TOKEN is required in webhook mode")
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.settings["workers"])]
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.settings["host"], self.settings["port"]).start()
+        self._accepting = True
+        logger.info(f"Webhook server listening on port {self.port} at {self.settings['path']}")
+
+        if register_webhook:
+            if not self.settings["base_url"]:
+                raise ValueError("WEBHOOK_BASE_URL is required in webhook mode")
+            await self.bot.set_webhook(
+                url=self.settings["base_url"].rstrip("/") + self.settings["path"],
+                secret_token=self.settings["secret_token"],
+                allowed_updates=self.dispatcher.resolve_used_update_types(),
+                drop_pending_updates=self.settings["drop_pending_updates"],
+            )
+
+    async def stop(self) -> None:
+        """Stop accepting updates, finish the queued ones and shut the server down."""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), self.settings["drain_timeout"])
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook drain timed out; {self.queue.qsize()} queued updates dropped")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        logger.info(f"Webhook server stopped: {self.stats.as_dict()}")
+
+    def request_stop(self) -> None:
+        """Make serve() return (signal handler entry point)."""
+        self._stop_requested.set()
+
+    async def serve(self) -> None:
+        """Run until SIGINT/SIGTERM, with the dispatcher's startup and shutdown hooks."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        await self.dispatcher.emit_startup(bot=self.bot, **self.dispatcher.workflow_data)
+        try:
+            await self.start()
+            await self._stop_requested.wait()
+        finally:
+            await self.stop()
+            await self.dispatcher.emit_shutdown(bot=self.bot, **self.dispatcher.workflow_data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counters, queue depth and processing latency percentiles."""
+        stats: Dict[str, Any] = self.stats.as_dict()
+        stats["queue_depth"] = self.queue.qsize()
+        latencies = sorted(self._latencies)
+        for p in (50, 95, 99):
+            stats[f"p{p}_ms"] = (
+                latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+            )
+        return stats
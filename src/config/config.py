@@ -144,6 +144,137 @@ DATABASE_SETTINGS = {
     "optimize_on_close": True,
 }
 
+# Scheduled SQLite maintenance (checkpoints, statistics, incremental vacuum)
+MAINTENANCE_SETTINGS = {
+    "checkpoint_interval_minutes": int(os.getenv("CHECKPOINT_INTERVAL_MINUTES", "5")),
+    "wal_truncate_threshold_mb": float(os.getenv("WAL_TRUNCATE_THRESHOLD_MB", "64")),
+    "optimize_interval_hours": int(os.getenv("OPTIMIZE_INTERVAL_HOURS", "6")),
+    "analyze_hour_utc": int(os.getenv("ANALYZE_HOUR_UTC", "3")),
+    "quiet_hours_utc": os.getenv("QUIET_HOURS_UTC", "1-4"),
+    "vacuum_pages_per_step": int(os.getenv("VACUUM_PAGES_PER_STEP", "200")),
+    "vacuum_max_steps": int(os.getenv("VACUUM_MAX_STEPS", "25")),
+}
+
+# Analytics snapshot used by community/export queries
+ANALYTICS_SETTINGS = {
+    "snapshot_file": os.getenv("ANALYTICS_SNAPSHOT_FILE", ""),  # empty: next to DATABASE_FILE
+    "refresh_interval_seconds": int(os.getenv("ANALYTICS_REFRESH_SECONDS", "300")),
+    "max_staleness_seconds": int(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", "900")),
+    "backup_pages_per_step": int(os.getenv("ANALYTICS_BACKUP_PAGES_PER_STEP", "256")),
+    "backup_step_sleep_ms": float(os.getenv("ANALYTICS_BACKUP_STEP_SLEEP_MS", "5")),
+}
+
+# Per-handler query budgets: log overruns, or raise when strict
+QUERY_BUDGET_SETTINGS = {
+    "strict": os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true",
+}
+
+# In-memory mantra catalog: how often to check the table for changes
+MANTRA_CATALOG_SETTINGS = {
+    "reload_check_seconds": int(os.getenv("MANTRA_RELOAD_CHECK_SECONDS", "60")),
+}
+
+# Sun times: coordinates are rounded to `precision` decimals (2 ~ 1 km) for the
+# cache key; today's and tomorrow's times for every user location are
+# precomputed daily at precompute_hour:precompute_minute UTC
+SUN_TIMES_SETTINGS = {
+    "precision": int(os.getenv("SUN_TIMES_PRECISION", "2")),
+    "precompute_hour": int(os.getenv("SUN_TIMES_PRECOMPUTE_HOUR", "0")),
+    "precompute_minute": int(os.getenv("SUN_TIMES_PRECOMPUTE_MINUTE", "10")),
+}
+
+# In-process user profile cache (LRU + TTL)
+USER_CACHE_SETTINGS = {
+    "max_size": int(os.getenv("USER_CACHE_MAX_SIZE", "10000")),
+    "ttl_seconds": float(os.getenv("USER_CACHE_TTL", str(CACHE_TTL))),
+}
+
+# Repository read cache (stats and diary reads, invalidated by writes)
+READ_CACHE_SETTINGS = {
+    "max_size": int(os.getenv("READ_CACHE_MAX_SIZE", "4096")),
+    "ttl_seconds": float(os.getenv("READ_CACHE_TTL", str(CACHE_TTL))),
+    # Community stats come from the analytics snapshot, which is refreshed on its own schedule
+    "group_ttl_seconds": float(os.getenv("GROUP_STATS_CACHE_TTL", "300")),
+}
+
+# Slow-query tracing: statements over threshold_ms are logged with their query plan
+SLOW_QUERY_SETTINGS = {
+    "enabled": os.getenv("SLOW_QUERY_TRACING", "true").lower() == "true",
+    "threshold_ms": float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100")),
+    "buffer_size": int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200")),
+    "max_per_minute": int(os.getenv("SLOW_QUERY_MAX_PER_MINUTE", "30")),
+    "explain": os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true",
+}
+
+# Named query catalog: latency samples kept per query, plan dump at startup
+QUERY_CATALOG_SETTINGS = {
+    "latency_samples": int(os.getenv("QUERY_LATENCY_SAMPLES", "1024")),
+    "explain_on_startup": os.getenv("EXPLAIN_QUERIES_ON_STARTUP", "true").lower() == "true",
+}
+
+# Group-commit write queue: flush every max_delay_ms or max_batch_size statements
+WRITE_QUEUE_SETTINGS = {
+    "max_batch_size": int(os.getenv("WRITE_QUEUE_MAX_BATCH", "100")),
+    "max_delay_ms": float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "5")),
+}
+
+# Update delivery: "polling" (getUpdates) or "webhook" (embedded aiohttp server)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+
+# Webhook server: Telegram posts to base_url + path (TLS terminated by a proxy in
+# front of host:port); updates wait in a bounded queue for the worker tasks
+WEBHOOK_SETTINGS = {
+    "base_url": os.getenv("WEBHOOK_BASE_URL", ""),
+    "path": os.getenv("WEBHOOK_PATH", "/telegram/webhook"),
+    "host": os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+    "port": int(os.getenv("WEBHOOK_PORT", "8080")),
+    "secret_token": os.getenv("WEBHOOK_SECRET_TOKEN", ""),
+    "queue_size": int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")),
+    "workers": int(os.getenv("WEBHOOK_WORKERS", "16")),
+    "drain_timeout": float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30")),
+    "drop_pending_updates": os.getenv("WEBHOOK_DROP_PENDING_UPDATES", "true").lower() == "true",
+}
+
+# Outbound delivery: Telegram allows about 30 messages/s overall, 1/s per chat
+# and 20/min per group; Bot API calls that send to a chat wait in priority lanes
+# until both the global and the chat's token bucket allow them
+OUTBOUND_SETTINGS = {
+    "global_rate": float(os.getenv("OUTBOUND_GLOBAL_RATE", "30")),
+    "global_burst": int(os.getenv("OUTBOUND_GLOBAL_BURST", "30")),
+    "chat_rate": float(os.getenv("OUTBOUND_CHAT_RATE", "1")),
+    "chat_burst": int(os.getenv("OUTBOUND_CHAT_BURST", "3")),
+    "group_rate": float(os.getenv("OUTBOUND_GROUP_RATE_PER_MINUTE", "20")) / 60,
+    "group_burst": int(os.getenv("OUTBOUND_GROUP_BURST", "3")),
+    "max_in_flight": int(os.getenv("OUTBOUND_MAX_IN_FLIGHT", "30")),
+    "max_retries": int(os.getenv("OUTBOUND_MAX_RETRIES", "3")),
+    "scan_limit": int(os.getenv("OUTBOUND_SCAN_LIMIT", "256")),
+    "drain_timeout": float(os.getenv("OUTBOUND_DRAIN_TIMEOUT", "10")),
+}
+
+# Per-user anti-flood: updates beyond `rate` per second (bursts up to `burst`)
+# are dropped before any handler or database work
+THROTTLING_SETTINGS = {
+    "rate": float(os.getenv("THROTTLE_RATE", "2")),
+    "burst": int(os.getenv("THROTTLE_BURST", "5")),
+    "max_keys": int(os.getenv("THROTTLE_MAX_KEYS", "10000")),
+}
+
+# Update dispatch: each user's updates are handled in order, different users in
+# parallel with at most max_concurrency handlers running at once
+DISPATCH_SETTINGS = {
+    "max_concurrency": int(os.getenv("DISPATCH_MAX_CONCURRENCY", "64")),
+}
+
+# Persistent FSM storage: states neither read nor changed for ttl_seconds expire;
+# changes are cached in memory and written back in batches every flush_interval_ms
+FSM_STORAGE_SETTINGS = {
+    "ttl_seconds": int(os.getenv("FSM_STATE_TTL", str(7 * 24 * 3600))),
+    "cache_size": int(os.getenv("FSM_CACHE_SIZE", "10000")),
+    "flush_interval_ms": float(os.getenv("FSM_FLUSH_INTERVAL_MS", "1000")),
+    "flush_batch_size": int(os.getenv("FSM_FLUSH_BATCH_SIZE", "100")),
+    "purge_interval_minutes": int(os.getenv("FSM_PURGE_INTERVAL_MINUTES", "60")),
+}
+
 # Error Handling Settings
 ERROR_SETTINGS = {
     "max_retries": int(os.getenv("MAX_RETRIES", "3")),
@@ -156,17 +287,32 @@ def get_config() -> Dict[str, Any]:
     """Get complete configuration dictionary."""
     return {
         "api_token": API_TOKEN,
+        "bot_mode": BOT_MODE,
+        "webhook": WEBHOOK_SETTINGS,
+        "dispatch": DISPATCH_SETTINGS,
         "database": {
             "file": DATABASE_FILE,
             "pool_size": DATABASE_POOL_SIZE,
             "timeout": DATABASE_TIMEOUT,
             "settings": DATABASE_SETTINGS,
+            "write_queue": WRITE_QUEUE_SETTINGS,
+            "fsm_storage": FSM_STORAGE_SETTINGS,
+            "maintenance": MAINTENANCE_SETTINGS,
+            "analytics": ANALYTICS_SETTINGS,
+            "query_catalog": QUERY_CATALOG_SETTINGS,
+            "slow_queries": SLOW_QUERY_SETTINGS,
         },
         "performance": {
             "cache_ttl": CACHE_TTL,
             "rate_limit_calls": RATE_LIMIT_CALLS,
             "rate_limit_window": RATE_LIMIT_WINDOW,
             "settings": PERFORMANCE_SETTINGS,
+            "user_cache": USER_CACHE_SETTINGS,
+            "read_cache": READ_CACHE_SETTINGS,
+            "mantra_catalog": MANTRA_CATALOG_SETTINGS,
+            "sun_times": SUN_TIMES_SETTINGS,
+            "outbound": OUTBOUND_SETTINGS,
+            "throttling": THROTTLING_SETTINGS,
         },
         "logging": {
             "level": LOG_LEVEL,
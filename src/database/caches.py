@@ -0,0 +1,40 @@
+"""
+Caches in front of the repository read paths.
+
+Both are AsyncCache instances and honour PERFORMANCE_SETTINGS["enable_caching"]:
+user profiles (src.database.user_cache, re-exported here) are written through
+by the repository, everything else is tagged per user (or as community data)
+and invalidated by the writes that change it.
+"""
+import logging
+
+from src.config.config import PERFORMANCE_SETTINGS, READ_CACHE_SETTINGS
+from src.database.user_cache import user_cache
+from src.utils.cache import AsyncCache
+
+logger = logging.getLogger(__name__)
+
+# Tag of cached community aggregates
+GROUP_TAG = "group"
+
+
+def user_tag(user_id: int) -> str:
+    """Tag of every cached read that depends on one user's data."""
+    return f"user:{user_id}"
+
+
+# Stats and diary reads keyed by (query, arguments)
+read_cache = AsyncCache(
+    "repository",
+    max_size=READ_CACHE_SETTINGS["max_size"],
+    ttl=READ_CACHE_SETTINGS["ttl_seconds"],
+    enabled=PERFORMANCE_SETTINGS["enable_caching"],
+)
+
+
+def purge_expired_caches() -> None:
+    """Drop expired entries nobody asked for again (scheduler job)."""
+    for cache in (user_cache, read_cache):
+        removed = cache.purge_expired()
+        if removed:
+            logger.debug(f"Purged {removed} expired entries from the '{cache.name}' cache")
@@ -0,0 +1,135 @@
+"""
+In-memory community aggregates.
+
+Keeps per-day category counters and per-day active-user masks for the last
+week in a ring of day slots that rotates at day boundaries. Activity writes
+update it as they happen, so weekly group stats are a constant-time read
+instead of a COUNT(DISTINCT user_id) over a week of rows. The ring is rebuilt
+from daily_summary at startup.
+"""
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from src.config.config import ACTIVITY_CATEGORIES
+from src.database.models import CATEGORY_BITS, GroupStats
+from src.database.queries import QueryCatalog, query_catalog
+
+logger = logging.getLogger(__name__)
+
+
+class _DaySlot:
+    """Aggregates of one local day."""
+
+    __slots__ = ("day", "masks", "category_counts")
+
+    def __init__(self, day: int):
+        self.day = day
+        self.masks: Dict[int, int] = {}
+        self.category_counts: List[int] = [0] * len(ACTIVITY_CATEGORIES)
+
+
+class CommunityAggregator:
+    """Ring of day slots covering the last `window_days` days plus a few days ahead."""
+
+    # Users east of the server can already be on a later local day
+    LEAD_DAYS = 2
+
+    def __init__(self, window_days: int = 7, queries: QueryCatalog = query_catalog):
+        self.window_days = window_days
+        self.queries = queries
+        self._slots: List[Optional[_DaySlot]] = [None] * (window_days + self.LEAD_DAYS)
+        # Number of live slots each user is active in, for a constant-time distinct count
+        self._user_days: Dict[int, int] = {}
+        self._totals: List[int] = [0] * len(ACTIVITY_CATEGORIES)
+        self.ready = False
+
+    def _first_day(self, today: int) -> int:
+        return today - (self.window_days - 1)
+
+    def _evict(self, index: int) -> None:
+        """Drop a slot's users and counts from the window totals."""
+        slot = self._slots[index]
+        if slot is None:
+            return
+        for user_id in slot.masks:
+            remaining = self._user_days[user_id] - 1
+            if remaining:
+                self._user_days[user_id] = remaining
+            else:
+                del self._user_days[user_id]
+        for i, count in enumerate(slot.category_counts):
+            self._totals[i] -= count
+        self._slots[index] = None
+
+    def rotate(self, today: Optional[int] = None) -> None:
+        """Evict slots that fell out of the window."""
+        first_day = self._first_day(today if today is not None else date.today().toordinal())
+        for index, slot in enumerate(self._slots):
+            if slot is not None and slot.day < first_day:
+                self._evict(index)
+
+    def record(self, user_id: int, day: int, mask: int, today: Optional[int] = None) -> None:
+        """Add completed categories (a bitmask) for a user's local day."""
+        today = today if today is not None else date.today().toordinal()
+        self.rotate(today)
+        if not self._first_day(today) <= day <= today + self.LEAD_DAYS:
+            return
+        index = day % len(self._slots)
+        slot = self._slots[index]
+        if slot is None or slot.day != day:
+            self._evict(index)
+            slot = self._slots[index] = _DaySlot(day)
+
+        previous = slot.masks.get(user_id, 0)
+        added = mask & ~previous
+        if not added:
+            return
+        if not previous:
+            self._user_days[user_id] = self._user_days.get(user_id, 0) + 1
+        slot.masks[user_id] = previous | mask
+        for i, bit in enumerate(CATEGORY_BITS.values()):
+            if added & bit:
+                slot.category_counts[i] += 1
+                self._totals[i] += 1
+
+    async def rebuild(self, today: Optional[int] = None) -> None:
+        """Reload the ring from daily_summary."""
+        today = today if today is not None else date.today().toordinal()
+        rows = await self.queries.fetch_all("community_window", (self._first_day(today),))
+        self._slots = [None] * len(self._slots)
+        self._user_days = {}
+        self._totals = [0] * len(ACTIVITY_CATEGORIES)
+        for user_id, day, mask in rows:
+            self.record(user_id, day, mask, today)
+        self.ready = True
+        logger.info(f"Community aggregates rebuilt from {len(rows)} summary rows")
+
+    def get_stats(self, today: Optional[int] = None) -> GroupStats:
+        """Group statistics for the window, without touching the database."""
+        self.rotate(today)
+        categories_done = dict(zip(ACTIVITY_CATEGORIES, self._totals))
+        return GroupStats(
+            total_users_active=len(self._user_days),
+            total_tasks_done=sum(self._totals),
+            categories_done=categories_done
+        )
+
+    def get_info(self) -> Dict[str, Any]:
+        """Describe the live slots (for diagnostics)."""
+        return {
+            "ready": self.ready,
+            "days": sorted(slot.day for slot in self._slots if slot is not None),
+            "active_users": len(self._user_days),
+        }
+
+    def reset(self) -> None:
+        """Drop all aggregates; group stats fall back to SQL until rebuilt."""
+        self._slots = [None] * len(self._slots)
+        self._user_days = {}
+        self._totals = [0] * len(ACTIVITY_CATEGORIES)
+        self.ready = False
+
+
+# Global weekly community aggregates
+community_aggregator = CommunityAggregator()
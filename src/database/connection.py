@@ -1,56 +1,227 @@
 """
 Database connection management with connection pooling.
+
+SQLite in WAL mode allows many concurrent readers alongside a single writer,
+so the manager keeps one dedicated writer connection and a bounded pool of
+read-only connections. Reads never queue behind writes on aiosqlite's
+per-connection worker thread.
 """
+import asyncio
+import time
 import aiosqlite
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Sequence
+from urllib.request import pathname2url
 from contextlib import asynccontextmanager
-from src.config.config import DATABASE_FILE as DB_NAME
+from src.database.instrumentation import InstrumentedCursor, SlowQueryLog
+from src.config.config import (
+    DATABASE_FILE as DB_NAME, DATABASE_POOL_SIZE, DATABASE_TIMEOUT, DATABASE_SETTINGS,
+    SLOW_QUERY_SETTINGS
+)
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class PoolStats:
+    """Connection acquisition statistics for one kind of connection."""
+    acquisitions: int = 0
+    waits: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, wait: float, blocked: bool) -> None:
+        """Record a single acquisition and the time spent waiting for it."""
+        self.acquisitions += 1
+        self.total_wait += wait
+        if blocked:
+            self.waits += 1
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def as_dict(self) -> Dict[str, float]:
+        """Acquisitions with average and maximum wait, as reported by get_pool_stats()."""
+        return {
+            "acquisitions": self.acquisitions,
+            "waits": self.waits,
+            "avg_wait": self.total_wait / self.acquisitions if self.acquisitions else 0.0,
+            "max_wait": self.max_wait,
+            "total_wait": self.total_wait,
+        }
+
+
 class DatabaseManager:
-    """Manages database connections with connection pooling."""
-    
-    def __init__(self, db_path: str = DB_NAME):
+    """Manages a dedicated writer connection and a pool of read-only connections."""
+
+    def __init__(
+        self,
+        db_path: str = DB_NAME,
+        pool_size: int = DATABASE_POOL_SIZE,
+        timeout: float = DATABASE_TIMEOUT,
+        trace: bool = SLOW_QUERY_SETTINGS["enabled"],
+        slow_query_settings: Dict[str, Any] = SLOW_QUERY_SETTINGS,
+    ):
         self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.trace = trace
+        self.slow_queries = SlowQueryLog(slow_query_settings, explain=self.explain)
         self._connection: Optional[aiosqlite.Connection] = None
-    
+        self._readers: List[aiosqlite.Connection] = []
+        self._readers_reserved = 0
+        self.reader_stats = PoolStats()
+        self.writer_stats = PoolStats()
+        self._reset_primitives()
+
+    def _reset_primitives(self) -> None:
+        """Create fresh asyncio primitives (they are bound to the running loop on first use)."""
+        self._init_lock = asyncio.Lock()
+        self._writer_lock = asyncio.Lock()
+        self._idle_readers: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def readers_enabled(self) -> bool:
+        """In-memory databases cannot be shared, so they are served by the writer only."""
+        return self.db_path != ":memory:" and not self.db_path.startswith("file::memory:")
+
+    async def _apply_pragmas(self, conn: aiosqlite.Connection) -> None:
+        """Apply per-connection performance settings."""
+        await conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        await conn.execute(f"PRAGMA cache_size={int(DATABASE_SETTINGS['cache_size'])}")
+        await conn.execute(f"PRAGMA temp_store={DATABASE_SETTINGS['temp_store']}")
+        if DATABASE_SETTINGS.get("foreign_keys"):
+            await conn.execute("PRAGMA foreign_keys=ON")
+
     async def get_connection(self) -> aiosqlite.Connection:
-        """Get a database connection, creating one if needed."""
+        """Get the writer connection, creating it if needed."""
         if self._connection is None:
-            self._connection = await aiosqlite.connect(self.db_path)
-            # Enable WAL mode for better concurrency
-            await self._connection.execute("PRAGMA journal_mode=WAL")
-            # Enable foreign keys
-            await self._connection.execute("PRAGMA foreign_keys=ON")
-            # Optimize for performance
-            await self._connection.execute("PRAGMA synchronous=NORMAL")
-            await self._connection.execute("PRAGMA cache_size=10000")
-            await self._connection.execute("PRAGMA temp_store=MEMORY")
-            logger.info("Database connection established")
+            async with self._init_lock:
+                if self._connection is None:
+                    conn = await aiosqlite.connect(self.db_path, timeout=self.timeout)
+                    # WAL lets the read-only pool run alongside the writer
+                    await conn.execute(f"PRAGMA journal_mode={DATABASE_SETTINGS['journal_mode']}")
+                    await conn.execute(f"PRAGMA synchronous={DATABASE_SETTINGS['synchronous']}")
+                    await self._apply_pragmas(conn)
+                    self._connection = conn
+                    logger.info("Database writer connection established")
         return self._connection
-    
+
+    async def _open_reader(self) -> aiosqlite.Connection:
+        """Open a new read-only connection to the database file."""
+        # The writer creates the file and switches it to WAL before any reader opens it
+        await self.get_connection()
+        uri = f"file:{pathname2url(str(Path(self.db_path).resolve()))}?mode=ro"
+        conn = await aiosqlite.connect(uri, uri=True, timeout=self.timeout)
+        await self._apply_pragmas(conn)
+        await conn.execute("PRAGMA query_only=ON")
+        self._readers.append(conn)
+        logger.debug(f"Read-only connection opened ({len(self._readers)}/{self.pool_size})")
+        return conn
+
+    async def _acquire_reader(self) -> aiosqlite.Connection:
+        """Take an idle reader, open a new one, or wait until one is released."""
+        start = time.perf_counter()
+        blocked = False
+        try:
+            conn = self._idle_readers.get_nowait()
+        except asyncio.QueueEmpty:
+            if self._readers_reserved < self.pool_size:
+                # Reserve the slot before awaiting so concurrent callers can't overshoot
+                self._readers_reserved += 1
+                try:
+                    conn = await self._open_reader()
+                except BaseException:
+                    self._readers_reserved -= 1
+                    raise
+            else:
+                blocked = True
+                conn = await asyncio.wait_for(self._idle_readers.get(), self.timeout)
+        self.reader_stats.record(time.perf_counter() - start, blocked)
+        return conn
+
+    def _release_reader(self, conn: aiosqlite.Connection) -> None:
+        """Return a reader to the pool."""
+        if conn in self._readers:
+            self._idle_readers.put_nowait(conn)
+
+    async def explain(self, sql: str, parameters: Sequence[Any] = ()) -> List[str]:
+        """EXPLAIN QUERY PLAN for a statement, on an untraced read-only cursor."""
+        async with self.get_cursor(readonly=True, trace=False) as cursor:
+            await cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            return [row[3] for row in await cursor.fetchall()]
+
     async def close(self):
-        """Close the database connection."""
+        """Close all database connections."""
+        await self.slow_queries.drain()
+        for conn in self._readers:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing read-only connection: {e}")
+        self._readers = []
+        self._readers_reserved = 0
         if self._connection:
             try:
+                if DATABASE_SETTINGS.get("optimize_on_close"):
+                    await self._connection.execute("PRAGMA optimize")
                 await self._connection.close()
                 logger.info("Database connection closed")
             except Exception as e:
                 logger.warning(f"Error closing database connection: {e}")
             finally:
                 self._connection = None
-    
+        self._reset_primitives()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get pool size and wait-time statistics for readers and the writer."""
+        return {
+            "pool_size": self.pool_size,
+            "readers_open": len(self._readers),
+            "readers_idle": self._idle_readers.qsize(),
+            "reader": self.reader_stats.as_dict(),
+            "writer": self.writer_stats.as_dict(),
+        }
+
     @asynccontextmanager
-    async def get_cursor(self):
-        """Get a database cursor with automatic cleanup."""
+    async def get_cursor(self, readonly: bool = False, trace: Optional[bool] = None):
+        """
+        Get a database cursor with automatic cleanup.
+
+        Read-only cursors come from the reader pool; all other cursors share the
+        single writer connection, which is held exclusively for the block and
+        committed when it exits cleanly (rolled back on error). Tracing cursors
+        (the manager default unless `trace` overrides it) report slow statements
+        to `slow_queries`.
+        """
+        slow_log = self.slow_queries if (self.trace if trace is None else trace) else None
+        if readonly and self.readers_enabled:
+            conn = await self._acquire_reader()
+            try:
+                cursor = await conn.cursor()
+                try:
+                    yield InstrumentedCursor(cursor, slow_log)
+                finally:
+                    await cursor.close()
+            finally:
+                self._release_reader(conn)
+            return
+
         conn = await self.get_connection()
-        cursor = await conn.cursor()
-        try:
-            yield cursor
-        finally:
-            await cursor.close()
+        start = time.perf_counter()
+        blocked = self._writer_lock.locked()
+        async with self._writer_lock:
+            self.writer_stats.record(time.perf_counter() - start, blocked)
+            cursor = await conn.cursor()
+            try:
+                yield InstrumentedCursor(cursor, slow_log)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                await cursor.close()
 
 # Global database manager instance
 db_manager = DatabaseManager()
@@ -66,7 +237,7 @@ async def get_db_connection():
         pass
 
 @asynccontextmanager
-async def get_db_cursor():
-    """Context manager for database cursors."""
-    async with db_manager.get_cursor() as cursor:
+async def get_db_cursor(readonly: bool = False):
+    """Context manager for database cursors; pass readonly=True for queries."""
+    async with db_manager.get_cursor(readonly=readonly) as cursor:
         yield cursor
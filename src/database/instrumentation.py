@@ -0,0 +1,310 @@
+"""
+Per-update query accounting.
+
+Every cursor handed out by DatabaseManager and every statement queued on the
+write queue reports to the QueryAccount of the update being handled (tracked
+in a context variable). Handlers declare how many queries they may issue
+with ``@query_budget(n)``; the account is checked when the handler returns.
+
+Tracing cursors additionally report statements slower than a threshold to a
+SlowQueryLog: a rate-limited ring buffer of the statement, its parameter
+shapes, the handler that caused it and its EXPLAIN QUERY PLAN.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import wraps
+from typing import Any, Awaitable, Callable, Coroutine, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from src.config.config import QUERY_BUDGET_SETTINGS, SLOW_QUERY_SETTINGS
+from src.utils.performance import BotError
+
+logger = logging.getLogger(__name__)
+
+# Raise instead of logging when a handler exceeds its budget (enabled in tests)
+STRICT_BUDGETS: bool = QUERY_BUDGET_SETTINGS["strict"]
+
+
+class QueryBudgetExceeded(BotError):
+    """A handler issued more queries than it declared."""
+    pass
+
+
+@dataclass
+class QueryAccount:
+    """Queries and DB time spent while handling one update."""
+    handler: str
+    queries: int = 0
+    db_time: float = 0.0
+
+
+@dataclass
+class HandlerQueryStats:
+    """Aggregated query accounting for one handler."""
+    budget: int
+    updates: int = 0
+    queries: int = 0
+    db_time: float = 0.0
+    max_queries: int = 0
+    over_budget: int = 0
+
+    def reset(self) -> None:
+        """Zero the counters, keeping the declared budget."""
+        self.updates = self.queries = self.max_queries = self.over_budget = 0
+        self.db_time = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "budget": self.budget,
+            "updates": self.updates,
+            "avg_queries": self.queries / self.updates if self.updates else 0.0,
+            "max_queries": self.max_queries,
+            "avg_db_time": self.db_time / self.updates if self.updates else 0.0,
+            "over_budget": self.over_budget,
+        }
+
+
+@dataclass
+class SlowQuery:
+    """A statement that ran longer than the slow-query threshold."""
+    sql: str
+    param_shapes: Tuple[str, ...]
+    elapsed: float
+    handler: Optional[str]
+    recorded_at: datetime
+    plan: List[str] = field(default_factory=list)
+
+
+_current_account: ContextVar[Optional[QueryAccount]] = ContextVar("query_account", default=None)
+# Handler a statement is attributed to when it runs outside that handler's context
+_traced_handler: ContextVar[Optional[str]] = ContextVar("traced_handler", default=None)
+handler_stats: Dict[str, HandlerQueryStats] = {}
+
+# Only these statements have a query plan worth capturing
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE")
+
+
+def current_account() -> Optional[QueryAccount]:
+    """Get the account of the update currently being handled, if any."""
+    return _current_account.get()
+
+
+def record_query(elapsed: float, count: int = 1) -> None:
+    """Charge queries and DB time to the current update."""
+    account = _current_account.get()
+    if account is not None:
+        account.queries += count
+        account.db_time += elapsed
+
+
+def current_handler() -> Optional[str]:
+    """Name of the handler the current statement is attributed to, if any."""
+    handler = _traced_handler.get()
+    if handler is None:
+        account = _current_account.get()
+        handler = account.handler if account is not None else None
+    return handler
+
+
+@contextmanager
+def attributed_to(handler: Optional[str]):
+    """Attribute statements run inside the block to `handler` (e.g. in the write queue)."""
+    token = _traced_handler.set(handler)
+    try:
+        yield
+    finally:
+        _traced_handler.reset(token)
+
+
+def spawn_detached(coro: Coroutine[Any, Any, Any], name: Optional[str] = None) -> asyncio.Task:
+    """
+    Start a background task on the running loop, outside the current update.
+
+    Tasks copy the context of whoever creates them, so a flusher or plan
+    capture started while handling an update would charge its queries to that
+    update's account and handler. The task runs in an empty context instead.
+    """
+    return contextvars.Context().run(asyncio.get_running_loop().create_task, coro, name=name)
+
+
+def param_shapes(parameters: Any) -> Tuple[str, ...]:
+    """Describe bound parameters by type only, so values never reach the log."""
+    if parameters is None:
+        return ()
+    if isinstance(parameters, dict):
+        return tuple(f"{key}:{type(value).__name__}" for key, value in parameters.items())
+    return tuple(type(value).__name__ for value in parameters)
+
+
+class SlowQueryLog:
+    """Rate-limited ring buffer of statements slower than the threshold."""
+
+    def __init__(
+        self,
+        settings: Dict[str, Any] = SLOW_QUERY_SETTINGS,
+        explain: Optional[Callable[[str, Sequence[Any]], Awaitable[List[str]]]] = None,
+    ):
+        self.threshold = settings["threshold_ms"] / 1000
+        self.max_per_minute = settings["max_per_minute"]
+        self.capture_plans = settings["explain"]
+        self.entries: Deque[SlowQuery] = deque(maxlen=settings["buffer_size"])
+        self.explain = explain
+        self.recorded = 0
+        self.dropped = 0
+        self._window_start = 0.0
+        self._window_count = 0
+        self._explains: Set[asyncio.Task] = set()
+
+    def _allow(self) -> bool:
+        """Fixed one-minute window limit on recorded entries."""
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_count = 0
+        if self._window_count >= self.max_per_minute:
+            return False
+        self._window_count += 1
+        return True
+
+    def record(self, sql: str, parameters: Any, elapsed: float) -> Optional[SlowQuery]:
+        """Record a statement if it was slow and the rate limit allows it."""
+        if elapsed < self.threshold:
+            return None
+        if not self._allow():
+            self.dropped += 1
+            return None
+
+        entry = SlowQuery(
+            sql=" ".join(sql.split()),
+            param_shapes=param_shapes(parameters),
+            elapsed=elapsed,
+            handler=current_handler(),
+            recorded_at=datetime.utcnow(),
+        )
+        self.entries.append(entry)
+        self.recorded += 1
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f}ms, handler={entry.handler}, "
+            f"params={entry.param_shapes}): {entry.sql}"
+        )
+        if self.capture_plans and self.explain is not None and entry.sql.upper().startswith(_EXPLAINABLE):
+            task = spawn_detached(self._capture_plan(entry, sql, parameters), name="slow-query-explain")
+            self._explains.add(task)
+            task.add_done_callback(self._explains.discard)
+        return entry
+
+    async def _capture_plan(self, entry: SlowQuery, sql: str, parameters: Any) -> None:
+        """Fill in the query plan of a recorded entry."""
+        try:
+            entry.plan = await self.explain(sql, parameters if parameters is not None else ())
+            logger.warning(f"Slow query plan: {' | '.join(entry.plan)}")
+        except Exception as e:
+            logger.debug(f"Could not explain slow query: {e}")
+
+    async def drain(self) -> None:
+        """Wait for pending plan captures."""
+        if self._explains:
+            await asyncio.gather(*self._explains, return_exceptions=True)
+
+    def get_entries(self) -> List[SlowQuery]:
+        """Get recorded slow statements, oldest first."""
+        return list(self.entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counters of recorded and rate-limited entries."""
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "buffered": len(self.entries),
+        }
+
+
+class InstrumentedCursor:
+    """Cursor proxy that charges each execute to the current update and traces slow ones."""
+
+    def __init__(self, cursor, slow_log: Optional[SlowQueryLog] = None):
+        self._cursor = cursor
+        self._slow_log = slow_log
+
+    def _finish(self, sql: str, parameters: Any, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        record_query(elapsed)
+        if self._slow_log is not None:
+            self._slow_log.record(sql, parameters, elapsed)
+
+    async def execute(self, sql: str, parameters=None):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(sql, parameters)
+        finally:
+            self._finish(sql, parameters, start)
+
+    async def executemany(self, sql: str, parameters):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(sql, parameters)
+        finally:
+            # Parameter sets may be a one-shot iterator; don't explain or describe them
+            self._finish(sql, None, start)
+
+    def __aiter__(self):
+        return self._cursor.__aiter__()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Declare the maximum number of queries a handler may issue per update."""
+    def decorator(func: Callable) -> Callable:
+        stats = handler_stats.setdefault(func.__name__, HandlerQueryStats(budget=max_queries))
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            parent = _current_account.get()
+            account = QueryAccount(handler=func.__name__)
+            token = _current_account.set(account)
+            try:
+                result = await func(*args, **kwargs)
+            finally:
+                _current_account.reset(token)
+                # A handler called from another handler also counts against the caller
+                if parent is not None:
+                    parent.queries += account.queries
+                    parent.db_time += account.db_time
+                stats.updates += 1
+                stats.queries += account.queries
+                stats.db_time += account.db_time
+                stats.max_queries = max(stats.max_queries, account.queries)
+            if account.queries > max_queries:
+                stats.over_budget += 1
+                message = (
+                    f"{func.__name__} issued {account.queries} queries "
+                    f"(budget {max_queries}, {account.db_time * 1000:.1f}ms in DB)"
+                )
+                if STRICT_BUDGETS:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return result
+
+        wrapper.__query_budget__ = max_queries
+        return wrapper
+    return decorator
+
+
+def get_handler_stats() -> Dict[str, Dict[str, float]]:
+    """Get query accounting for every budgeted handler."""
+    return {name: stats.as_dict() for name, stats in handler_stats.items()}
+
+
+def reset_handler_stats() -> None:
+    """Zero the accounting of every budgeted handler (each wrapper keeps its entry)."""
+    for stats in handler_stats.values():
+        stats.reset()
@@ -0,0 +1,181 @@
+"""
+Scheduled SQLite maintenance.
+
+Keeps the WAL from growing without bound, refreshes planner statistics and
+returns free pages to the filesystem in small steps during quiet hours.
+Every run is recorded with its duration and the pages it freed.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List
+
+from src.config.config import MAINTENANCE_SETTINGS
+from src.database.connection import DatabaseManager, db_manager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MaintenanceRun:
+    """Result of a single maintenance task run."""
+    task: str
+    started_at: datetime
+    duration: float
+    pages_freed: int = 0
+    details: Dict[str, Any] = field(default_factory=dict)
+
+
+class DatabaseMaintenance:
+    """Runs WAL checkpoints, PRAGMA optimize/ANALYZE and incremental vacuum."""
+
+    def __init__(self, manager: DatabaseManager = db_manager, settings: Dict[str, Any] = MAINTENANCE_SETTINGS):
+        self.manager = manager
+        self.settings = settings
+        self.history: Deque[MaintenanceRun] = deque(maxlen=200)
+
+    def _wal_size(self) -> int:
+        """Current size of the WAL file in bytes (0 if absent)."""
+        try:
+            return os.path.getsize(f"{self.manager.db_path}-wal")
+        except OSError:
+            return 0
+
+    async def _pragma_value(self, name: str) -> int:
+        """Read a single integer PRAGMA value."""
+        async with self.manager.get_cursor(readonly=True) as cursor:
+            await cursor.execute(f"PRAGMA {name}")
+            return (await cursor.fetchone())[0]
+
+    def _record(self, run: MaintenanceRun) -> MaintenanceRun:
+        """Store a run in the history and log it."""
+        self.history.append(run)
+        logger.info(
+            f"DB maintenance '{run.task}' took {run.duration * 1000:.1f}ms, "
+            f"freed {run.pages_freed} pages {run.details}"
+        )
+        return run
+
+    async def checkpoint(self) -> MaintenanceRun:
+        """PASSIVE checkpoint, escalating to TRUNCATE once the WAL exceeds the threshold."""
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        wal_before = self._wal_size()
+        threshold = self.settings["wal_truncate_threshold_mb"] * 1024 * 1024
+        mode = "TRUNCATE" if wal_before >= threshold else "PASSIVE"
+
+        async with self.manager.get_cursor() as cursor:
+            # TRUNCATE reports 0 frames once it has reset the WAL, so the frame
+            # counts come from a PASSIVE pass that runs first
+            await cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            busy, log_frames, checkpointed = await cursor.fetchone()
+            if mode == "TRUNCATE":
+                await cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                busy = (await cursor.fetchone())[0]
+
+        wal_after = self._wal_size()
+        return self._record(MaintenanceRun(
+            task="checkpoint",
+            started_at=started_at,
+            duration=time.perf_counter() - start,
+            # Frames copied back into the database file, as reported by SQLite
+            # (-1 when the database is not in WAL mode)
+            pages_freed=max(0, checkpointed),
+            details={
+                "mode": mode,
+                "busy": busy,
+                "wal_frames": log_frames,
+                "wal_bytes_before": wal_before,
+                "wal_bytes_after": wal_after,
+            },
+        ))
+
+    async def optimize(self, analyze: bool = False) -> MaintenanceRun:
+        """Run PRAGMA optimize, optionally followed by a full ANALYZE."""
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        async with self.manager.get_cursor() as cursor:
+            await cursor.execute("PRAGMA optimize")
+            if analyze:
+                await cursor.execute("ANALYZE")
+        return self._record(MaintenanceRun(
+            task="analyze" if analyze else "optimize",
+            started_at=started_at,
+            duration=time.perf_counter() - start,
+        ))
+
+    def in_quiet_hours(self, now: datetime = None) -> bool:
+        """Whether the current UTC hour falls within the configured quiet hours."""
+        start_hour, end_hour = (int(h) for h in self.settings["quiet_hours_utc"].split("-"))
+        hour = (now or datetime.utcnow()).hour
+        if start_hour <= end_hour:
+            return start_hour <= hour < end_hour
+        return hour >= start_hour or hour < end_hour
+
+    async def incremental_vacuum(self, force: bool = False) -> MaintenanceRun:
+        """Release free pages in bounded steps, yielding the writer between steps."""
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        if not force and not self.in_quiet_hours():
+            return MaintenanceRun(task="incremental_vacuum", started_at=started_at, duration=0.0,
+                                  details={"skipped": "outside quiet hours"})
+
+        free_before = await self._pragma_value("freelist_count")
+        pages_per_step = self.settings["vacuum_pages_per_step"]
+        steps = 0
+        free = free_before
+        while free > 0 and steps < self.settings["vacuum_max_steps"]:
+            async with self.manager.get_cursor() as cursor:
+                await cursor.execute(f"PRAGMA incremental_vacuum({pages_per_step})")
+                await cursor.fetchall()
+            steps += 1
+            free = await self._pragma_value("freelist_count")
+            # Let queued interactive writes through between steps
+            await asyncio.sleep(0)
+
+        return self._record(MaintenanceRun(
+            task="incremental_vacuum",
+            started_at=started_at,
+            duration=time.perf_counter() - start,
+            pages_freed=free_before - free,
+            details={"steps": steps, "freelist_remaining": free},
+        ))
+
+    async def _run_safely(self, task: str, func, **kwargs) -> None:
+        """Scheduler entry point: never let a maintenance failure kill the job."""
+        try:
+            await func(**kwargs)
+        except Exception as e:
+            logger.error(f"DB maintenance '{task}' failed: {e}")
+
+    def register_jobs(self, scheduler) -> None:
+        """Add the maintenance jobs to an AsyncIOScheduler."""
+        scheduler.add_job(
+            self._run_safely, 'interval', args=["checkpoint", self.checkpoint],
+            minutes=self.settings["checkpoint_interval_minutes"], id="db_checkpoint",
+        )
+        scheduler.add_job(
+            self._run_safely, 'interval', args=["optimize", self.optimize],
+            hours=self.settings["optimize_interval_hours"], id="db_optimize",
+        )
+        scheduler.add_job(
+            self._run_safely, 'cron', args=["analyze", self.optimize], kwargs={"analyze": True},
+            hour=self.settings["analyze_hour_utc"], minute=30, timezone='UTC', id="db_analyze",
+        )
+        # Checks quiet hours itself, so wrap-around ranges like "23-5" work
+        scheduler.add_job(
+            self._run_safely, 'cron', args=["incremental_vacuum", self.incremental_vacuum],
+            minute='*/15', timezone='UTC', id="db_incremental_vacuum",
+        )
+
+    def get_history(self, task: str = None) -> List[MaintenanceRun]:
+        """Get recorded runs, optionally for one task only."""
+        return [run for run in self.history if task is None or run.task == task]
+
+
+# Global maintenance runner bound to the global database manager
+db_maintenance = DatabaseMaintenance()
@@ -0,0 +1,148 @@
+"""
+In-memory mantra catalog.
+
+The mantras table is small and changes only when MANTRAS_DATA does, so it is
+loaded once into per-category tuples and random picks never touch SQLite.
+Triggers bump a version row on every change to the table; a periodic check
+compares it with the loaded version and swaps in a fresh index atomically.
+"""
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.config.config import MANTRA_CATALOG_SETTINGS
+from src.data import MANTRAS_DATA
+from src.database.models import Mantra
+from src.database.queries import QueryCatalog, query_catalog
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _CatalogIndex:
+    """Immutable snapshot of the mantras table, indexed by category."""
+    version: Optional[int]
+    mantras: Tuple[Mantra, ...] = ()
+    by_category: Dict[str, Tuple[Mantra, ...]] = field(default_factory=dict)
+
+
+class MantraCatalog:
+    """Category-indexed in-memory copy of the mantras table."""
+
+    def __init__(self, queries: QueryCatalog = query_catalog, settings: Dict[str, Any] = MANTRA_CATALOG_SETTINGS):
+        self.queries = queries
+        self.settings = settings
+        self._index: Optional[_CatalogIndex] = None
+        self._load_lock = asyncio.Lock()
+        self.reloads = 0
+
+    @property
+    def version(self) -> Optional[int]:
+        """Version of the loaded index (None before the first load)."""
+        return self._index.version if self._index is not None else None
+
+    async def load(self) -> None:
+        """Read the whole table and atomically replace the index."""
+        rows = await self.queries.fetch_all("mantra_catalog")
+        by_category: Dict[str, List[Mantra]] = {}
+        mantras = []
+        for row in rows:
+            mantra = Mantra(mantra_id=row[1], category=row[2], ossetian_text=row[3], russian_translation=row[4])
+            mantras.append(mantra)
+            by_category.setdefault(mantra.category, []).append(mantra)
+
+        self._index = _CatalogIndex(
+            version=rows[0][0] if rows else None,
+            mantras=tuple(mantras),
+            by_category={category: tuple(items) for category, items in by_category.items()},
+        )
+        self.reloads += 1
+        logger.info(f"Mantra catalog loaded: {len(mantras)} mantras in {len(by_category)} categories")
+
+    async def _ensure_loaded(self) -> _CatalogIndex:
+        """Load the index on first use (once, however many callers race)."""
+        if self._index is None:
+            async with self._load_lock:
+                if self._index is None:
+                    await self.load()
+        return self._index
+
+    async def check_for_changes(self) -> bool:
+        """Reload if the table changed since the last load. Returns True if reloaded."""
+        if self._index is None:
+            await self._ensure_loaded()
+            return True
+        row = await self.queries.fetch_one("mantra_catalog_version")
+        version = row[0] if row else None
+        if version == self._index.version:
+            return False
+        async with self._load_lock:
+            await self.load()
+        return True
+
+    async def sync_from_data(self, data: Sequence[Tuple[str, str, Optional[str]]] = MANTRAS_DATA) -> int:
+        """Make the table match `data` and reload if anything changed. Returns rows changed."""
+        index = await self._ensure_loaded()
+        wanted = {text for _, text, _ in data}
+        statements = [("upsert_mantra", tuple(item)) for item in data]
+        statements += [
+            ("delete_mantra", (mantra.mantra_id,))
+            for mantra in index.mantras if mantra.ossetian_text not in wanted
+        ]
+        results = await self.queries.execute_unit(statements)
+        changed = sum(max(result.rowcount, 0) for result in results)
+        if changed:
+            logger.info(f"Mantra catalog synced from MANTRAS_DATA: {changed} rows changed")
+            await self.check_for_changes()
+        return changed
+
+    async def random_mantra(self) -> Optional[Mantra]:
+        """A random mantra from the whole catalog."""
+        index = await self._ensure_loaded()
+        return random.choice(index.mantras) if index.mantras else None
+
+    async def random_mantra_by_category(self, category: str) -> Optional[Mantra]:
+        """A random mantra of `category`, or from the whole catalog if it has none."""
+        index = await self._ensure_loaded()
+        candidates = index.by_category.get(category) or index.mantras
+        return random.choice(candidates) if candidates else None
+
+    async def get_categories(self) -> List[str]:
+        """All categories, in catalog order."""
+        index = await self._ensure_loaded()
+        return list(index.by_category)
+
+    def register_jobs(self, scheduler) -> None:
+        """Add the periodic change check to an AsyncIOScheduler."""
+        scheduler.add_job(
+            self._check_safely, 'interval',
+            seconds=self.settings["reload_check_seconds"], id="mantra_catalog_reload",
+        )
+
+    async def _check_safely(self) -> None:
+        """Run the reload check from the scheduler, logging failures instead of raising."""
+        try:
+            await self.check_for_changes()
+        except Exception as e:
+            logger.error(f"Mantra catalog reload check failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the loaded version and size."""
+        index = self._index
+        return {
+            "version": index.version if index else None,
+            "mantras": len(index.mantras) if index else 0,
+            "categories": len(index.by_category) if index else 0,
+            "reloads": self.reloads,
+        }
+
+    def reset(self) -> None:
+        """Forget the loaded index (the next read loads it again)."""
+        self._index = None
+        self._load_lock = asyncio.Lock()
+
+
+# Global mantra catalog backed by the global query catalog
+mantra_catalog = MantraCatalog()
@@ -0,0 +1,375 @@
+"""
+Versioned schema migrations.
+
+Migrations are applied in order at startup. Each one runs in its own
+transaction and is recorded in the ``schema_version`` table, so a database
+only ever moves forward and re-running the migrator is a no-op. Data
+backfills run in small committed chunks and are resumable. Statements
+are written to be idempotent as well, because databases created by the old
+bot already contain some of the tables.
+"""
+import logging
+import sqlite3
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import aiosqlite
+
+from src.config.config import (
+    DEFAULT_PHASE, DEFAULT_CITY_NAME, DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE, DEFAULT_TIMEZONE
+)
+from src.database.connection import DatabaseManager, db_manager
+from src.database.models import CATEGORY_BITS, CATEGORY_MASK_SQL
+from src.data import MANTRAS_DATA
+from src.utils.utils import local_day_ordinal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A single schema migration step."""
+    version: int
+    name: str
+    statements: Tuple[str, ...] = ()
+    apply: Optional[Callable[[aiosqlite.Cursor], Awaitable[None]]] = None
+    # Called repeatedly, one committed transaction per chunk, until it returns 0
+    backfill: Optional[Callable[[aiosqlite.Cursor], Awaitable[int]]] = None
+    # Statements such as VACUUM cannot run inside a transaction
+    transactional: bool = True
+
+
+# Rows updated per backfill transaction, so the writer lock is never held long
+BACKFILL_CHUNK_SIZE = 1000
+
+# julianday() of a date minus this is its Python date.toordinal()
+JULIAN_DAY_ORDINAL_OFFSET = 1721424.5
+
+
+async def _add_missing_user_columns(cursor: aiosqlite.Cursor) -> None:
+    """Bring users tables created by the old bot up to the current column set."""
+    await cursor.execute("PRAGMA table_info(users)")
+    existing = {row[1] for row in await cursor.fetchall()}
+    columns = {
+        "last_login": "TIMESTAMP",
+        "location_city": f"TEXT DEFAULT '{DEFAULT_CITY_NAME}'",
+        "location_lat": f"REAL DEFAULT {DEFAULT_LATITUDE}",
+        "location_lon": f"REAL DEFAULT {DEFAULT_LONGITUDE}",
+        "timezone": f"TEXT DEFAULT '{DEFAULT_TIMEZONE}'",
+    }
+    for column, definition in columns.items():
+        if column not in existing:
+            logger.info(f"Migrating users: adding column {column}")
+            await cursor.execute(f"ALTER TABLE users ADD COLUMN {column} {definition}")
+
+
+async def _seed_mantras(cursor: aiosqlite.Cursor) -> None:
+    """Fill the mantras table from MANTRAS_DATA if it is empty."""
+    await cursor.execute("SELECT COUNT(*) FROM mantras")
+    if (await cursor.fetchone())[0] == 0:
+        await cursor.executemany(
+            "INSERT OR IGNORE INTO mantras (category, ossetian_text, russian_translation) VALUES (?, ?, ?)",
+            MANTRAS_DATA
+        )
+        logger.info(f"Seeded {len(MANTRAS_DATA)} mantras")
+
+
+async def _add_column_if_missing(cursor: aiosqlite.Cursor, table: str, column: str, definition: str) -> None:
+    """ALTER TABLE ... ADD COLUMN unless a previous (interrupted) run already did."""
+    await cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in await cursor.fetchall()}:
+        await cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def _add_user_created_at(cursor: aiosqlite.Cursor) -> None:
+    """Add users.created_at, which lets the user upsert report via RETURNING whether it inserted."""
+    await _add_column_if_missing(cursor, "users", "created_at", "TIMESTAMP")
+
+
+async def _add_day_ordinal_columns(cursor: aiosqlite.Cursor) -> None:
+    """Add integer local-day columns to the diary and activity tables."""
+    await _add_column_if_missing(cursor, "diary_entries", "day_ordinal", "INTEGER")
+    await _add_column_if_missing(cursor, "daily_activity", "day_ordinal", "INTEGER")
+
+
+async def _backfill_day_ordinals(cursor: aiosqlite.Cursor) -> int:
+    """Fill day_ordinal for one chunk of existing rows. Returns rows updated."""
+    # activity_date already is the local date the row was logged for
+    await cursor.execute(
+        f"""UPDATE daily_activity
+           SET day_ordinal = CAST(julianday(activity_date) - {JULIAN_DAY_ORDINAL_OFFSET} AS INTEGER)
+           WHERE activity_id IN (
+               SELECT activity_id FROM daily_activity WHERE day_ordinal IS NULL LIMIT ?
+           )""",
+        (BACKFILL_CHUNK_SIZE,)
+    )
+    updated = cursor.rowcount
+
+    # Diary timestamps are stored in UTC and bucketed by the author's timezone
+    await cursor.execute(
+        """SELECT d.entry_id, d.timestamp, u.timezone FROM diary_entries d
+           LEFT JOIN users u ON u.user_id = d.user_id
+           WHERE d.day_ordinal IS NULL LIMIT ?""",
+        (BACKFILL_CHUNK_SIZE,)
+    )
+    rows = await cursor.fetchall()
+    updates = []
+    for entry_id, timestamp, tz in rows:
+        try:
+            moment = datetime.fromisoformat(str(timestamp))
+        except ValueError:
+            moment = datetime.utcnow()
+        updates.append((local_day_ordinal(tz, moment), entry_id))
+    if updates:
+        await cursor.executemany(
+            "UPDATE diary_entries SET day_ordinal = ? WHERE entry_id = ?", updates
+        )
+    return updated + len(updates)
+
+
+async def _enable_incremental_auto_vacuum(cursor: aiosqlite.Cursor) -> None:
+    """
+    Switch to auto_vacuum=INCREMENTAL; existing files need a VACUUM to take it.
+
+    The VACUUM rewrites the whole database once, on the first startup after
+    this migration ships, and blocks startup and every other writer until it
+    finishes; its duration grows with the size of the file. On a fresh
+    database it only rewrites the empty tables created above.
+    """
+    await cursor.execute("PRAGMA auto_vacuum")
+    if (await cursor.fetchone())[0] != 2:
+        await cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await cursor.execute("VACUUM")
+        logger.info("Database rebuilt with auto_vacuum=INCREMENTAL")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="base schema",
+        statements=(
+            f"""CREATE TABLE IF NOT EXISTS users (
+                user_id       INTEGER PRIMARY KEY,
+                current_phase TEXT    NOT NULL DEFAULT '{DEFAULT_PHASE}',
+                first_name    TEXT,
+                streak        INTEGER DEFAULT 0
+            )""",
+            """CREATE TABLE IF NOT EXISTS diary_entries (
+                entry_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id    INTEGER NOT NULL,
+                timestamp  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                entry_text TEXT    NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )""",
+            """CREATE TABLE IF NOT EXISTS mantras (
+                mantra_id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                category            TEXT    NOT NULL,
+                ossetian_text       TEXT    NOT NULL UNIQUE,
+                russian_translation TEXT
+            )""",
+            """CREATE TABLE IF NOT EXISTS daily_activity (
+                activity_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id       INTEGER NOT NULL,
+                activity_date DATE    DEFAULT CURRENT_DATE,
+                category      TEXT    NOT NULL,
+                completed     BOOLEAN DEFAULT FALSE,
+                timestamp     DATETIME DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, activity_date, category)
+            )""",
+        ),
+        apply=_add_missing_user_columns,
+    ),
+    Migration(version=2, name="seed mantras", apply=_seed_mantras),
+    Migration(
+        version=3,
+        name="covering indexes for repository queries",
+        statements=(
+            # Per-user daily status and weekly stats
+            """CREATE INDEX IF NOT EXISTS idx_activity_user_date
+               ON daily_activity(user_id, activity_date, category, completed)""",
+            # Community stats and cleanup of old rows
+            """CREATE INDEX IF NOT EXISTS idx_activity_date
+               ON daily_activity(activity_date, completed, category, user_id)""",
+            # Weekly diary counts and the latest entries
+            """CREATE INDEX IF NOT EXISTS idx_diary_user_timestamp
+               ON diary_entries(user_id, timestamp)""",
+            """CREATE INDEX IF NOT EXISTS idx_mantras_category
+               ON mantras(category)""",
+        ),
+    ),
+    Migration(
+        version=4,
+        name="day ordinal columns",
+        apply=_add_day_ordinal_columns,
+        backfill=_backfill_day_ordinals,
+    ),
+    Migration(
+        version=5,
+        name="day ordinal indexes",
+        statements=(
+            "DROP INDEX IF EXISTS idx_activity_user_date",
+            "DROP INDEX IF EXISTS idx_activity_date",
+            """CREATE INDEX IF NOT EXISTS idx_activity_user_day
+               ON daily_activity(user_id, day_ordinal, category, completed)""",
+            """CREATE INDEX IF NOT EXISTS idx_activity_day
+               ON daily_activity(day_ordinal, completed, category, user_id)""",
+            """CREATE INDEX IF NOT EXISTS idx_diary_user_day
+               ON diary_entries(user_id, day_ordinal)""",
+        ),
+    ),
+    Migration(
+        version=6,
+        name="daily summary bitmask history",
+        statements=(
+            """CREATE TABLE IF NOT EXISTS daily_summary (
+                user_id         INTEGER NOT NULL,
+                day_ordinal     INTEGER NOT NULL,
+                categories_mask INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day_ordinal)
+            ) WITHOUT ROWID""",
+            # Community stats over a day range
+            """CREATE INDEX IF NOT EXISTS idx_summary_day
+               ON daily_summary(day_ordinal, user_id, categories_mask)""",
+            # Fold all existing activity rows into the summary
+            f"""INSERT INTO daily_summary (user_id, day_ordinal, categories_mask)
+               SELECT user_id, day_ordinal, SUM(DISTINCT {CATEGORY_MASK_SQL})
+               FROM daily_activity
+               WHERE completed = TRUE AND day_ordinal IS NOT NULL
+               GROUP BY user_id, day_ordinal
+               ON CONFLICT(user_id, day_ordinal)
+               DO UPDATE SET categories_mask = categories_mask | excluded.categories_mask""",
+        ),
+    ),
+    Migration(
+        version=7,
+        name="incremental auto vacuum",
+        apply=_enable_incremental_auto_vacuum,
+        transactional=False,
+    ),
+    Migration(
+        version=8,
+        name="single-statement writes",
+        statements=(
+            # Keep the bitmask history in step with raw activity inside the same statement
+            """CREATE TRIGGER IF NOT EXISTS trg_activity_summary
+               AFTER INSERT ON daily_activity WHEN NEW.completed
+               BEGIN
+                   INSERT INTO daily_summary (user_id, day_ordinal, categories_mask)
+                   VALUES (NEW.user_id, NEW.day_ordinal, CASE NEW.category {} ELSE 0 END)
+                   ON CONFLICT(user_id, day_ordinal)
+                   DO UPDATE SET categories_mask = categories_mask | excluded.categories_mask;
+               END""".format(" ".join(f"WHEN '{cat}' THEN {bit}" for cat, bit in CATEGORY_BITS.items())),
+        ),
+        apply=_add_user_created_at,
+    ),
+    Migration(
+        version=9,
+        name="mantra catalog version",
+        statements=(
+            # Bumped by triggers on every change, so the in-memory catalog knows when to reload
+            """CREATE TABLE IF NOT EXISTS catalog_version (
+                name    TEXT    PRIMARY KEY,
+                version INTEGER NOT NULL
+            ) WITHOUT ROWID""",
+            "INSERT OR IGNORE INTO catalog_version (name, version) VALUES ('mantras', 1)",
+            *(
+                f"""CREATE TRIGGER IF NOT EXISTS trg_mantras_version_{event.lower()}
+                   AFTER {event} ON mantras
+                   BEGIN
+                       UPDATE catalog_version SET version = version + 1 WHERE name = 'mantras';
+                   END"""
+                for event in ("INSERT", "UPDATE", "DELETE")
+            ),
+        ),
+    ),
+    Migration(
+        version=10,
+        name="fsm state",
+        statements=(
+            # Only users with a state or data have a row; data is JSON
+            """CREATE TABLE IF NOT EXISTS fsm_state (
+                storage_key TEXT    PRIMARY KEY,
+                state       TEXT,
+                data        TEXT,
+                expires_at  INTEGER NOT NULL
+            ) WITHOUT ROWID""",
+            "CREATE INDEX IF NOT EXISTS idx_fsm_state_expires ON fsm_state(expires_at)",
+        ),
+    ),
+]
+
+
+async def get_schema_version(cursor: aiosqlite.Cursor) -> int:
+    """Return the highest applied migration version (0 for a fresh database)."""
+    await cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return (await cursor.fetchone())[0]
+
+
+async def run_migrations(
+    manager: DatabaseManager = db_manager,
+    migrations: List[Migration] = MIGRATIONS,
+) -> int:
+    """Apply all pending migrations in order. Returns the resulting schema version."""
+    async with manager.get_cursor() as cursor:
+        await cursor.execute(
+            """CREATE TABLE IF NOT EXISTS schema_version (
+                version    INTEGER PRIMARY KEY,
+                name       TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )"""
+        )
+        current = await get_schema_version(cursor)
+
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version <= current:
+                continue
+            logger.info(f"Applying migration {migration.version}: {migration.name}")
+            if not migration.transactional:
+                for statement in migration.statements:
+                    await cursor.execute(statement)
+                if migration.apply is not None:
+                    await migration.apply(cursor)
+                await cursor.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (migration.version, migration.name)
+                )
+                await cursor.execute("COMMIT")
+                current = migration.version
+                continue
+            await cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in migration.statements:
+                    await cursor.execute(statement)
+                if migration.apply is not None:
+                    await migration.apply(cursor)
+                if migration.backfill is not None:
+                    # Commit the schema change; the backfill runs in its own chunks
+                    await cursor.execute("COMMIT")
+                    total = 0
+                    while True:
+                        await cursor.execute("BEGIN IMMEDIATE")
+                        updated = await migration.backfill(cursor)
+                        await cursor.execute("COMMIT")
+                        total += updated
+                        if not updated:
+                            break
+                    logger.info(f"Migration {migration.version} backfilled {total} rows")
+                    await cursor.execute("BEGIN IMMEDIATE")
+                await cursor.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (migration.version, migration.name)
+                )
+                await cursor.execute("COMMIT")
+            except Exception as e:
+                try:
+                    await cursor.execute("ROLLBACK")
+                except sqlite3.OperationalError:
+                    pass  # failed between chunks, nothing open
+                logger.error(f"Migration {migration.version} ({migration.name}) failed: {e}")
+                raise
+            current = migration.version
+
+    logger.info(f"Database schema is at version {current}")
+    return current
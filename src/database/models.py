@@ -6,12 +6,39 @@ from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from enum import Enum
 
+from src.config.config import ACTIVITY_CATEGORIES
+
 class ActivityCategory(str, Enum):
     """Activity categories enum."""
     MINDFULNESS = "mindfulness"
     NATURE = "nature"
     SERVICE = "service"
 
+# Bit assigned to each category in daily_summary.categories_mask.
+# Positions are persisted, so new categories must only ever be appended.
+CATEGORY_BITS: Dict[str, int] = {cat: 1 << i for i, cat in enumerate(ACTIVITY_CATEGORIES)}
+
+
+# SQL expression mapping daily_activity.category to its mask bit
+CATEGORY_MASK_SQL = "CASE category {} ELSE 0 END".format(
+    " ".join(f"WHEN '{cat}' THEN {bit}" for cat, bit in CATEGORY_BITS.items())
+)
+
+
+def category_bit(category: str) -> int:
+    """Get the mask bit for a category (0 for unknown categories)."""
+    return CATEGORY_BITS.get(category, 0)
+
+
+def mask_to_status(mask: int) -> Dict[str, bool]:
+    """Expand a categories mask into a per-category completion map."""
+    return {cat: bool(mask & bit) for cat, bit in CATEGORY_BITS.items()}
+
+
+def status_to_mask(status: Dict[str, bool]) -> int:
+    """Collapse a per-category completion map back into a categories mask."""
+    return sum(bit for cat, bit in CATEGORY_BITS.items() if status.get(cat))
+
 @dataclass
 class User:
     """User model."""
@@ -0,0 +1,358 @@
+"""
+Named query catalog.
+
+Every statement the repositories run is registered here by name and executed
+through QueryCatalog, which records call count, latency percentiles and rows
+per query. Reads go to the pooled read-only cursors (or the analytics
+snapshot), writes to the group-commit write queue. The catalog can also dump
+EXPLAIN QUERY PLAN for every entry, e.g. at startup.
+"""
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.config.config import QUERY_CATALOG_SETTINGS
+from src.database.connection import DatabaseManager, db_manager
+from src.database.models import CATEGORY_BITS, CATEGORY_MASK_SQL
+from src.database.snapshot import AnalyticsSnapshot, analytics_snapshot
+from src.database.write_queue import GroupCommitWriter, WriteResult, write_queue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Query:
+    """A named SQL statement."""
+    name: str
+    sql: str
+    write: bool = False
+    snapshot: bool = False  # read from the analytics snapshot instead of the live pool
+
+
+class QueryMetrics:
+    """Call count, latency samples and row counts for one named query."""
+
+    def __init__(self, sample_size: int):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def record(self, elapsed: float, rows: int) -> None:
+        """Record one successful execution."""
+        self.count += 1
+        self.rows += rows
+        self.total_time += elapsed
+        self.samples.append(elapsed)
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile over the recent samples."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def as_dict(self) -> Dict[str, float]:
+        """Call, error and row counts of one named query with its latency percentiles."""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "avg_rows": self.rows / self.count if self.count else 0.0,
+            "avg": self.total_time / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class QueryCatalog:
+    """Registry of named statements with a single instrumented execution path."""
+
+    def __init__(
+        self,
+        manager: DatabaseManager = db_manager,
+        writer: GroupCommitWriter = write_queue,
+        snapshot: AnalyticsSnapshot = analytics_snapshot,
+        sample_size: int = QUERY_CATALOG_SETTINGS["latency_samples"],
+    ):
+        self.manager = manager
+        self.writer = writer
+        self.snapshot = snapshot
+        self.sample_size = sample_size
+        self.queries: Dict[str, Query] = {}
+        self.metrics: Dict[str, QueryMetrics] = {}
+
+    def register(self, name: str, sql: str, write: bool = False, snapshot: bool = False) -> Query:
+        """Register a statement under a unique name."""
+        if name in self.queries:
+            raise ValueError(f"Query '{name}' is already registered")
+        query = Query(name, sql, write, snapshot)
+        self.queries[name] = query
+        self.metrics[name] = QueryMetrics(self.sample_size)
+        return query
+
+    def get(self, name: str) -> Query:
+        """Look up a registered statement."""
+        try:
+            return self.queries[name]
+        except KeyError:
+            raise KeyError(f"Unknown query '{name}'") from None
+
+    def _read_query(self, name: str) -> Query:
+        query = self.get(name)
+        if query.write:
+            raise ValueError(f"Query '{name}' is a write; use execute()")
+        return query
+
+    async def _fetch(self, query: Query, params: Sequence[Any], one: bool) -> List[tuple]:
+        """Run a read statement and record its metrics."""
+        cursor_source = self.snapshot.get_cursor() if query.snapshot else self.manager.get_cursor(readonly=True)
+        metrics = self.metrics[query.name]
+        start = time.perf_counter()
+        try:
+            async with cursor_source as cursor:
+                await cursor.execute(query.sql, params)
+                if one:
+                    row = await cursor.fetchone()
+                    rows = [row] if row is not None else []
+                else:
+                    rows = list(await cursor.fetchall())
+        except Exception:
+            metrics.errors += 1
+            raise
+        metrics.record(time.perf_counter() - start, len(rows))
+        return rows
+
+    async def fetch_one(self, name: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        """Run a named read and return its first row (None if empty)."""
+        rows = await self._fetch(self._read_query(name), params, one=True)
+        return rows[0] if rows else None
+
+    async def fetch_all(self, name: str, params: Sequence[Any] = ()) -> List[tuple]:
+        """Run a named read and return all rows."""
+        return await self._fetch(self._read_query(name), params, one=False)
+
+    async def execute(self, name: str, params: Sequence[Any] = (), fetch: bool = False) -> WriteResult:
+        """Run a named write through the write queue."""
+        results = await self.execute_unit([(name, params)], fetch=fetch)
+        return results[0]
+
+    async def execute_unit(self, statements: List[Tuple[str, Sequence[Any]]], fetch: bool = False) -> List[WriteResult]:
+        """
+        Run named writes atomically through the write queue.
+
+        Each statement is charged the latency of the whole unit, as that is
+        what the caller waited for.
+        """
+        queries = [self.get(name) for name, _ in statements]
+        start = time.perf_counter()
+        try:
+            results = await self.writer.execute_unit(
+                [(query.sql, params) for query, (_, params) in zip(queries, statements)],
+                fetch=fetch,
+            )
+        except Exception:
+            for query in queries:
+                self.metrics[query.name].errors += 1
+            raise
+        elapsed = time.perf_counter() - start
+        for query, result in zip(queries, results):
+            self.metrics[query.name].record(elapsed, len(result.rows) if fetch else max(result.rowcount, 0))
+        return results
+
+    async def explain(self, name: str) -> List[str]:
+        """EXPLAIN QUERY PLAN for a registered statement (parameters bound to NULL)."""
+        query = self.get(name)
+        async with self.manager.get_cursor(readonly=True) as cursor:
+            await cursor.execute(f"EXPLAIN QUERY PLAN {query.sql}", (None,) * query.sql.count("?"))
+            return [row[3] for row in await cursor.fetchall()]
+
+    async def explain_all(self) -> Dict[str, List[str]]:
+        """EXPLAIN QUERY PLAN for every registered statement, logged at INFO."""
+        plans = {}
+        for name in self.queries:
+            try:
+                plans[name] = await self.explain(name)
+            except Exception as e:
+                logger.error(f"Could not explain query '{name}': {e}")
+                continue
+            logger.info(f"Query plan '{name}': {' | '.join(plans[name])}")
+        return plans
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get metrics for every query that has been executed."""
+        return {name: metrics.as_dict() for name, metrics in self.metrics.items() if metrics.count or metrics.errors}
+
+
+# Global catalog bound to the global manager, write queue and snapshot
+query_catalog = QueryCatalog()
+
+# Per-category completion counts over daily_summary rows, in ACTIVITY_CATEGORIES order
+_CATEGORY_SUMS_SQL = ", ".join(
+    f"SUM((categories_mask & {bit}) != 0)" for bit in CATEGORY_BITS.values()
+)
+
+# Columns selected wherever a full User is built
+USER_COLUMNS = """current_phase, streak, first_name, location_city,
+                   location_lat, location_lon, timezone"""
+
+# Raw activity rows of one compaction chunk
+_COMPACTION_CHUNK = """SELECT activity_id FROM daily_activity
+                   WHERE day_ordinal < ? LIMIT ?"""
+
+# Users
+query_catalog.register(
+    "upsert_user",
+    f"""INSERT INTO users (user_id, current_phase, first_name, location_city,
+       location_lat, location_lon, timezone, last_login, created_at)
+       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+       ON CONFLICT(user_id) DO UPDATE SET
+       first_name = excluded.first_name, last_login = excluded.last_login
+       RETURNING created_at, {USER_COLUMNS}""",
+    write=True,
+)
+query_catalog.register(
+    "user_data",
+    f"SELECT {USER_COLUMNS} FROM users WHERE user_id = ?",
+)
+# The user's local day is only known after reading the timezone, so fetch the
+# masks for every day that can be "today" somewhere (UTC-1 .. UTC+1)
+query_catalog.register(
+    "user_with_recent_masks",
+    f"""SELECT {USER_COLUMNS},
+       (SELECT group_concat(day_ordinal || ':' || categories_mask) FROM daily_summary
+        WHERE user_id = users.user_id AND day_ordinal BETWEEN ? AND ?)
+       FROM users WHERE user_id = ?""",
+)
+# Every place the bot computes sun times for (NULL location means the defaults the plan uses)
+query_catalog.register(
+    "distinct_user_locations",
+    """SELECT DISTINCT round(COALESCE(location_lat, 0), ?), round(COALESCE(location_lon, 0), ?),
+       COALESCE(NULLIF(timezone, ''), 'UTC')
+       FROM users""",
+)
+query_catalog.register(
+    "update_user_location",
+    """UPDATE users SET location_lat = ?, location_lon = ?,
+       location_city = ?, timezone = ? WHERE user_id = ?""",
+    write=True,
+)
+
+# Activity
+query_catalog.register(
+    "log_activity",
+    # trg_activity_summary folds the row into daily_summary in the same statement
+    """INSERT OR REPLACE INTO daily_activity
+       (user_id, activity_date, day_ordinal, category, completed, timestamp)
+       VALUES (?, ?, ?, ?, TRUE, CURRENT_TIMESTAMP)""",
+    write=True,
+)
+query_catalog.register(
+    "day_mask",
+    """SELECT categories_mask FROM daily_summary
+       WHERE user_id = ? AND day_ordinal = ?""",
+)
+query_catalog.register(
+    "user_period_stats",
+    f"""SELECT COUNT(*), {_CATEGORY_SUMS_SQL},
+       (SELECT COUNT(*) FROM diary_entries WHERE user_id = ? AND day_ordinal >= ?)
+       FROM daily_summary
+       WHERE user_id = ? AND day_ordinal >= ? AND categories_mask != 0""",
+)
+query_catalog.register(
+    "fold_activity_chunk",
+    f"""INSERT INTO daily_summary (user_id, day_ordinal, categories_mask)
+       SELECT user_id, day_ordinal, SUM(DISTINCT {CATEGORY_MASK_SQL})
+       FROM daily_activity
+       WHERE completed = TRUE AND activity_id IN ({_COMPACTION_CHUNK})
+       GROUP BY user_id, day_ordinal
+       ON CONFLICT(user_id, day_ordinal)
+       DO UPDATE SET categories_mask = categories_mask | excluded.categories_mask""",
+    write=True,
+)
+query_catalog.register(
+    "delete_activity_chunk",
+    f"DELETE FROM daily_activity WHERE activity_id IN ({_COMPACTION_CHUNK})",
+    write=True,
+)
+
+# Mantras
+query_catalog.register(
+    "mantra_catalog",
+    # The version is an uncorrelated subquery, evaluated once for the whole load
+    """SELECT (SELECT version FROM catalog_version WHERE name = 'mantras'),
+       mantra_id, category, ossetian_text, russian_translation
+       FROM mantras ORDER BY mantra_id""",
+)
+query_catalog.register(
+    "mantra_catalog_version",
+    "SELECT version FROM catalog_version WHERE name = 'mantras'",
+)
+query_catalog.register(
+    "upsert_mantra",
+    """INSERT INTO mantras (category, ossetian_text, russian_translation) VALUES (?, ?, ?)
+       ON CONFLICT(ossetian_text) DO UPDATE SET
+       category = excluded.category, russian_translation = excluded.russian_translation
+       WHERE category != excluded.category
+       OR russian_translation IS NOT excluded.russian_translation""",
+    write=True,
+)
+query_catalog.register(
+    "delete_mantra",
+    "DELETE FROM mantras WHERE mantra_id = ?",
+    write=True,
+)
+
+# Diary
+query_catalog.register(
+    "add_diary_entry",
+    "INSERT INTO diary_entries (user_id, entry_text, day_ordinal) VALUES (?, ?, ?)",
+    write=True,
+)
+query_catalog.register(
+    "diary_entries",
+    """SELECT entry_id, timestamp, entry_text FROM diary_entries
+       WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?""",
+)
+
+# FSM state (write-back cached by SQLiteStorage)
+query_catalog.register(
+    "fsm_load",
+    "SELECT state, data, expires_at FROM fsm_state WHERE storage_key = ? AND expires_at > ?",
+)
+query_catalog.register(
+    "fsm_save",
+    """INSERT INTO fsm_state (storage_key, state, data, expires_at) VALUES (?, ?, ?, ?)
+       ON CONFLICT(storage_key) DO UPDATE SET
+       state = excluded.state, data = excluded.data, expires_at = excluded.expires_at""",
+    write=True,
+)
+query_catalog.register(
+    "fsm_delete",
+    "DELETE FROM fsm_state WHERE storage_key = ?",
+    write=True,
+)
+query_catalog.register(
+    "fsm_purge_expired",
+    "DELETE FROM fsm_state WHERE expires_at <= ?",
+    write=True,
+)
+
+# Last week of bitmask history, to rebuild the in-memory community aggregates
+query_catalog.register(
+    "community_window",
+    """SELECT user_id, day_ordinal, categories_mask FROM daily_summary
+       WHERE day_ordinal >= ? AND categories_mask != 0""",
+)
+
+# Community aggregates read the analytics snapshot, never the interactive pool
+query_catalog.register(
+    "group_period_stats",
+    f"""SELECT COUNT(DISTINCT user_id), {_CATEGORY_SUMS_SQL} FROM daily_summary
+       WHERE day_ordinal >= ? AND categories_mask != 0""",
+    snapshot=True,
+)
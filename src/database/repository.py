@@ -1,247 +1,261 @@
 """
 Optimized database repository with connection pooling.
+
+Statements are looked up by name in the query catalog: reads run on
+read-only pooled cursors, writes are group-committed through the write
+queue on the single writer connection.
 """
 import logging
-from datetime import datetime, date, timedelta
-from typing import List, Optional, Dict, Any
-from contextlib import asynccontextmanager
+from datetime import datetime, date
+from typing import List, Optional, Dict, Any, Tuple
 
-from src.database.connection import get_db_cursor
-from src.database.models import User, DiaryEntry, Mantra, DailyActivity, UserStats, GroupStats, ActivityCategory
+from src.database.caches import GROUP_TAG, read_cache, user_cache, user_tag
+from src.database.community import community_aggregator
+from src.database.mantra_catalog import mantra_catalog
+from src.database.queries import query_catalog
+from src.database.models import (
+    User, DiaryEntry, Mantra, DailyActivity, UserStats, GroupStats, ActivityCategory,
+    category_bit, mask_to_status
+)
 from src.config.config import (
     DEFAULT_PHASE, DEFAULT_CITY_NAME, DEFAULT_LATITUDE, 
-    DEFAULT_LONGITUDE, DEFAULT_TIMEZONE, ACTIVITY_CATEGORIES
+    DEFAULT_LONGITUDE, DEFAULT_TIMEZONE, ACTIVITY_CATEGORIES, READ_CACHE_SETTINGS
 )
 from src.data import MANTRAS_DATA
+from src.utils.utils import local_day_ordinal
 
 logger = logging.getLogger(__name__)
 
+
+def _row_to_user(user_id: int, row) -> User:
+    """Build a User from a row selected with the catalog's USER_COLUMNS."""
+    return User(
+        user_id=user_id,
+        current_phase=row[0],
+        streak=row[1],
+        first_name=row[2],
+        location_city=row[3],
+        location_lat=row[4],
+        location_lon=row[5],
+        timezone=row[6]
+    )
+
 class UserRepository:
     """Repository for user operations."""
     
     @staticmethod
     async def add_user_if_not_exists(user_id: int, first_name: str) -> bool:
-        """Add user if not exists. Returns True if added."""
-        async with get_db_cursor() as cursor:
-            # Check if user exists
-            await cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,))
-            exists = await cursor.fetchone()
-            
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            if not exists:
-                await cursor.execute(
-                    """INSERT INTO users (user_id, current_phase, first_name, location_city, 
-                       location_lat, location_lon, timezone, last_login) 
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (user_id, DEFAULT_PHASE, first_name, DEFAULT_CITY_NAME,
-                     DEFAULT_LATITUDE, DEFAULT_LONGITUDE, DEFAULT_TIMEZONE, now)
-                )
-                await cursor.connection.commit()
-                logger.info(f"New user {user_id} added")
-                return True
-            else:
-                # Update existing user
-                await cursor.execute(
-                    "UPDATE users SET first_name = ?, last_login = ? WHERE user_id = ?",
-                    (first_name, now, user_id)
-                )
-                await cursor.connection.commit()
-                return False
+        """Add user if not exists, else refresh name and last login. Returns True if added."""
+        now = datetime.now()
+        created_at = now.isoformat(sep=' ', timespec='microseconds')
+        result = await query_catalog.execute(
+            "upsert_user",
+            (user_id, DEFAULT_PHASE, first_name, DEFAULT_CITY_NAME,
+             DEFAULT_LATITUDE, DEFAULT_LONGITUDE, DEFAULT_TIMEZONE,
+             now.strftime('%Y-%m-%d %H:%M:%S'), created_at),
+            fetch=True
+        )
+        
+        row = result.rows[0]
+        # The upsert returns the stored profile, so write it through to the cache
+        user_cache.put(_row_to_user(user_id, row[1:]))
+        
+        # created_at is only written on insert, so it matches only for a new row
+        if row[0] == created_at:
+            logger.info(f"New user {user_id} added")
+            return True
+        return False
+    
+    @staticmethod
+    async def _load_user(user_id: int) -> Optional[User]:
+        """Read a user profile from the database, bypassing the cache."""
+        row = await query_catalog.fetch_one("user_data", (user_id,))
+        return _row_to_user(user_id, row) if row else None
     
     @staticmethod
     async def get_user_data(user_id: int) -> Optional[User]:
-        """Get user data by ID."""
-        async with get_db_cursor() as cursor:
-            await cursor.execute(
-                """SELECT current_phase, streak, first_name, location_city, 
-                   location_lat, location_lon, timezone 
-                   FROM users WHERE user_id = ?""",
-                (user_id,)
-            )
-            row = await cursor.fetchone()
-            
-            if not row:
-                return None
-                
-            return User(
-                user_id=user_id,
-                current_phase=row[0],
-                streak=row[1],
-                first_name=row[2],
-                location_city=row[3],
-                location_lat=row[4],
-                location_lon=row[5],
-                timezone=row[6]
-            )
+        """Get user data by ID (served from the profile cache when possible)."""
+        return await user_cache.get_or_load(user_id, lambda: UserRepository._load_user(user_id))
+    
+    @staticmethod
+    async def get_user_with_today_status(user_id: int) -> Tuple[Optional[User], Dict[str, bool]]:
+        """Get user data and today's activity status in a single query."""
+        user = user_cache.get(user_id)
+        if user is not None:
+            row = await query_catalog.fetch_one("day_mask", (user_id, local_day_ordinal(user.timezone)))
+            return user, mask_to_status(row[0] if row else 0)
+        
+        # Masks of every day that can be "today" somewhere; the timezone picks one below
+        utc_day = local_day_ordinal("UTC")
+        row = await query_catalog.fetch_one("user_with_recent_masks", (utc_day - 1, utc_day + 1, user_id))
+        
+        if not row:
+            return None, mask_to_status(0)
+        user = _row_to_user(user_id, row)
+        user_cache.put(user)
+        masks = dict(
+            (int(day), int(mask)) for day, mask in
+            (pair.split(':') for pair in (row[7].split(',') if row[7] else []))
+        )
+        return user, mask_to_status(masks.get(local_day_ordinal(user.timezone), 0))
+    
+    @staticmethod
+    async def get_timezone(user_id: int) -> Optional[str]:
+        """Get the user's timezone (None if unknown)."""
+        user = await UserRepository.get_user_data(user_id)
+        return user.timezone if user else None
     
     @staticmethod
     async def update_user_location(user_id: int, lat: float, lon: float, city: str, tz: str):
         """Update user location."""
-        async with get_db_cursor() as cursor:
-            await cursor.execute(
-                """UPDATE users SET location_lat = ?, location_lon = ?, 
-                   location_city = ?, timezone = ? WHERE user_id = ?""",
-                (lat, lon, city, tz, user_id)
-            )
-            await cursor.connection.commit()
-            logger.info(f"User {user_id} location updated to {city}, tz={tz}")
+        await query_catalog.execute("update_user_location", (lat, lon, city, tz, user_id))
+        user_cache.update_profile(
+            user_id, location_lat=lat, location_lon=lon, location_city=city, timezone=tz
+        )
+        # Cached stats were bucketed by the old timezone
+        read_cache.invalidate_tag(user_tag(user_id))
+        logger.info(f"User {user_id} location updated to {city}, tz={tz}")
 
 class ActivityRepository:
     """Repository for activity operations."""
     
     @staticmethod
-    async def log_daily_activity(user_id: int, category: str) -> bool:
-        """Log daily activity. Returns True if successful."""
+    async def log_daily_activity(user_id: int, category: str, tz: Optional[str] = None) -> bool:
+        """Log daily activity for the user's local day. Returns True if successful."""
+        return await ActivityRepository.log_daily_activity_and_get_mask(user_id, category, tz) is not None
+
+    @staticmethod
+    async def log_daily_activity_and_get_mask(user_id: int, category: str, tz: Optional[str] = None) -> Optional[int]:
+        """Log daily activity and return today's updated categories mask (None if the category is invalid)."""
         if category not in ACTIVITY_CATEGORIES:
             logger.warning(f"Invalid activity category: {category}")
-            return False
-            
-        today = date.today().isoformat()
-        async with get_db_cursor() as cursor:
-            await cursor.execute(
-                """INSERT OR REPLACE INTO daily_activity 
-                   (user_id, activity_date, category, completed, timestamp) 
-                   VALUES (?, ?, ?, TRUE, CURRENT_TIMESTAMP)""",
-                (user_id, today, category)
-            )
-            await cursor.connection.commit()
-            logger.info(f"User {user_id} completed '{category}' on {today}")
-            return True
+            return None
+        
+        if tz is None:
+            tz = await UserRepository.get_timezone(user_id)
+        day = local_day_ordinal(tz)
+        today = date.fromordinal(day).isoformat()
+        # The trigger has folded the row into daily_summary by the time the mask is read back
+        _, mask_result = await query_catalog.execute_unit(
+            [("log_activity", (user_id, today, day, category)), ("day_mask", (user_id, day))],
+            fetch=True,
+        )
+        community_aggregator.record(user_id, day, category_bit(category))
+        read_cache.invalidate_tag(user_tag(user_id))
+        logger.info(f"User {user_id} completed '{category}' on {today}")
+        return mask_result.rows[0][0] if mask_result.rows else category_bit(category)
     
     @staticmethod
-    async def get_daily_activity_status(user_id: int) -> Dict[str, bool]:
+    async def get_daily_activity_status(user_id: int, tz: Optional[str] = None) -> Dict[str, bool]:
         """Get today's activity status for user."""
-        done = set()
-        async with get_db_cursor() as cursor:
-            today = date.today().isoformat()
-            await cursor.execute(
-                """SELECT category FROM daily_activity 
-                   WHERE user_id = ? AND activity_date = ? AND completed = TRUE""",
-                (user_id, today)
-            )
-            for row in await cursor.fetchall():
-                done.add(row[0])
+        if tz is None:
+            tz = await UserRepository.get_timezone(user_id)
+        row = await query_catalog.fetch_one("day_mask", (user_id, local_day_ordinal(tz)))
+        return mask_to_status(row[0] if row else 0)
+    
+    @staticmethod
+    async def get_user_period_stats(user_id: int, days: int, user: Optional[User] = None) -> UserStats:
+        """
+        Get user's statistics for the last `days` local days (including today).
         
-        return {cat: (cat in done) for cat in ACTIVITY_CATEGORIES}
+        Pass the already loaded `user` to skip the lookup of streak and timezone.
+        """
+        if user is None:
+            user = await UserRepository.get_user_data(user_id)
+        streak = user.streak if user else 0
+        period_start = local_day_ordinal(user.timezone if user else None) - (days - 1)
+        return await read_cache.get_or_load(
+            ("user_period_stats", user_id, period_start, streak),
+            lambda: ActivityRepository._load_user_period_stats(user_id, period_start, streak),
+            tags=(user_tag(user_id),),
+        )
     
     @staticmethod
-    async def get_user_weekly_stats(user_id: int) -> UserStats:
+    async def _load_user_period_stats(user_id: int, period_start: int, streak: int) -> UserStats:
+        """Read a user's stats since `period_start` from the database."""
+        # Bitmask history and diary count in one round trip
+        row = await query_catalog.fetch_one(
+            "user_period_stats", (user_id, period_start, user_id, period_start)
+        )
+        
+        categories_done = {cat: row[i + 1] or 0 for i, cat in enumerate(ACTIVITY_CATEGORIES)}
+        return UserStats(
+            days_active=row[0],
+            diary_entries=row[len(ACTIVITY_CATEGORIES) + 1],
+            tasks_done_total=sum(categories_done.values()),
+            categories_done=categories_done,
+            streak=streak
+        )
+    
+    @staticmethod
+    async def get_user_weekly_stats(user_id: int, user: Optional[User] = None) -> UserStats:
         """Get user's weekly statistics."""
-        week_ago = (date.today() - timedelta(days=6)).isoformat()
+        return await ActivityRepository.get_user_period_stats(user_id, 7, user)
+    
+    @staticmethod
+    async def get_user_monthly_stats(user_id: int) -> UserStats:
+        """Get user's statistics for the last 30 days."""
+        return await ActivityRepository.get_user_period_stats(user_id, 30)
+    
+    @staticmethod
+    async def get_user_yearly_stats(user_id: int) -> UserStats:
+        """Get user's statistics for the last 365 days."""
+        return await ActivityRepository.get_user_period_stats(user_id, 365)
+    
+    @staticmethod
+    async def compact_activity_history(before_day: int, chunk_size: int = 1000) -> int:
+        """
+        Fold raw activity rows older than `before_day` into daily_summary and drop them.
         
-        async with get_db_cursor() as cursor:
-            # Days active
-            await cursor.execute(
-                """SELECT COUNT(DISTINCT activity_date) FROM daily_activity 
-                   WHERE user_id = ? AND activity_date >= ? AND completed = TRUE""",
-                (user_id, week_ago)
-            )
-            days_active = (await cursor.fetchone())[0]
-            
-            # Diary entries
-            await cursor.execute(
-                """SELECT COUNT(*) FROM diary_entries 
-                   WHERE user_id = ? AND DATE(timestamp) >= ?""",
-                (user_id, week_ago)
-            )
-            diary_entries = (await cursor.fetchone())[0]
-            
-            # Categories done
-            await cursor.execute(
-                """SELECT category, COUNT(*) FROM daily_activity 
-                   WHERE user_id = ? AND activity_date >= ? AND completed = TRUE 
-                   GROUP BY category""",
-                (user_id, week_ago)
-            )
-            categories_done = {cat: 0 for cat in ACTIVITY_CATEGORIES}
-            tasks_done_total = 0
-            
-            for cat, cnt in await cursor.fetchall():
-                if cat in categories_done:
-                    categories_done[cat] = cnt
-                    tasks_done_total += cnt
-            
-            # Get user streak
-            user_data = await UserRepository.get_user_data(user_id)
-            streak = user_data.streak if user_data else 0
-            
-            return UserStats(
-                days_active=days_active,
-                diary_entries=diary_entries,
-                tasks_done_total=tasks_done_total,
-                categories_done=categories_done,
-                streak=streak
-            )
+        Runs in small chunks so the write burst never holds the writer for long.
+        Returns the number of raw rows removed.
+        """
+        removed = 0
+        while True:
+            _, deleted = await query_catalog.execute_unit([
+                ("fold_activity_chunk", (before_day, chunk_size)),
+                ("delete_activity_chunk", (before_day, chunk_size)),
+            ])
+            removed += deleted.rowcount
+            if deleted.rowcount < chunk_size:
+                return removed
 
 class MantraRepository:
-    """Repository for mantra operations."""
+    """Repository for mantra operations, served from the in-memory mantra catalog."""
     
     @staticmethod
     async def get_random_mantra() -> Optional[Mantra]:
         """Get random mantra."""
-        async with get_db_cursor() as cursor:
-            await cursor.execute(
-                """SELECT mantra_id, category, ossetian_text, russian_translation 
-                   FROM mantras ORDER BY RANDOM() LIMIT 1"""
-            )
-            row = await cursor.fetchone()
-            
-            if not row:
-                return None
-                
-            return Mantra(
-                mantra_id=row[0],
-                category=row[1],
-                ossetian_text=row[2],
-                russian_translation=row[3]
-            )
+        return await mantra_catalog.random_mantra()
     
     @staticmethod
     async def get_random_mantra_by_category(category: str) -> Optional[Mantra]:
-        """Get random mantra by category."""
-        async with get_db_cursor() as cursor:
-            await cursor.execute(
-                """SELECT mantra_id, ossetian_text, russian_translation 
-                   FROM mantras WHERE category = ? ORDER BY RANDOM() LIMIT 1""",
-                (category,)
-            )
-            row = await cursor.fetchone()
-            
-            if row:
-                return Mantra(
-                    mantra_id=row[0],
-                    category=category,
-                    ossetian_text=row[1],
-                    russian_translation=row[2]
-                )
-            
-            # Fallback to any random mantra
-            return await MantraRepository.get_random_mantra()
+        """Get random mantra by category, falling back to any mantra."""
+        return await mantra_catalog.random_mantra_by_category(category)
+    
+    @staticmethod
+    async def get_random_mantras_by_categories(categories: List[str]) -> List[Optional[Mantra]]:
+        """Get one random mantra per category, falling back to any mantra."""
+        return [await mantra_catalog.random_mantra_by_category(category) for category in categories]
     
     @staticmethod
     async def get_categories() -> List[str]:
         """Get all mantra categories."""
-        async with get_db_cursor() as cursor:
-            await cursor.execute("SELECT DISTINCT category FROM mantras")
-            rows = await cursor.fetchall()
-            return [row[0] for row in rows]
+        return await mantra_catalog.get_categories()
 
 class DiaryRepository:
     """Repository for diary operations."""
     
     @staticmethod
-    async def add_entry(user_id: int, text: str) -> bool:
-        """Add diary entry."""
+    async def add_entry(user_id: int, text: str, tz: Optional[str] = None) -> bool:
+        """Add diary entry, bucketed into the user's local day."""
         try:
-            async with get_db_cursor() as cursor:
-                await cursor.execute(
-                    "INSERT INTO diary_entries (user_id, entry_text) VALUES (?, ?)",
-                    (user_id, text)
-                )
-                await cursor.connection.commit()
-                logger.info(f"Diary entry saved for user {user_id}")
-                return True
+            if tz is None:
+                tz = await UserRepository.get_timezone(user_id)
+            await query_catalog.execute("add_diary_entry", (user_id, text, local_day_ordinal(tz)))
+            read_cache.invalidate_tag(user_tag(user_id))
+            logger.info(f"Diary entry saved for user {user_id}")
+            return True
         except Exception as e:
             logger.error(f"Failed to save diary entry: {e}")
             return False
@@ -249,58 +263,67 @@ class DiaryRepository:
     @staticmethod
     async def get_entries(user_id: int, limit: int = 5) -> List[DiaryEntry]:
         """Get user's diary entries."""
-        async with get_db_cursor() as cursor:
-            await cursor.execute(
-                """SELECT entry_id, timestamp, entry_text FROM diary_entries 
-                   WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?""",
-                (user_id, limit)
+        return await read_cache.get_or_load(
+            ("diary_entries", user_id, limit),
+            lambda: DiaryRepository._load_entries(user_id, limit),
+            tags=(user_tag(user_id),),
+        )
+    
+    @staticmethod
+    async def _load_entries(user_id: int, limit: int) -> List[DiaryEntry]:
+        """Read a user's latest diary entries from the database."""
+        rows = await query_catalog.fetch_all("diary_entries", (user_id, limit))
+        return [
+            DiaryEntry(
+                entry_id=row[0],
+                user_id=user_id,
+                timestamp=datetime.fromisoformat(row[1].replace('Z', '+00:00')),
+                entry_text=row[2]
             )
-            rows = await cursor.fetchall()
-            
-            return [
-                DiaryEntry(
-                    entry_id=row[0],
-                    user_id=user_id,
-                    timestamp=datetime.fromisoformat(row[1].replace('Z', '+00:00')),
-                    entry_text=row[2]
-                )
-                for row in rows
-            ]
+            for row in rows
+        ]
 
 class StatsRepository:
     """Repository for statistics operations."""
     
+    @staticmethod
+    async def get_group_period_stats(days: int) -> GroupStats:
+        """Get group statistics for the last `days` days (including today)."""
+        # The weekly window is kept in memory, updated as activity is logged
+        if days == community_aggregator.window_days and community_aggregator.ready:
+            return community_aggregator.get_stats()
+        
+        period_start = date.today().toordinal() - (days - 1)
+        return await read_cache.get_or_load(
+            ("group_period_stats", period_start),
+            lambda: StatsRepository._load_group_period_stats(period_start),
+            tags=(GROUP_TAG,),
+            ttl=READ_CACHE_SETTINGS["group_ttl_seconds"],
+        )
+    
+    @staticmethod
+    async def _load_group_period_stats(period_start: int) -> GroupStats:
+        """Read community stats since `period_start` from the analytics snapshot."""
+        row = await query_catalog.fetch_one("group_period_stats", (period_start,))
+        
+        categories_done = {cat: row[i + 1] or 0 for i, cat in enumerate(ACTIVITY_CATEGORIES)}
+        return GroupStats(
+            total_users_active=row[0],
+            total_tasks_done=sum(categories_done.values()),
+            categories_done=categories_done
+        )
+    
     @staticmethod
     async def get_group_weekly_stats() -> GroupStats:
         """Get group weekly statistics."""
-        week_ago = (date.today() - timedelta(days=6)).isoformat()
-        
-        async with get_db_cursor() as cursor:
-            # Total active users
-            await cursor.execute(
-                """SELECT COUNT(DISTINCT user_id) FROM daily_activity 
-                   WHERE activity_date >= ? AND completed = TRUE""",
-                (week_ago,)
-            )
-            total_users_active = (await cursor.fetchone())[0]
-            
-            # Categories done
-            await cursor.execute(
-                """SELECT category, COUNT(*) FROM daily_activity 
-                   WHERE activity_date >= ? AND completed = TRUE 
-                   GROUP BY category""",
-                (week_ago,)
-            )
-            categories_done = {cat: 0 for cat in ACTIVITY_CATEGORIES}
-            total_tasks_done = 0
-            
-            for cat, cnt in await cursor.fetchall():
-                if cat in categories_done:
-                    categories_done[cat] = cnt
-                    total_tasks_done += cnt
-            
-            return GroupStats(
-                total_users_active=total_users_active,
-                total_tasks_done=total_tasks_done,
-                categories_done=categories_done
-            )
+        return await StatsRepository.get_group_period_stats(7)
+    
+    @staticmethod
+    async def get_group_monthly_stats() -> GroupStats:
+        """Get group statistics for the last 30 days."""
+        return await StatsRepository.get_group_period_stats(30)
+    
+    @staticmethod
+    async def get_group_yearly_stats() -> GroupStats:
+        """Get group statistics for the last 365 days."""
+        return await StatsRepository.get_group_period_stats(365)
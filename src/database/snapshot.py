@@ -0,0 +1,199 @@
+"""
+Analytics snapshot database.
+
+Community and export queries read a periodically refreshed copy of the
+database instead of the live file. The copy is made with SQLite's online
+backup API in small page steps on its own connection, so taking it never
+blocks interactive reads or the writer, and queries against it run on a
+separate connection as well. When the snapshot is older than the configured
+staleness bound, queries fall back to the live read pool and a refresh is
+started in the background.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.request import pathname2url
+
+import aiosqlite
+
+from src.config.config import ANALYTICS_SETTINGS
+from src.database.connection import DatabaseManager, db_manager
+from src.database.instrumentation import InstrumentedCursor
+
+logger = logging.getLogger(__name__)
+
+
+class _SnapshotGeneration:
+    """One opened snapshot file and the number of queries still using it."""
+
+    def __init__(self, conn: aiosqlite.Connection, taken_at: float):
+        self.conn = conn
+        self.taken_at = taken_at
+        self.users = 0
+        self.retired = False
+        self._closing = False
+        self.closed = asyncio.Event()
+
+    async def close_if_unused(self) -> None:
+        if self.retired and self.users == 0 and not self._closing:
+            self._closing = True
+            await self.conn.close()
+            self.closed.set()
+
+    async def retire(self) -> None:
+        """Stop handing out the connection and wait until the last query on it has closed it."""
+        self.retired = True
+        await self.close_if_unused()
+        await self.closed.wait()
+
+
+class AnalyticsSnapshot:
+    """Periodic online backup of the database used for heavy analytics reads."""
+
+    def __init__(self, manager: DatabaseManager = db_manager, settings: Dict[str, Any] = ANALYTICS_SETTINGS):
+        self.manager = manager
+        self.settings = settings
+        self._current: Optional[_SnapshotGeneration] = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.fallbacks = 0
+        self.last_refresh_duration = 0.0
+
+    @property
+    def path(self) -> str:
+        """Snapshot file path, derived from the live database unless configured."""
+        if self.settings.get("snapshot_file"):
+            return self.settings["snapshot_file"]
+        live = Path(self.manager.db_path)
+        return str(live.with_name(f"{live.stem}.analytics{live.suffix or '.db'}"))
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the current snapshot was taken (None if there is none)."""
+        if self._current is None:
+            return None
+        return time.monotonic() - self._current.taken_at
+
+    def is_fresh(self) -> bool:
+        """Whether the snapshot exists and is within the staleness bound."""
+        age = self.age
+        return age is not None and age <= self.settings["max_staleness_seconds"]
+
+    async def refresh(self) -> None:
+        """Copy the live database into a new snapshot and switch queries to it."""
+        if not self.manager.readers_enabled:
+            return
+        async with self._refresh_lock:
+            start = time.perf_counter()
+            taken_at = time.monotonic()
+            tmp_path = f"{self.path}.tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            # Make sure the live file exists and is in WAL mode before reading it
+            await self.manager.get_connection()
+            live_uri = f"file:{pathname2url(str(Path(self.manager.db_path).resolve()))}?mode=ro"
+            source = await aiosqlite.connect(live_uri, uri=True)
+            target = await aiosqlite.connect(tmp_path)
+            try:
+                await source.backup(
+                    target,
+                    pages=self.settings["backup_pages_per_step"],
+                    sleep=self.settings["backup_step_sleep_ms"] / 1000,
+                )
+                # The copy inherits WAL mode; a rollback-journal file opened read-only
+                # leaves no -wal/-shm files behind to outlive a later swap
+                await target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                await target.close()
+                await source.close()
+
+            # Queries fall back to the live pool while the file is swapped
+            previous, self._current = self._current, None
+            if previous is not None:
+                await previous.retire()
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+            os.replace(tmp_path, self.path)
+
+            snapshot_uri = f"file:{pathname2url(str(Path(self.path).resolve()))}?mode=ro"
+            conn = await aiosqlite.connect(snapshot_uri, uri=True)
+            await conn.execute("PRAGMA query_only=ON")
+            self._current = _SnapshotGeneration(conn, taken_at)
+
+            self.refreshes += 1
+            self.last_refresh_duration = time.perf_counter() - start
+            logger.info(f"Analytics snapshot refreshed in {self.last_refresh_duration * 1000:.1f}ms")
+
+    def _refresh_in_background(self) -> None:
+        """Start a refresh unless one is already running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_safely())
+
+    async def _refresh_safely(self) -> None:
+        """Scheduler and background entry point."""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Analytics snapshot refresh failed: {e}")
+
+    @asynccontextmanager
+    async def get_cursor(self):
+        """Cursor on the snapshot, or on the live read pool if the snapshot is stale."""
+        generation = self._current
+        if generation is None or not self.is_fresh():
+            self.fallbacks += 1
+            if not self._refresh_lock.locked():
+                self._refresh_in_background()
+            async with self.manager.get_cursor(readonly=True) as cursor:
+                yield cursor
+            return
+
+        generation.users += 1
+        try:
+            cursor = await generation.conn.cursor()
+            slow_log = self.manager.slow_queries if self.manager.trace else None
+            try:
+                yield InstrumentedCursor(cursor, slow_log)
+            finally:
+                await cursor.close()
+        finally:
+            generation.users -= 1
+            await generation.close_if_unused()
+
+    def register_jobs(self, scheduler) -> None:
+        """Add the periodic refresh job to an AsyncIOScheduler."""
+        scheduler.add_job(
+            self._refresh_safely, 'interval',
+            seconds=self.settings["refresh_interval_seconds"], id="analytics_snapshot",
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get snapshot age and refresh statistics."""
+        return {
+            "age": self.age,
+            "refreshes": self.refreshes,
+            "fallbacks": self.fallbacks,
+            "last_refresh_duration": self.last_refresh_duration,
+        }
+
+    async def close(self) -> None:
+        """Stop any running refresh and close the snapshot connection."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            await self._refresh_task
+        self._refresh_task = None
+        if self._current is not None:
+            self._current.retired = True
+            await self._current.close_if_unused()
+            self._current = None
+        self._refresh_lock = asyncio.Lock()
+
+
+# Global analytics snapshot of the global database
+analytics_snapshot = AnalyticsSnapshot()
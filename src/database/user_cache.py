@@ -0,0 +1,37 @@
+"""
+In-process cache of user profiles.
+
+Keeps recently used User objects keyed by user_id in an AsyncCache (LRU and
+TTL eviction, one database load shared by concurrent misses). The repository
+writes every persisted profile change through, so repeated taps from one user
+never reach SQLite.
+"""
+import dataclasses
+
+from src.config.config import PERFORMANCE_SETTINGS, USER_CACHE_SETTINGS
+from src.database.models import User
+from src.utils.cache import AsyncCache
+
+
+class UserProfileCache(AsyncCache):
+    """AsyncCache of User objects keyed by user_id."""
+
+    def __init__(
+        self,
+        max_size: int = USER_CACHE_SETTINGS["max_size"],
+        ttl: float = USER_CACHE_SETTINGS["ttl_seconds"],
+        enabled: bool = PERFORMANCE_SETTINGS["enable_caching"],
+    ):
+        super().__init__("users", max_size=max_size, ttl=ttl, enabled=enabled)
+
+    def put(self, user: User) -> None:
+        """Write a freshly persisted profile through to the cache."""
+        self.set(user.user_id, user)
+
+    def update_profile(self, user_id: int, **changes) -> None:
+        """Apply a persisted change to the cached profile, if it is cached."""
+        self.update(user_id, lambda user: dataclasses.replace(user, **changes))
+
+
+# Global user profile cache used by UserRepository
+user_cache = UserProfileCache()
@@ -0,0 +1,230 @@
+"""
+Group-commit write-behind queue for repository writes.
+
+Concurrent writers enqueue statements and await an acknowledgement. A single
+flusher task collects everything that arrives within a short window (or until
+the batch limit is reached) and commits it as one transaction on the writer
+connection, so a burst of taps costs one commit instead of one per write.
+Each unit of work runs inside its own savepoint: a failing statement only
+fails its own caller, the rest of the batch is still committed.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.config.config import WRITE_QUEUE_SETTINGS
+from src.database.connection import DatabaseManager, db_manager
+from src.database.instrumentation import attributed_to, current_handler, record_query, spawn_detached
+
+logger = logging.getLogger(__name__)
+
+Statement = Tuple[str, Sequence[Any]]
+
+
+@dataclass
+class WriteResult:
+    """Outcome of a single committed statement."""
+    rowcount: int
+    lastrowid: Optional[int]
+    rows: List[tuple] = field(default_factory=list)
+
+
+@dataclass
+class _PendingWrite:
+    """A unit of statements waiting for the next group commit."""
+    statements: List[Statement]
+    fetch: bool
+    future: asyncio.Future
+    handler: Optional[str] = None  # handler that queued it, for slow-query attribution
+
+
+@dataclass
+class WriteQueueStats:
+    """Batch size and commit latency statistics."""
+    batches: int = 0
+    statements: int = 0
+    failed_statements: int = 0
+    failed_commits: int = 0
+    max_batch_size: int = 0
+    total_commit_time: float = 0.0
+    max_commit_time: float = 0.0
+    last_commit_time: float = 0.0
+
+    def record_batch(self, size: int, commit_time: float) -> None:
+        """Record one committed batch."""
+        self.batches += 1
+        self.statements += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.total_commit_time += commit_time
+        self.max_commit_time = max(self.max_commit_time, commit_time)
+        self.last_commit_time = commit_time
+
+    def as_dict(self) -> Dict[str, float]:
+        """Batch sizes, failures and commit times, with averages derived from the totals."""
+        return {
+            "batches": self.batches,
+            "statements": self.statements,
+            "failed_statements": self.failed_statements,
+            "failed_commits": self.failed_commits,
+            "avg_batch_size": self.statements / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_commit_time": self.total_commit_time / self.batches if self.batches else 0.0,
+            "max_commit_time": self.max_commit_time,
+            "last_commit_time": self.last_commit_time,
+        }
+
+
+class GroupCommitWriter:
+    """Coalesces concurrent writes into group-committed transactions."""
+
+    def __init__(
+        self,
+        manager: DatabaseManager = db_manager,
+        max_batch_size: int = WRITE_QUEUE_SETTINGS["max_batch_size"],
+        max_delay: float = WRITE_QUEUE_SETTINGS["max_delay_ms"] / 1000,
+    ):
+        self.manager = manager
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max(0.0, max_delay)
+        self.stats = WriteQueueStats()
+        self._pending: Deque[_PendingWrite] = deque()
+        self._pending_statements = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+
+    def _ensure_running(self) -> None:
+        """(Re)start the group-commit writer, e.g. after close() or on a new event loop."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._closing = False
+            self._task = spawn_detached(self._run(), name="group-commit-writer")
+
+    async def execute(self, sql: str, params: Sequence[Any] = (), fetch: bool = False) -> WriteResult:
+        """Queue one statement and wait until it has been committed."""
+        results = await self.execute_unit([(sql, params)], fetch=fetch)
+        return results[0]
+
+    async def execute_unit(self, statements: List[Statement], fetch: bool = False) -> List[WriteResult]:
+        """
+        Queue statements that must be applied atomically and wait for the commit.
+
+        With fetch=True the rows returned by each statement (e.g. RETURNING) are
+        collected into the results.
+        """
+        if not statements:
+            return []
+        self._ensure_running()
+        future = self._loop.create_future()
+        self._pending.append(_PendingWrite(list(statements), fetch, future, current_handler()))
+        self._pending_statements += len(statements)
+        self._wakeup.set()
+        if self._pending_statements >= self.max_batch_size:
+            self._full.set()
+        start = time.perf_counter()
+        try:
+            return await future
+        finally:
+            record_query(time.perf_counter() - start, len(statements))
+
+    def _take_batch(self) -> List[_PendingWrite]:
+        """Pop pending units up to the statement limit (at least one unit)."""
+        batch: List[_PendingWrite] = []
+        size = 0
+        while self._pending:
+            unit_size = len(self._pending[0].statements)
+            if batch and size + unit_size > self.max_batch_size:
+                break
+            batch.append(self._pending.popleft())
+            size += unit_size
+        self._pending_statements -= size
+        if self._pending_statements < self.max_batch_size:
+            self._full.clear()
+        return batch
+
+    async def _run(self) -> None:
+        """Flusher loop: wait for work, let the batch fill briefly, commit it."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._pending:
+                if self._closing:
+                    return
+                continue
+            if not self._closing and self.max_delay and self._pending_statements < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            await self._commit(self._take_batch())
+            if self._pending or self._closing:
+                self._wakeup.set()
+
+    async def _commit(self, batch: List[_PendingWrite]) -> None:
+        """Apply a batch in one transaction and resolve the callers' futures."""
+        outcomes: List[Any] = []
+        size = sum(len(unit.statements) for unit in batch)
+        start = time.perf_counter()
+        try:
+            async with self.manager.get_cursor() as cursor:
+                await cursor.execute("BEGIN IMMEDIATE")
+                for unit in batch:
+                    await cursor.execute("SAVEPOINT write_unit")
+                    try:
+                        results = []
+                        for sql, params in unit.statements:
+                            with attributed_to(unit.handler):
+                                await cursor.execute(sql, params)
+                            rows = list(await cursor.fetchall()) if unit.fetch else []
+                            results.append(WriteResult(cursor.rowcount, cursor.lastrowid, rows))
+                        await cursor.execute("RELEASE write_unit")
+                        outcomes.append(results)
+                    except sqlite3.Error as e:
+                        await cursor.execute("ROLLBACK TO write_unit")
+                        await cursor.execute("RELEASE write_unit")
+                        self.stats.failed_statements += len(unit.statements)
+                        outcomes.append(e)
+        except Exception as e:
+            self.stats.failed_commits += 1
+            logger.error(f"Group commit of {size} statements failed: {e}")
+            for unit in batch:
+                if not unit.future.done():
+                    unit.future.set_exception(e)
+            return
+
+        commit_time = time.perf_counter() - start
+        self.stats.record_batch(size, commit_time)
+        logger.debug(f"Group commit: {size} statements in {commit_time * 1000:.2f}ms")
+        for unit, outcome in zip(batch, outcomes):
+            if unit.future.done():
+                continue
+            if isinstance(outcome, Exception):
+                unit.future.set_exception(outcome)
+            else:
+                unit.future.set_result(outcome)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get batch size and commit latency statistics."""
+        stats = self.stats.as_dict()
+        stats["pending_statements"] = self._pending_statements
+        return stats
+
+    async def close(self) -> None:
+        """Flush everything still queued and stop the flusher task."""
+        if self._task is None or self._task.done():
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+
+# Global write queue bound to the global database manager
+write_queue = GroupCommitWriter()
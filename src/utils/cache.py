@@ -0,0 +1,240 @@
+"""
+Reusable async cache for FarnPathBot.
+
+Size-bounded LRU with per-entry TTL, single-flight loading (concurrent misses
+for a key share one call to the backend), tag-based invalidation and
+hit/miss/eviction statistics. Keys are built by explicit key functions, never
+from hashed argument strings.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    """Hit, miss and eviction counters of one cache."""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Counters plus the hit rate, coalesced loads counting as hits."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tags")
+
+    def __init__(self, value: Any, expires_at: float, tags: Tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class AsyncCache:
+    """Bounded LRU + TTL cache with single-flight loading and tag invalidation."""
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1024,
+        ttl: float = 300,
+        enabled: bool = True,
+        cache_none: bool = False,
+    ):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.enabled = enabled
+        self.cache_none = cache_none
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        # Loads in flight: key -> (future shared by waiters, tags the result will carry)
+        self._inflight: Dict[Hashable, Tuple[asyncio.Future, Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> Any:
+        """Fresh value for `key` (refreshing its LRU position) or _MISSING."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.expirations += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    def _store(self, key: Hashable, value: Any, tags: Iterable[str], ttl: Optional[float]) -> None:
+        self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = _Entry(value, time.monotonic() + (self.ttl if ttl is None else ttl), tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value without loading (a miss returns `default`)."""
+        value = self._lookup(key) if self.enabled else _MISSING
+        if value is _MISSING:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None) -> None:
+        """Store a value; a load of the same key already in flight will not overwrite it."""
+        self._inflight.pop(key, None)
+        if self.enabled and (value is not None or self.cache_none):
+            self._store(key, value, tags, ttl)
+
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> None:
+        """Replace a cached value with `func(value)` after a write; no-op if not cached."""
+        self._inflight.pop(key, None)
+        value = self._lookup(key) if self.enabled else _MISSING
+        if value is not _MISSING:
+            entry = self._entries[key]
+            entry.value = func(value)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value, or call `loader` once for all concurrent callers."""
+        if not self.enabled:
+            return await loader()
+
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.stats.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats.coalesced += 1
+            return await asyncio.shield(inflight[0])
+
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        marker = (future, tuple(tags))
+        self._inflight[key] = marker
+        try:
+            value = await loader()
+        except BaseException as e:
+            if self._inflight.get(key) is marker:
+                del self._inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Retrieved here so a failure nobody else awaited isn't reported as lost
+                future.exception()
+            raise
+        # A write or invalidation during the load dropped the in-flight marker: don't store
+        if self._inflight.get(key) is marker:
+            del self._inflight[key]
+            if value is not None or self.cache_none:
+                self._store(key, value, marker[1], ttl)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop one key (and any load of it in flight)."""
+        self._inflight.pop(key, None)
+        if self._remove(key):
+            self.stats.invalidations += 1
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every key stored with `tag`. Returns the number of keys dropped."""
+        keys = list(self._tags.get(tag, ()))
+        for key in keys:
+            self.invalidate(key)
+        # Loads that started before the write must not store their stale result
+        for key in [key for key, (_, tags) in self._inflight.items() if tag in tags]:
+            del self._inflight[key]
+        return len(keys)
+
+    def purge_expired(self) -> int:
+        """Remove expired entries that nobody has asked for. Returns the number removed."""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.stats.expirations += len(expired)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Drop everything."""
+        self._entries.clear()
+        self._tags.clear()
+        self._inflight.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counters and the current size."""
+        stats = self.stats.as_dict()
+        stats["size"] = len(self._entries)
+        stats["enabled"] = self.enabled
+        return stats
+
+
+def cached(
+    cache: AsyncCache,
+    key: Callable[..., Hashable],
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+    ttl: Optional[float] = None,
+):
+    """Cache an async function's results under `key(*args, **kwargs)`."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            return await cache.get_or_load(
+                key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                tags=tags(*args, **kwargs) if tags is not None else (),
+                ttl=ttl,
+            )
+        wrapper.cache = cache
+        return wrapper
+    return decorator
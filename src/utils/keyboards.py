@@ -1,15 +1,210 @@
 """
 Keyboard utilities for FarnPathBot.
+
+Every keyboard the bot sends is built once by the registry: the static reply
+keyboards and one inline keyboard per combination of completed activity
+categories (2^n for n categories), looked up by the day's category bitmask.
+Each markup is stored with its JSON payload serialized in advance, which
+PrebuiltPayloadSession sends as is instead of serializing the markup again.
+
+Because that payload is looked up by the markup's identity, the markups are
+deep-frozen: every object is a frozen copy of its aiogram type and every row
+a read-only list, so a handler changing a shared keyboard gets an error
+instead of the stale payload being sent. The registry rebuilds itself when
+ACTIVITY_CATEGORIES (or their names and emoji) change.
 """
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple, Type, TypeVar, Union
 
-def get_main_menu_keyboard() -> ReplyKeyboardMarkup:
-    """Get main menu keyboard."""
-    buttons = [
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup,
+    ReplyKeyboardRemove, TelegramObject, WebAppInfo
+)
+from pydantic import ConfigDict
+
+from src.config.config import ACTIVITY_CATEGORIES, CATEGORY_EMOJI_MAP, CATEGORY_NAMES_MAP
+
+logger = logging.getLogger(__name__)
+
+Markup = Union[InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove]
+
+MAIN_MENU = "main_menu"
+LOCATION_REQUEST = "location_request"
+REMOVE = "remove"
+GROUP_STATS = "group_stats"
+
+
+@dataclass(frozen=True)
+class PrebuiltKeyboard:
+    """A markup together with its serialized reply_markup payload."""
+    markup: Markup
+    payload: str
+
+
+class FrozenList(list):
+    """A list that refuses changes (still a list, so aiogram serializes it as one)."""
+
+    def _frozen(self, *args: Any, **kwargs: Any) -> None:
+        raise TypeError("prebuilt keyboards are read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen
+    append = extend = insert = pop = remove = clear = sort = reverse = _frozen
+
+
+_frozen_types: Dict[type, type] = {}
+T = TypeVar("T", bound=TelegramObject)
+
+
+def _frozen_type(cls: Type[T]) -> Type[T]:
+    """Subclass of an aiogram type whose instances raise on assignment."""
+    frozen = _frozen_types.get(cls)
+    if frozen is None:
+        frozen = type(cls.__name__, (cls,), {"model_config": ConfigDict(frozen=True), "__module__": __name__})
+        # aiogram defers building model schemas
+        frozen.model_rebuild()
+        _frozen_types[cls] = frozen
+    return frozen
+
+
+def _freeze(value: Any) -> Any:
+    """Deep read-only copy of an aiogram object."""
+    if isinstance(value, TelegramObject):
+        fields = {name: _freeze(getattr(value, name)) for name in value.model_fields_set}
+        return _frozen_type(type(value)).model_construct(_fields_set=value.model_fields_set, **fields)
+    if isinstance(value, list):
+        return FrozenList(_freeze(item) for item in value)
+    return value
+
+
+def _prebuild(markup: Markup) -> PrebuiltKeyboard:
+    frozen = _freeze(markup)
+    return PrebuiltKeyboard(frozen, json.dumps(frozen.model_dump(exclude_none=True, warnings=False)))
+
+
+def _build_static() -> Dict[str, PrebuiltKeyboard]:
+    """Keyboards that never depend on user state."""
+    main_menu = ReplyKeyboardMarkup(keyboard=[
         [KeyboardButton(text="🗓️ План дня"), KeyboardButton(text="✨ Мантра")],
         [KeyboardButton(text="✍️ Дневник Ныхас"), KeyboardButton(text="📍 Локация")],
-        [KeyboardButton(text="📊 Статистика"), KeyboardButton(text="🌄 Встреча восхода и заката")], 
+        [KeyboardButton(text="📊 Статистика"), KeyboardButton(text="🌄 Встреча восхода и заката")],
         [KeyboardButton(text="❓ Помощь")],
         [KeyboardButton(text="🚀 Mini App", web_app=WebAppInfo(url="https://e0dfaa5fc43a.ngrok-free.app"))]
-    ]
-    return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
+    ], resize_keyboard=True)
+    location_request = ReplyKeyboardMarkup(keyboard=[
+        [KeyboardButton(text="📍 Отправить мою геолокацию", request_location=True)],
+        [KeyboardButton(text="🚫 Отмена")]
+    ], resize_keyboard=True, one_time_keyboard=True)
+    group_stats = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🌍 Общая статистика", callback_data="show_group_stats")]
+    ])
+    return {
+        MAIN_MENU: _prebuild(main_menu),
+        LOCATION_REQUEST: _prebuild(location_request),
+        REMOVE: _prebuild(ReplyKeyboardRemove()),
+        GROUP_STATS: _prebuild(group_stats),
+    }
+
+
+def _build_activity_keyboard(categories: Sequence[str], mask: int) -> InlineKeyboardMarkup:
+    """Inline keyboard of the daily plan for one completion mask."""
+    buttons = []
+    for i, cat_code in enumerate(categories):
+        emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
+        cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
+        completed = bool(mask & (1 << i))
+        buttons.append(
+            InlineKeyboardButton(
+                text=f"{'✅' if completed else emoji} {cat_name}",
+                callback_data=f"log_activity:{cat_code}"
+            )
+        )
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
+class KeyboardRegistry:
+    """Prebuilt static keyboards and per-mask activity keyboards."""
+
+    def __init__(self, categories: Sequence[str] = ACTIVITY_CATEGORIES):
+        # Kept by reference so edits to the configured list are noticed
+        self.categories = categories
+        self._fingerprint: Optional[Tuple[Any, ...]] = None
+        self._static: Dict[str, PrebuiltKeyboard] = {}
+        self._activity: Tuple[PrebuiltKeyboard, ...] = ()
+        self._payloads: Dict[int, str] = {}
+        self.builds = 0
+
+    def _current_fingerprint(self) -> Tuple[Any, ...]:
+        return tuple(
+            (cat_code, CATEGORY_EMOJI_MAP.get(cat_code), CATEGORY_NAMES_MAP.get(cat_code))
+            for cat_code in self.categories
+        )
+
+    def build(self) -> None:
+        """Build every keyboard and swap them in at once."""
+        fingerprint = self._current_fingerprint()
+        categories = [cat_code for cat_code, _, _ in fingerprint]
+        static = _build_static()
+        activity = tuple(
+            _prebuild(_build_activity_keyboard(categories, mask))
+            for mask in range(1 << len(categories))
+        )
+        # Keyed by identity: the registry keeps every markup alive, so ids stay unique
+        payloads = {id(keyboard.markup): keyboard.payload for keyboard in (*static.values(), *activity)}
+
+        self._static, self._activity, self._payloads = static, activity, payloads
+        self._fingerprint = fingerprint
+        self.builds += 1
+        logger.info(f"Keyboard registry built: {len(static)} static, {len(activity)} activity keyboards")
+
+    def _ensure_current(self) -> None:
+        if self._current_fingerprint() != self._fingerprint:
+            self.build()
+
+    def get(self, name: str) -> Markup:
+        """A static keyboard by name (KeyError for unknown names)."""
+        self._ensure_current()
+        return self._static[name].markup
+
+    def activity_keyboard(self, mask: int) -> InlineKeyboardMarkup:
+        """Daily plan keyboard for a categories bitmask (bit i = categories[i] done)."""
+        self._ensure_current()
+        return self._activity[mask & (len(self._activity) - 1)].markup
+
+    def payload_for(self, markup: Any) -> Optional[str]:
+        """Serialized payload of a prebuilt markup, or None for any other object."""
+        return self._payloads.get(id(markup))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get keyboard counts and the number of builds."""
+        return {
+            "static": len(self._static),
+            "activity": len(self._activity),
+            "builds": self.builds,
+        }
+
+
+class PrebuiltPayloadSession(AiohttpSession):
+    """Aiohttp session that sends registry keyboards from their prebuilt payloads."""
+
+    def __init__(self, registry: Optional[KeyboardRegistry] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.registry = registry if registry is not None else keyboard_registry
+
+    def prepare_value(self, value: Any, bot: Any, files: Dict[str, Any], _dumps_json: bool = True) -> Any:
+        if _dumps_json:
+            payload = self.registry.payload_for(value)
+            if payload is not None:
+                return payload
+        return super().prepare_value(value, bot=bot, files=files, _dumps_json=_dumps_json)
+
+
+# Global keyboard registry
+keyboard_registry = KeyboardRegistry()
+
+
+def get_main_menu_keyboard() -> ReplyKeyboardMarkup:
+    """Get main menu keyboard."""
+    return keyboard_registry.get(MAIN_MENU)
@@ -3,10 +3,14 @@ Performance optimizations and utilities for FarnPathBot.
 """
 import asyncio
 import logging
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Hashable, Optional
 import time
 
+from src.config.config import OUTBOUND_SETTINGS, PERFORMANCE_SETTINGS
+from src.utils.cache import AsyncCache, cached
+
 logger = logging.getLogger(__name__)
 
 def async_timer(func: Callable) -> Callable:
@@ -25,64 +29,125 @@ def async_timer(func: Callable) -> Callable:
             raise
     return wrapper
 
-def cache_result(ttl: int = 300):
-    """Simple in-memory cache decorator with TTL."""
+def cache_result(ttl: int = 300, key: Optional[Callable[..., Hashable]] = None, max_size: int = 1024):
+    """
+    In-memory LRU/TTL cache decorator with request coalescing.
+
+    `key` builds the cache key from the call's arguments; by default the
+    (hashable) positional and keyword arguments themselves are the key.
+    """
     def decorator(func: Callable) -> Callable:
-        cache: Dict[str, tuple] = {}
-        
-        @wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
-            # Create cache key from args and kwargs
-            key = f"{func.__name__}:{hash(str(args) + str(sorted(kwargs.items())))}"
-            
-            # Check if cached result is still valid
-            if key in cache:
-                result, timestamp = cache[key]
-                if time.time() - timestamp < ttl:
-                    logger.debug(f"Cache hit for {func.__name__}")
-                    return result
-                else:
-                    del cache[key]
-            
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            cache[key] = (result, time.time())
-            logger.debug(f"Cached result for {func.__name__}")
-            return result
-        
-        return wrapper
+        cache = AsyncCache(
+            func.__name__, max_size=max_size, ttl=ttl,
+            enabled=PERFORMANCE_SETTINGS["enable_caching"],
+        )
+        key_func = key or (lambda *args, **kwargs: (args, tuple(sorted(kwargs.items()))))
+        return cached(cache, key_func)(func)
     return decorator
 
+class KeyedRateLimiter:
+    """
+    GCRA rate limiter: `rate` events per second per key, bursts up to `burst`.
+
+    Each key stores only its theoretical arrival time, so a check is O(1). Keys
+    are kept in access order; keys that are idle (fully replenished) or beyond
+    max_keys are evicted from the old end.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_keys: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.max_keys = max_keys
+        self.clock = clock
+        self._tat: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def hit(self, key: Hashable) -> float:
+        """Count one event for `key`; return 0.0 if allowed, else seconds until it would be."""
+        now = self.clock()
+        tat = max(self._tat.get(key, now), now)
+        wait = tat - self.tolerance - now
+        if wait > 0:
+            return wait
+        self._tat[key] = tat + self.interval
+        self._tat.move_to_end(key)
+        self._evict(now)
+        return 0.0
+
+    def _evict(self, now: float) -> None:
+        tats = self._tat
+        while tats:
+            key, tat = next(iter(tats.items()))
+            if tat > now and len(tats) <= self.max_keys:
+                break
+            del tats[key]
+
+    async def acquire(self, key: Hashable = None) -> None:
+        """Wait until an event for `key` is allowed and count it."""
+        while (wait := self.hit(key)) > 0:
+            await asyncio.sleep(wait)
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
 class RateLimiter:
-    """Simple rate limiter for API calls."""
+    """Rate limiter for API calls: max_calls per time_window seconds."""
     
     def __init__(self, max_calls: int, time_window: int):
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = []
+        self._limiter = KeyedRateLimiter(rate=max_calls / time_window, burst=max_calls, max_keys=1)
     
     async def acquire(self) -> bool:
         """Acquire permission to make a call."""
-        now = time.time()
-        
-        # Remove old calls outside the time window
-        self.calls = [call_time for call_time in self.calls if now - call_time < self.time_window]
-        
-        if len(self.calls) >= self.max_calls:
-            # Calculate wait time
-            oldest_call = min(self.calls)
-            wait_time = self.time_window - (now - oldest_call)
-            if wait_time > 0:
-                logger.debug(f"Rate limit reached, waiting {wait_time:.2f}s")
-                await asyncio.sleep(wait_time)
-                return await self.acquire()
-        
-        self.calls.append(now)
+        await self._limiter.acquire()
+        return True
+
+class TokenBucket:
+    """Token bucket: refills at `rate` tokens per second, holds at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` can be taken (0.0 if they can be taken now)."""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` if available without waiting."""
+        if self.wait_time(tokens) > 0:
+            return False
+        self.tokens -= tokens
         return True
 
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until `tokens` are available and take them."""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.wait_time(tokens))
+
+    @property
+    def full(self) -> bool:
+        """Whether the bucket has refilled completely (an idle bucket can be dropped)."""
+        self._refill()
+        return self.tokens >= self.capacity
+
 # Global rate limiters
 geocoding_limiter = RateLimiter(max_calls=10, time_window=60)  # 10 calls per minute
-api_limiter = RateLimiter(max_calls=100, time_window=60)  # 100 calls per minute
+# Bot API sends across all chats; shared by the outbound queue
+api_limiter = TokenBucket(rate=OUTBOUND_SETTINGS["global_rate"], capacity=OUTBOUND_SETTINGS["global_burst"])
 
 class PerformanceMonitor:
     """Monitor performance metrics."""
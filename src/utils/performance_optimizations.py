@@ -4,9 +4,12 @@ Performance optimizations and utilities for FarnPathBot.
 import asyncio
 import logging
 from functools import wraps
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Hashable, Optional
 import time
 
+from src.config.config import PERFORMANCE_SETTINGS
+from src.utils.cache import AsyncCache, cached
+
 logger = logging.getLogger(__name__)
 
 def async_timer(func: Callable) -> Callable:
@@ -25,32 +28,20 @@ def async_timer(func: Callable) -> Callable:
             raise
     return wrapper
 
-def cache_result(ttl: int = 300):
-    """Simple in-memory cache decorator with TTL."""
+def cache_result(ttl: int = 300, key: Optional[Callable[..., Hashable]] = None, max_size: int = 1024):
+    """
+    In-memory LRU/TTL cache decorator with request coalescing.
+
+    `key` builds the cache key from the call's arguments; by default the
+    (hashable) positional and keyword arguments themselves are the key.
+    """
     def decorator(func: Callable) -> Callable:
-        cache: Dict[str, tuple] = {}
-        
-        @wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
-            # Create cache key from args and kwargs
-            key = f"{func.__name__}:{hash(str(args) + str(sorted(kwargs.items())))}"
-            
-            # Check if cached result is still valid
-            if key in cache:
-                result, timestamp = cache[key]
-                if time.time() - timestamp < ttl:
-                    logger.debug(f"Cache hit for {func.__name__}")
-                    return result
-                else:
-                    del cache[key]
-            
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            cache[key] = (result, time.time())
-            logger.debug(f"Cached result for {func.__name__}")
-            return result
-        
-        return wrapper
+        cache = AsyncCache(
+            func.__name__, max_size=max_size, ttl=ttl,
+            enabled=PERFORMANCE_SETTINGS["enable_caching"],
+        )
+        key_func = key or (lambda *args, **kwargs: (args, tuple(sorted(kwargs.items()))))
+        return cached(cache, key_func)(func)
     return decorator
 
 class RateLimiter:
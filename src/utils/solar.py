@@ -0,0 +1,135 @@
+"""
+Vectorized sunrise and sunset for bulk scheduling.
+
+NumPy implementation of the NOAA solar equations, the same ones astral uses,
+evaluated for whole arrays of latitudes, longitudes and dates at once. It
+follows astral's conventions: the horizon is the sun's apparent radius plus
+standard refraction, the transit time is refined once at the event time, and
+an event that falls on a neighbouring local day is recomputed for the day on
+the other side. Locations where the sun does not cross the horizon are
+flagged as polar day or polar night.
+"""
+from typing import Any, NamedTuple, Tuple
+
+import numpy as np
+
+# Solar zenith at sunrise/sunset: 90° + apparent radius (16') + refraction at the horizon
+SUNRISE_ZENITH = 90.0 + 16.0 / 60.0 + 0.5224404686748969
+
+# Julian day of 1970-01-01 00:00 UTC
+_UNIX_EPOCH_JD = 2440587.5
+_J2000_JD = 2451545.0
+
+_MINUTE = np.timedelta64(60_000, "ms")
+
+
+class SolarEvents(NamedTuple):
+    """Sunrise/sunset arrays (datetime64[s], UTC); NaT where the event does not happen."""
+    sunrise: np.ndarray
+    sunset: np.ndarray
+    polar_day: np.ndarray
+    polar_night: np.ndarray
+
+
+def _declination_and_eq_of_time(jc: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Solar declination (degrees) and equation of time (minutes) for Julian centuries."""
+    l0 = np.radians((280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0)
+    m = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    center = (
+        np.sin(m) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * m) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * m) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_long = np.radians(np.degrees(l0) + center - 0.00569 - 0.00478 * np.sin(omega))
+    seconds = 21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))
+    obliquity = np.radians(23.0 + (26.0 + seconds / 60.0) / 60.0 + 0.00256 * np.cos(omega))
+
+    declination = np.degrees(np.arcsin(np.sin(obliquity) * np.sin(apparent_long)))
+    y = np.tan(obliquity / 2.0) ** 2
+    eq_time = 4.0 * np.degrees(
+        y * np.sin(2 * l0)
+        - 2 * e * np.sin(m)
+        + 4 * e * y * np.sin(m) * np.cos(2 * l0)
+        - 0.5 * y * y * np.sin(4 * l0)
+        - 1.25 * e * e * np.sin(2 * m)
+    )
+    return declination, eq_time
+
+
+def _transit(
+    days: np.ndarray, lat: np.ndarray, lon: np.ndarray, rising: bool
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Event time (minutes after 00:00 UTC of `days`) and below/above-horizon flags."""
+    jd = _UNIX_EPOCH_JD + days.astype(np.int64)
+    lat_rad = np.radians(lat)
+    cos_zenith = np.cos(np.radians(SUNRISE_ZENITH))
+    adjustment = 0.0
+    never_rises = np.zeros(np.shape(jd), dtype=bool)
+    never_sets = np.zeros(np.shape(jd), dtype=bool)
+
+    for _ in range(2):
+        jc = (jd + adjustment - _J2000_JD) / 36525.0
+        declination, eq_time = _declination_and_eq_of_time(jc)
+        decl_rad = np.radians(declination)
+        h = (cos_zenith - np.sin(lat_rad) * np.sin(decl_rad)) / (np.cos(lat_rad) * np.cos(decl_rad))
+        never_rises |= h > 1.0
+        never_sets |= h < -1.0
+
+        hour_angle = np.degrees(np.arccos(np.clip(h, -1.0, 1.0)))
+        if not rising:
+            hour_angle = -hour_angle
+        offset = (-lon - hour_angle) * 4.0 - eq_time
+        offset = np.where(offset < -720.0, offset + 1440.0, offset)
+        minutes = 720.0 + offset
+        adjustment = minutes / 1440.0
+
+    return minutes, never_rises, never_sets
+
+
+def _event(
+    days: np.ndarray, lat: np.ndarray, lon: np.ndarray, offsets: np.ndarray, rising: bool
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """One event on each local day, with polar flags."""
+    minutes, never_rises, never_sets = _transit(days, lat, lon, rising)
+    polar = never_rises | never_sets
+    event = days + np.round(minutes * 60_000).astype(np.int64) * np.timedelta64(1, "ms")
+    local_day = (event + offsets * _MINUTE).astype("datetime64[D]")
+
+    # Like astral: an event landing on the previous/next local day is taken from the other side
+    shift = np.where(local_day < days, 1, np.where(local_day > days, -1, 0))
+    retry = (shift != 0) & ~polar
+    if retry.any():
+        retry_days = days + shift.astype("timedelta64[D]")
+        minutes2, never_rises2, never_sets2 = _transit(retry_days, lat, lon, rising)
+        event2 = retry_days + np.round(minutes2 * 60_000).astype(np.int64) * np.timedelta64(1, "ms")
+        found = ~(never_rises2 | never_sets2) & ((event2 + offsets * _MINUTE).astype("datetime64[D]") == days)
+        event = np.where(retry, np.where(found, event2, np.datetime64("NaT")), event)
+
+    event = np.where(polar, np.datetime64("NaT"), event)
+    return event.astype("datetime64[s]"), never_rises, never_sets
+
+
+def sun_events(latitudes: Any, longitudes: Any, dates: Any, utc_offsets: Any = 0) -> SolarEvents:
+    """
+    Sunrise and sunset for arrays of locations and dates.
+
+    Inputs broadcast against each other. `dates` are local calendar dates
+    (anything np.datetime64[D] accepts: date objects, ISO strings), and
+    `utc_offsets` are the locations' UTC offsets in minutes on those dates;
+    each event returned happens on its local date. Latitudes beyond ±89.8°
+    are clamped, as in astral.
+    """
+    lat = np.clip(np.asarray(latitudes, dtype=np.float64), -89.8, 89.8)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    days = np.asarray(dates, dtype="datetime64[D]")
+    offsets = np.asarray(utc_offsets, dtype=np.int64)
+    lat, lon, days, offsets = np.broadcast_arrays(lat, lon, days, offsets)
+
+    sunrise, rise_below, rise_above = _event(days, lat, lon, offsets, rising=True)
+    sunset, set_below, set_above = _event(days, lat, lon, offsets, rising=False)
+    polar_night = rise_below | set_below
+    polar_day = (rise_above | set_above) & ~polar_night
+    return SolarEvents(sunrise=sunrise, sunset=sunset, polar_day=polar_day, polar_night=polar_night)
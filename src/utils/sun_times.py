@@ -0,0 +1,146 @@
+"""
+Sunrise/sunset service for FarnPathBot.
+
+Most users share a handful of locations, so sun times are cached per
+(latitude, longitude rounded to about 1 km, timezone, local date). A daily job
+precomputes today's and tomorrow's times for every distinct location in the
+users table, which leaves the daily plan with a dictionary lookup.
+"""
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import pytz
+
+from src.config.config import SUN_TIMES_SETTINGS
+from src.database.queries import QueryCatalog, query_catalog
+from src.utils.utils import SunTimes, get_sun_times
+
+logger = logging.getLogger(__name__)
+
+LocationKey = Tuple[float, float, str]
+
+# Locations computed between yields to the event loop during precomputation
+_PRECOMPUTE_CHUNK = 200
+
+
+class SunTimesService:
+    """Cache of sun times keyed by rounded location, timezone and date."""
+
+    def __init__(self, queries: QueryCatalog = query_catalog, settings: Dict[str, Any] = SUN_TIMES_SETTINGS):
+        self.queries = queries
+        self.settings = settings
+        self.precision = settings["precision"]
+        self._times: Dict[Tuple[float, float, str, date], SunTimes] = {}
+        self.hits = 0
+        self.misses = 0
+        self.precomputed = 0
+        self.last_precompute_seconds: Optional[float] = None
+
+    def location_key(self, lat: Optional[float], lon: Optional[float], tz_str: Optional[str]) -> LocationKey:
+        """Cache key of a location (missing values mean the plan's defaults)."""
+        return round(lat or 0, self.precision), round(lon or 0, self.precision), tz_str or "UTC"
+
+    @staticmethod
+    def _local_today(tz_str: str) -> Optional[date]:
+        try:
+            return datetime.now(pytz.timezone(tz_str)).date()
+        except pytz.UnknownTimeZoneError:
+            return None
+
+    def _compute(self, key: LocationKey, day: Optional[date]) -> SunTimes:
+        lat, lon, tz_str = key
+        # get_sun_times logs and returns empty times for bad zones or polar days
+        times = get_sun_times(lat, lon, tz_str, target_date=day)
+        if day is not None:
+            self._times[(lat, lon, tz_str, day)] = times
+        return times
+
+    def get(
+        self,
+        lat: Optional[float],
+        lon: Optional[float],
+        tz_str: Optional[str],
+        target_date: Optional[date] = None,
+    ) -> SunTimes:
+        """Sun times for a location on `target_date` (today in `tz_str` by default)."""
+        key = self.location_key(lat, lon, tz_str)
+        day = target_date if target_date is not None else self._local_today(key[2])
+        times = self._times.get((*key, day))
+        if times is not None:
+            self.hits += 1
+            return times
+        self.misses += 1
+        return self._compute(key, day)
+
+    async def precompute(self) -> int:
+        """Compute today's and tomorrow's times for every user location. Returns entries added."""
+        started = time.perf_counter()
+        rows = await self.queries.fetch_all("distinct_user_locations", (self.precision, self.precision))
+        oldest = date.today() - timedelta(days=1)
+        self.purge(oldest)
+
+        added = 0
+        for i, (lat, lon, tz_str) in enumerate(rows):
+            key = self.location_key(lat, lon, tz_str)
+            today = self._local_today(key[2])
+            if today is None:
+                continue
+            for day in (today, today + timedelta(days=1)):
+                if (*key, day) not in self._times:
+                    self._compute(key, day)
+                    added += 1
+            if i % _PRECOMPUTE_CHUNK == _PRECOMPUTE_CHUNK - 1:
+                await asyncio.sleep(0)
+
+        self.precomputed += added
+        self.last_precompute_seconds = time.perf_counter() - started
+        logger.info(
+            f"Sun times precomputed for {len(rows)} locations: {added} new entries "
+            f"in {self.last_precompute_seconds:.2f}s"
+        )
+        return added
+
+    def purge(self, before: date) -> int:
+        """Drop entries for dates before `before`. Returns the number dropped."""
+        stale = [key for key in self._times if key[3] < before]
+        for key in stale:
+            del self._times[key]
+        return len(stale)
+
+    def register_jobs(self, scheduler) -> None:
+        """Add the daily precomputation to an AsyncIOScheduler."""
+        scheduler.add_job(
+            self._precompute_safely, 'cron',
+            hour=self.settings["precompute_hour"], minute=self.settings["precompute_minute"],
+            timezone='UTC', id="sun_times_precompute",
+        )
+
+    async def _precompute_safely(self) -> None:
+        """Daily precomputation job; a failure is logged and retried the next day."""
+        try:
+            await self.precompute()
+        except Exception as e:
+            logger.error(f"Sun times precomputation failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._times),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "precomputed": self.precomputed,
+            "last_precompute_seconds": self.last_precompute_seconds,
+        }
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        self._times.clear()
+
+
+# Global sun times service
+sun_times_service = SunTimesService()
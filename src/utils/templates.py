@@ -0,0 +1,70 @@
+"""
+Precompiled MarkdownV2 message templates for FarnPathBot.
+
+A template is compiled once, at import: its static text is split from its
+fields and kept as ready-to-send MarkdownV2, so rendering only escapes the
+dynamic values and joins the pieces in one pass.
+
+Template text uses str.format field syntax:
+    {name}    value is escaped with escape_md at render time
+    {name!r}  value is already MarkdownV2 (a rendered sub-template) and is inserted as is
+Plain string parts are MarkdownV2 written by hand; Static parts are plain text
+that is escaped once when the template is compiled.
+"""
+from string import Formatter
+from typing import Any, List, Optional, Tuple, Union
+
+from src.utils.utils import escape_md
+
+_formatter = Formatter()
+
+
+class Static(str):
+    """Plain text part of a template, escaped once at compile time."""
+
+
+class MarkdownTemplate:
+    """MarkdownV2 message with static parts compiled once and fields escaped on render."""
+
+    __slots__ = ("_pieces", "_fields", "fields")
+
+    def __init__(self, *parts: Union[str, Static]):
+        pieces: List[Optional[str]] = []
+        fields: List[Tuple[int, str, bool]] = []
+
+        def add_literal(text: str) -> None:
+            if not text:
+                return
+            if pieces and pieces[-1] is not None:
+                pieces[-1] += text
+            else:
+                pieces.append(text)
+
+        for part in parts:
+            if isinstance(part, Static):
+                add_literal(escape_md(part))
+                continue
+            for literal, name, spec, conversion in _formatter.parse(part):
+                add_literal(literal)
+                if name is None:
+                    continue
+                if not name.isidentifier():
+                    raise ValueError(f"Template field must be a plain name: {{{name}}}")
+                if spec:
+                    raise ValueError(f"Format specs are not supported in templates: {{{name}:{spec}}}")
+                if conversion not in (None, "r"):
+                    raise ValueError(f"Unknown template conversion: {{{name}!{conversion}}}")
+                fields.append((len(pieces), name, conversion == "r"))
+                pieces.append(None)
+
+        self._pieces = pieces
+        self._fields = tuple(fields)
+        self.fields = frozenset(name for _, name, _ in fields)
+
+    def render(self, **values: Any) -> str:
+        """Fill the fields (missing ones raise KeyError) and join the message."""
+        pieces = self._pieces.copy()
+        for index, name, raw in self._fields:
+            value = values[name]
+            pieces[index] = value if raw else escape_md(value)
+        return "".join(pieces)
@@ -0,0 +1,50 @@
+"""
+Shared pytest configuration for FarnPathBot tests.
+"""
+import os
+from typing import Any, Dict
+
+# src.config.config refuses to import without a token; tests never reach Telegram
+os.environ.setdefault("API_TOKEN", "123456:TEST-TOKEN")
+
+import pytest
+import pytest_asyncio
+
+from src.database.caches import read_cache, user_cache
+from src.database.community import community_aggregator
+from src.database.connection import db_manager
+from src.database.mantra_catalog import mantra_catalog
+from src.database.migrations import run_migrations
+from src.database.snapshot import analytics_snapshot
+from src.database.write_queue import write_queue
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    """Point the global database manager at a fresh, migrated database."""
+    await write_queue.close()
+    await db_manager.close()
+    original_path = db_manager.db_path
+    db_manager.db_path = str(tmp_path / "test.db")
+    user_cache.clear()
+    read_cache.clear()
+    mantra_catalog.reset()
+    community_aggregator.reset()
+    await run_migrations(db_manager)
+    try:
+        yield db_manager
+    finally:
+        await write_queue.close()
+        await analytics_snapshot.close()
+        await db_manager.close()
+        db_manager.db_path = original_path
+
+
+@pytest.fixture
+def make_settings():
+    """Factory of settings dicts: a module's base defaults plus per-test overrides."""
+    def factory(defaults: Dict[str, Any], **overrides: Any) -> Dict[str, Any]:
+        unknown = overrides.keys() - defaults.keys()
+        assert not unknown, f"unknown settings: {sorted(unknown)}"
+        return {**defaults, **overrides}
+    return factory
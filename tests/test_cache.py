@@ -0,0 +1,103 @@
+"""
+Tests for the async cache and the repository caches built on it.
+"""
+import asyncio
+
+import pytest
+
+from src.database.caches import read_cache
+from src.database.instrumentation import query_budget
+from src.database.repository import ActivityRepository, DiaryRepository, UserRepository
+from src.utils.cache import AsyncCache, cached
+
+
+@pytest.mark.asyncio
+async def test_cached_reads_are_invalidated_by_writes(db):
+    await UserRepository.add_user_if_not_exists(1, "Алан")
+
+    @query_budget(2)
+    async def reads():
+        stats = await ActivityRepository.get_user_weekly_stats(1)
+        entries = await DiaryRepository.get_entries(1)
+        # Served from the read cache the second time
+        assert await ActivityRepository.get_user_weekly_stats(1) is stats
+        assert await DiaryRepository.get_entries(1) is entries
+        return stats, entries
+
+    stats, entries = await reads()
+    assert stats.tasks_done_total == 0 and entries == []
+
+    await ActivityRepository.log_daily_activity(1, "nature")
+    await DiaryRepository.add_entry(1, "Спасибо")
+    assert (await ActivityRepository.get_user_weekly_stats(1)).tasks_done_total == 1
+    assert len(await DiaryRepository.get_entries(1)) == 1
+    assert read_cache.get_stats()["invalidations"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = AsyncCache("test", max_size=10, ttl=60)
+    loads = []
+
+    @cached(cache, key=lambda user_id: ("user", user_id))
+    async def load(user_id):
+        loads.append(user_id)
+        await asyncio.sleep(0.01)
+        return {"id": user_id}
+
+    results = await asyncio.gather(*(load(7) for _ in range(10)))
+    assert loads == [7]
+    assert all(result is results[0] for result in results)
+    assert cache.get_stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_lru_ttl_and_tag_eviction():
+    cache = AsyncCache("test", max_size=2, ttl=60)
+    cache.set(1, "a", tags=("user:1",))
+    cache.set(2, "b", tags=("user:2",))
+    assert cache.get(1) == "a"
+    cache.set(3, "c", tags=("user:1",))
+    # 2 was least recently used
+    assert cache.get(2) is None
+    assert cache.get_stats()["evictions"] == 1
+
+    assert cache.invalidate_tag("user:1") == 2
+    assert len(cache) == 0
+
+    expired = AsyncCache("test", ttl=0)
+    expired.set(1, "a")
+    assert expired.purge_expired() == 1
+    assert expired.get_stats()["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_during_load_wins():
+    """A load that started before a write never overwrites the written value."""
+    cache = AsyncCache("test")
+    release = asyncio.Event()
+
+    async def stale_loader():
+        await release.wait()
+        return "stale"
+
+    load = asyncio.create_task(cache.get_or_load(1, stale_loader, tags=("user:1",)))
+    await asyncio.sleep(0)
+    cache.set(1, "fresh")
+    release.set()
+    assert await load == "stale"
+    assert cache.get(1) == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_loads():
+    cache = AsyncCache("test", enabled=False)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return "value"
+
+    await cache.get_or_load(1, loader)
+    await cache.get_or_load(1, loader)
+    assert len(calls) == 2
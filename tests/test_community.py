@@ -0,0 +1,50 @@
+"""
+Tests for the in-memory community aggregates.
+"""
+import pytest
+
+from src.database.community import CommunityAggregator, community_aggregator
+from src.database.instrumentation import query_budget
+from src.database.repository import ActivityRepository, StatsRepository, UserRepository
+
+NATURE, SERVICE = 2, 4
+
+
+def test_ring_counts_distinct_users_and_rotates():
+    aggregator = CommunityAggregator(window_days=7)
+    today = 1000
+    aggregator.record(1, today, NATURE, today)
+    aggregator.record(1, today, NATURE, today)  # same category twice counts once
+    aggregator.record(1, today - 3, SERVICE, today)
+    aggregator.record(2, today - 6, NATURE | SERVICE, today)
+    aggregator.record(3, today - 7, NATURE, today)  # already outside the window
+
+    stats = aggregator.get_stats(today)
+    assert stats.total_users_active == 2
+    assert stats.categories_done == {"mindfulness": 0, "nature": 2, "service": 2}
+    assert stats.total_tasks_done == 4
+
+    # Next day: user 2's only day falls out of the window
+    stats = aggregator.get_stats(today + 1)
+    assert stats.total_users_active == 1
+    assert stats.categories_done == {"mindfulness": 0, "nature": 1, "service": 1}
+
+
+@pytest.mark.asyncio
+async def test_aggregates_match_sql_after_rebuild_and_writes(db):
+    for user_id in (1, 2):
+        await UserRepository.add_user_if_not_exists(user_id, "Алан")
+    await ActivityRepository.log_daily_activity(1, "nature")
+    await community_aggregator.rebuild()
+    await ActivityRepository.log_daily_activity(1, "service")
+    await ActivityRepository.log_daily_activity(2, "nature")
+
+    @query_budget(0)
+    async def weekly():
+        return await StatsRepository.get_group_weekly_stats()
+
+    in_memory = await weekly()
+    community_aggregator.reset()
+    assert in_memory == await StatsRepository.get_group_weekly_stats()
+    assert in_memory.total_users_active == 2
+    assert in_memory.total_tasks_done == 3
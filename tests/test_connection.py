@@ -0,0 +1,75 @@
+"""
+Tests for database connection pooling.
+"""
+import asyncio
+
+import pytest
+
+from src.database.connection import DatabaseManager
+from src.database.instrumentation import query_budget
+
+
+@pytest.mark.asyncio
+async def test_reader_pool_is_bounded_and_separate_from_writer(tmp_path):
+    """Readers are read-only, bounded by pool size and never the writer connection."""
+    manager = DatabaseManager(str(tmp_path / "pool.db"), pool_size=2, timeout=5)
+    try:
+        async with manager.get_cursor() as cursor:
+            await cursor.execute("CREATE TABLE t (x INTEGER)")
+            await cursor.execute("INSERT INTO t VALUES (1)")
+
+        writer = await manager.get_connection()
+        seen = set()
+
+        async def read():
+            async with manager.get_cursor(readonly=True) as cursor:
+                seen.add(id(cursor.connection))
+                await cursor.execute("SELECT COUNT(*) FROM t")
+                assert (await cursor.fetchone())[0] == 1
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(read() for _ in range(6)))
+
+        assert id(writer) not in seen
+        assert len(seen) <= 2
+        stats = manager.get_pool_stats()
+        assert stats["readers_open"] == 2
+        assert stats["reader"]["acquisitions"] == 6
+        assert stats["reader"]["waits"] > 0
+
+        async with manager.get_cursor(readonly=True) as cursor:
+            with pytest.raises(Exception):
+                await cursor.execute("INSERT INTO t VALUES (2)")
+    finally:
+        await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_traced_with_plan_and_handler(tmp_path):
+    """Statements over the threshold land in the ring buffer, rate limited, with their plan."""
+    settings = {"threshold_ms": 0, "buffer_size": 10, "max_per_minute": 3, "explain": True}
+    manager = DatabaseManager(str(tmp_path / "trace.db"), trace=True, slow_query_settings=settings)
+
+    @query_budget(10)
+    async def handle_stats():
+        async with manager.get_cursor(readonly=True) as cursor:
+            await cursor.execute("SELECT COUNT(*) FROM t WHERE x > ?", (1,))
+
+    try:
+        async with manager.get_cursor(trace=False) as cursor:
+            await cursor.execute("CREATE TABLE t (x INTEGER)")
+        await handle_stats()
+        async with manager.get_cursor() as cursor:
+            for value in range(5):
+                await cursor.execute("INSERT INTO t VALUES (?)", (value,))
+        await manager.slow_queries.drain()
+
+        entries = manager.slow_queries.get_entries()
+        assert len(entries) == 3
+        assert entries[0].handler == "handle_stats"
+        assert entries[0].param_shapes == ("int",)
+        assert entries[0].plan == ["SCAN t"]
+        assert entries[1].handler is None
+        assert manager.slow_queries.get_stats()["dropped"] == 3
+    finally:
+        await manager.close()
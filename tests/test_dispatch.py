@@ -0,0 +1,119 @@
+"""
+Tests for per-user update lanes.
+"""
+import asyncio
+
+import pytest
+import pytest_asyncio
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message, Update
+
+from src.bot.dispatch import UserLaneMiddleware, register_before_fsm
+
+
+class Diary(StatesGroup):
+    waiting_for_entry = State()
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Алан"},
+        },
+    })
+
+
+@pytest_asyncio.fixture
+async def bot():
+    bot = Bot("123456:TEST-TOKEN")
+    yield bot
+    await bot.session.close()
+
+
+def make_dispatcher(max_concurrency: int = 64):
+    dp = Dispatcher()
+    lanes = UserLaneMiddleware({"max_concurrency": max_concurrency})
+    register_before_fsm(dp, lanes)
+    return dp, lanes
+
+
+async def feed_concurrently(dp, bot, updates):
+    # Like polling with handle_as_tasks: one task per update, created in arrival order
+    await asyncio.gather(*(asyncio.create_task(dp.feed_update(bot, update)) for update in updates))
+
+
+def test_lanes_run_before_fsm_context():
+    dp, lanes = make_dispatcher()
+    names = [type(m).__name__ for m in dp.update.outer_middleware]
+    assert names.index("UserLaneMiddleware") == names.index("FSMContextMiddleware") - 1
+    assert names.index("UserContextMiddleware") < names.index("UserLaneMiddleware")
+
+
+@pytest.mark.asyncio
+async def test_one_users_updates_are_ordered_and_never_overlap(bot):
+    dp, lanes = make_dispatcher()
+    log = []
+
+    @dp.message()
+    async def handler(message: Message):
+        log.append(("start", message.text))
+        # Earlier updates are slower: without lanes they would finish last
+        await asyncio.sleep(0.05 - 0.01 * int(message.text))
+        log.append(("end", message.text))
+
+    await feed_concurrently(dp, bot, [make_update(i, 1, str(i)) for i in range(4)])
+    assert log == [(event, str(i)) for i in range(4) for event in ("start", "end")]
+    stats = lanes.get_stats()
+    assert stats["max_backlog_seen"] == 3 and stats["lanes"] == 0 and stats["processed"] == 4
+
+
+@pytest.mark.asyncio
+async def test_users_run_in_parallel_within_the_limit(bot):
+    dp, lanes = make_dispatcher(max_concurrency=3)
+    running = []
+    peak = []
+
+    @dp.message()
+    async def handler(message: Message):
+        running.append(message.from_user.id)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.remove(message.from_user.id)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await feed_concurrently(dp, bot, [make_update(i, user_id, "hi") for i, user_id in enumerate(range(100, 106))])
+    elapsed = loop.time() - started
+    # Six users, three at a time: two rounds, not six
+    assert max(peak) == 3
+    assert 0.1 <= elapsed < 0.25
+    assert lanes.get_stats()["wait_p99_ms"] >= 40
+
+
+@pytest.mark.asyncio
+async def test_state_set_by_one_update_is_seen_by_the_next(bot):
+    dp, lanes = make_dispatcher()
+    saved = []
+
+    @dp.message(F.text == "✍️ Дневник")
+    async def start_entry(message: Message, state: FSMContext):
+        await asyncio.sleep(0.02)
+        await state.set_state(Diary.waiting_for_entry)
+
+    @dp.message(Diary.waiting_for_entry)
+    async def save_entry(message: Message, state: FSMContext):
+        saved.append(message.text)
+        await state.clear()
+
+    @dp.message(StateFilter(None))
+    async def fallback(message: Message):
+        saved.append(f"lost: {message.text}")
+
+    await feed_concurrently(dp, bot, [make_update(1, 1, "✍️ Дневник"), make_update(2, 1, "Спасибо за день")])
+    assert saved == ["Спасибо за день"]
@@ -0,0 +1,161 @@
+"""
+Tests for the SQLite-backed FSM storage.
+"""
+import asyncio
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from src.bot.fsm_storage import SQLiteStorage, key_to_str
+
+
+class Diary(StatesGroup):
+    waiting_for_entry = State()
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_800_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+DEFAULTS = {
+    "ttl_seconds": 3600, "cache_size": 100, "flush_interval_ms": 10_000,
+    "flush_batch_size": 100, "purge_interval_minutes": 60,
+}
+
+
+@pytest.fixture
+def make_storage(make_settings):
+    def factory(clock=None, **overrides) -> SQLiteStorage:
+        return SQLiteStorage(settings=make_settings(DEFAULTS, **overrides), clock=clock or FakeClock())
+    return factory
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+
+async def stored_keys(db):
+    async with db.get_cursor(readonly=True) as cursor:
+        await cursor.execute("SELECT storage_key FROM fsm_state ORDER BY storage_key")
+        return [row[0] for row in await cursor.fetchall()]
+
+
+@pytest.mark.asyncio
+async def test_state_survives_restart(db, make_storage):
+    storage = make_storage()
+    await storage.set_state(key(1), Diary.waiting_for_entry)
+    await storage.update_data(key(1), {"draft": "Фарн уæ хæдзары!"})
+    assert await stored_keys(db) == []  # nothing written until the flush
+    await storage.close()
+    assert await stored_keys(db) == [key_to_str(key(1))]
+
+    restarted = make_storage()
+    assert await restarted.get_state(key(1)) == Diary.waiting_for_entry.state
+    assert await restarted.get_data(key(1)) == {"draft": "Фарн уæ хæдзары!"}
+    assert await restarted.get_state(key(2)) is None
+    # Every later lookup, including of users without a state, is served from memory
+    for _ in range(5):
+        await restarted.get_state(key(1))
+        await restarted.get_state(key(2))
+    assert restarted.stats.misses == 2 and restarted.stats.hits == 11
+
+
+@pytest.mark.asyncio
+async def test_cleared_state_deletes_the_row(db, make_storage):
+    storage = make_storage()
+    await storage.set_state(key(1), Diary.waiting_for_entry)
+    assert await storage.flush() == 1
+    await storage.set_state(key(1), None)
+    await storage.set_data(key(1), {})
+    assert await storage.flush() == 1
+    assert await stored_keys(db) == []
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_changes_are_flushed_in_batches(db, make_storage):
+    storage = make_storage(flush_batch_size=5)
+    for user_id in range(5):
+        await storage.set_state(key(user_id), Diary.waiting_for_entry)
+    # A full batch wakes the flusher before the interval is up
+    for _ in range(50):
+        if storage.stats.flushes:
+            break
+        await asyncio.sleep(0.01)
+    assert storage.stats.flushes == 1 and storage.stats.flushed_keys == 5
+    assert len(await stored_keys(db)) == 5
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_idle_states_expire(db, make_storage):
+    clock = FakeClock()
+    storage = make_storage(clock, ttl_seconds=60)
+    await storage.set_state(key(1), Diary.waiting_for_entry)
+    await storage.set_state(key(2), Diary.waiting_for_entry)
+    await storage.flush()
+
+    clock.now += 30
+    await storage.set_state(key(2), Diary.waiting_for_entry)
+    await storage.flush()
+    clock.now += 31
+    assert await storage.get_state(key(1)) is None
+    assert await storage.get_state(key(2)) == Diary.waiting_for_entry.state
+    assert await make_storage(clock).get_state(key(1)) is None
+
+    assert await storage.purge_expired() == 1
+    assert await stored_keys(db) == [key_to_str(key(2))]
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_reading_a_state_keeps_it_alive(db, make_storage):
+    clock = FakeClock()
+    storage = make_storage(clock, ttl_seconds=60)
+    await storage.set_state(key(1), Diary.waiting_for_entry)
+    await storage.flush()
+    # A read with most of the TTL left writes nothing
+    await storage.get_state(key(1))
+    assert await storage.flush() == 0
+
+    for _ in range(4):
+        clock.now += 40
+        assert await storage.get_state(key(1)) == Diary.waiting_for_entry.state
+    assert await storage.flush() == 1
+    assert await make_storage(clock).get_state(key(1)) == Diary.waiting_for_entry.state
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_but_keeps_dirty_records(db, make_storage):
+    storage = make_storage(cache_size=3)
+    for user_id in range(5):
+        await storage.set_state(key(user_id), Diary.waiting_for_entry)
+    assert storage.get_stats()["cached"] == 5  # unwritten changes are never evicted
+    await storage.flush()
+    await storage.get_state(key(10))
+    assert storage.get_stats()["cached"] == 3
+    await storage.close()
+    assert len(await stored_keys(db)) == 5
+
+
+@pytest.mark.asyncio
+async def test_unserializable_data_never_blocks_other_users(db, make_storage):
+    storage = make_storage()
+    with pytest.raises(TypeError):
+        await storage.set_data(key(1), {"seen": {1, 2}})
+
+    await storage.set_data(key(1), {"draft": {"lines": []}})
+    await storage.set_state(key(2), Diary.waiting_for_entry)
+    # A nested value changed in place after set_data: only that user's data is lost
+    storage._cache[key_to_str(key(1))].data["draft"]["lines"].append({1, 2})
+    assert await storage.flush() == 1
+    assert await stored_keys(db) == [key_to_str(key(2))]
+    assert storage.get_stats()["dirty"] == 0
+    await storage.close()
+
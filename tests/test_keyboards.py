@@ -0,0 +1,86 @@
+"""
+Tests for the prebuilt keyboard registry.
+"""
+import json
+
+import pytest
+from pydantic import ValidationError
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from src.config.config import ACTIVITY_CATEGORIES, CATEGORY_EMOJI_MAP, CATEGORY_NAMES_MAP
+from src.database.models import mask_to_status, status_to_mask
+from src.utils.keyboards import (
+    GROUP_STATS, MAIN_MENU, KeyboardRegistry, PrebuiltPayloadSession, get_main_menu_keyboard, keyboard_registry
+)
+
+
+def legacy_activity_keyboard(activity_status):
+    """The inline keyboard handle_daily_plan used to build on every call."""
+    inline_kb_buttons = []
+    for cat_code in ACTIVITY_CATEGORIES:
+        emoji = CATEGORY_EMOJI_MAP.get(cat_code, "❓")
+        cat_name = CATEGORY_NAMES_MAP.get(cat_code, cat_code)
+        completed = activity_status.get(cat_code, False)
+        inline_kb_buttons.append(
+            InlineKeyboardButton(
+                text=f"{'✅' if completed else emoji} {cat_name}",
+                callback_data=f"log_activity:{cat_code}"
+            )
+        )
+    return InlineKeyboardMarkup(inline_keyboard=[inline_kb_buttons])
+
+
+@pytest.mark.parametrize("mask", range(1 << len(ACTIVITY_CATEGORIES)))
+def test_activity_keyboards_match_legacy(mask):
+    status = mask_to_status(mask)
+    assert status_to_mask(status) == mask
+    # The registry's markups are frozen subclasses, so compare their content
+    assert keyboard_registry.activity_keyboard(mask).model_dump() == legacy_activity_keyboard(status).model_dump()
+
+
+def test_keyboards_are_shared_and_payloads_match_aiogram():
+    bot = Bot("123456:TEST-TOKEN")
+    plain = AiohttpSession()
+    session = PrebuiltPayloadSession()
+    markups = [get_main_menu_keyboard(), keyboard_registry.get(GROUP_STATS), keyboard_registry.activity_keyboard(5)]
+
+    assert get_main_menu_keyboard() is keyboard_registry.get(MAIN_MENU)
+    for markup in markups:
+        payload = session.prepare_value(markup, bot=bot, files={})
+        assert payload is keyboard_registry.payload_for(markup)
+        assert json.loads(payload) == json.loads(plain.prepare_value(markup, bot=bot, files={}))
+
+    form = session.build_form_data(bot, SendMessage(chat_id=1, text="x", reply_markup=markups[0]))
+    assert keyboard_registry.payload_for(markups[0]) in [field[2] for field in form._fields]
+    # Equal but separately built markups are serialized the normal way
+    assert keyboard_registry.payload_for(legacy_activity_keyboard({})) is None
+
+
+def test_registry_rebuilds_when_categories_change():
+    categories = list(ACTIVITY_CATEGORIES)
+    registry = KeyboardRegistry(categories)
+    first = registry.activity_keyboard(0)
+    assert registry.activity_keyboard(0) is first
+    assert registry.get_stats()["activity"] == 8
+
+    categories.append("learning")
+    keyboard = registry.activity_keyboard(0b1000)
+    assert registry.get_stats() == {"static": 4, "activity": 16, "builds": 2}
+    assert keyboard.inline_keyboard[0][-1].text == "✅ learning"
+    assert registry.payload_for(first) is None
+
+
+def test_prebuilt_keyboards_are_read_only():
+    markup = keyboard_registry.activity_keyboard(0)
+    with pytest.raises(ValidationError):
+        markup.inline_keyboard = []
+    with pytest.raises(ValidationError):
+        markup.inline_keyboard[0][0].text = "changed"
+    with pytest.raises(TypeError):
+        markup.inline_keyboard[0].append(InlineKeyboardButton(text="extra", callback_data="x"))
+    with pytest.raises(TypeError):
+        get_main_menu_keyboard().keyboard[0][0] = None
+    assert isinstance(markup, InlineKeyboardMarkup)
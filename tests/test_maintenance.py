@@ -0,0 +1,39 @@
+"""
+Tests for scheduled database maintenance.
+"""
+import pytest
+
+from src.database.maintenance import DatabaseMaintenance
+
+
+@pytest.mark.asyncio
+async def test_maintenance_frees_pages_and_truncates_wal(db):
+    """Incremental vacuum returns free pages and a big WAL is truncated."""
+    settings = {
+        "wal_truncate_threshold_mb": 0,
+        "quiet_hours_utc": "0-0",
+        "vacuum_pages_per_step": 10,
+        "vacuum_max_steps": 1000,
+    }
+    maintenance = DatabaseMaintenance(db, settings)
+
+    async with db.get_cursor() as cursor:
+        await cursor.execute("PRAGMA auto_vacuum")
+        assert (await cursor.fetchone())[0] == 2
+        await cursor.execute("CREATE TABLE filler (data BLOB)")
+        await cursor.executemany("INSERT INTO filler VALUES (zeroblob(4000))", [()] * 200)
+    async with db.get_cursor() as cursor:
+        await cursor.execute("DELETE FROM filler")
+
+    vacuum = await maintenance.incremental_vacuum(force=True)
+    assert vacuum.pages_freed > 0
+    assert vacuum.details["freelist_remaining"] == 0
+
+    checkpoint = await maintenance.checkpoint()
+    assert checkpoint.details["mode"] == "TRUNCATE"
+    assert checkpoint.pages_freed == checkpoint.details["wal_frames"] > 0
+    assert checkpoint.details["wal_bytes_after"] == 0
+
+    analyze = await maintenance.optimize(analyze=True)
+    assert [run.task for run in maintenance.get_history()] == ["incremental_vacuum", "checkpoint", "analyze"]
+    assert analyze.duration >= 0
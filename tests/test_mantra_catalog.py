@@ -0,0 +1,49 @@
+"""
+Tests for the in-memory mantra catalog.
+"""
+import pytest
+
+from src.data import MANTRAS_DATA
+from src.database.connection import db_manager
+from src.database.instrumentation import query_budget
+from src.database.mantra_catalog import mantra_catalog
+from src.database.repository import MantraRepository
+
+
+@pytest.mark.asyncio
+async def test_random_picks_are_served_from_memory(db):
+    """After the first load, picks and category lists never query the database."""
+    await mantra_catalog.check_for_changes()
+
+    @query_budget(0)
+    async def picks():
+        categories = await MantraRepository.get_categories()
+        assert set(categories) == {m[0] for m in MANTRAS_DATA}
+        for category in categories:
+            assert (await MantraRepository.get_random_mantra_by_category(category)).category == category
+        assert await MantraRepository.get_random_mantra_by_category("нет такой") is not None
+        assert await MantraRepository.get_random_mantra() is not None
+
+    await picks()
+
+
+@pytest.mark.asyncio
+async def test_catalog_reloads_when_table_or_data_changes(db):
+    await mantra_catalog.check_for_changes()
+    version = mantra_catalog.version
+    assert await mantra_catalog.sync_from_data() == 0
+    assert await mantra_catalog.check_for_changes() is False
+
+    # A direct change to the table is picked up by the periodic check
+    async with db_manager.get_cursor() as cursor:
+        await cursor.execute(
+            "INSERT INTO mantras (category, ossetian_text) VALUES ('Новая', 'Ног ныхас')"
+        )
+    assert await mantra_catalog.check_for_changes() is True
+    assert mantra_catalog.version > version
+    assert "Новая" in await MantraRepository.get_categories()
+
+    # Syncing from MANTRAS_DATA removes rows that are no longer in it and reloads
+    assert await mantra_catalog.sync_from_data() == 1
+    assert "Новая" not in await MantraRepository.get_categories()
+    assert mantra_catalog.get_stats()["mantras"] == len({m[1] for m in MANTRAS_DATA})
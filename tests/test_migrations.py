@@ -0,0 +1,91 @@
+"""
+Tests for schema migrations and the query plans they enable.
+"""
+import re
+from datetime import date
+
+import pytest
+import pytest_asyncio
+
+from src.database.connection import DatabaseManager
+from src.database.migrations import MIGRATIONS, run_migrations
+from src.database.queries import query_catalog
+from src.data import MANTRAS_DATA
+
+# The in-memory mantra catalog loads the whole (tiny) table by design; sun-time
+# precomputation walks every user once a day
+ALLOWED_FULL_SCANS = {"mantra_catalog", "distinct_user_locations"}
+
+# A bare "SCAN <table>" without an index is a full-table scan
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@pytest_asyncio.fixture
+async def manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "migrations.db"), pool_size=1)
+    yield manager
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_migrations_are_ordered_and_idempotent(manager):
+    """Running the migrator twice applies every migration exactly once."""
+    latest = max(m.version for m in MIGRATIONS)
+    assert await run_migrations(manager) == latest
+    assert await run_migrations(manager) == latest
+
+    async with manager.get_cursor(readonly=True) as cursor:
+        await cursor.execute("SELECT version FROM schema_version ORDER BY version")
+        assert [row[0] for row in await cursor.fetchall()] == sorted(m.version for m in MIGRATIONS)
+        await cursor.execute("SELECT COUNT(*) FROM mantras")
+        assert (await cursor.fetchone())[0] == len({m[1] for m in MANTRAS_DATA})
+
+
+@pytest.mark.asyncio
+async def test_created_at_migration_tolerates_existing_column(manager):
+    """A users table that already has created_at (e.g. an interrupted run) still migrates."""
+    await run_migrations(manager, [m for m in MIGRATIONS if m.version < 8])
+    async with manager.get_cursor() as cursor:
+        await cursor.execute("ALTER TABLE users ADD COLUMN created_at TIMESTAMP")
+    assert await run_migrations(manager) == max(m.version for m in MIGRATIONS)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", sorted(query_catalog.queries))
+async def test_catalog_queries_use_indexes(manager, name):
+    """No catalog query plan contains a full-table scan."""
+    await run_migrations(manager)
+    sql = query_catalog.get(name).sql
+    async with manager.get_cursor(readonly=True) as cursor:
+        await cursor.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * sql.count("?"))
+        plan = [row[3] for row in await cursor.fetchall()]
+    scans = [detail for detail in plan if FULL_SCAN.match(detail)]
+    if name in ALLOWED_FULL_SCANS:
+        return
+    assert not scans, f"{name} does a full scan: {plan}"
+
+
+@pytest.mark.asyncio
+async def test_day_ordinal_backfill(manager):
+    """Rows written before the day-ordinal columns existed get local-day buckets."""
+    await run_migrations(manager, [m for m in MIGRATIONS if m.version < 4])
+    async with manager.get_cursor() as cursor:
+        await cursor.execute(
+            "INSERT INTO users (user_id, current_phase, timezone) VALUES (1, 'p', 'Asia/Vladivostok')"
+        )
+        await cursor.execute(
+            "INSERT INTO daily_activity (user_id, activity_date, category, completed) "
+            "VALUES (1, '2024-03-01', 'nature', TRUE)"
+        )
+        # 20:00 UTC is already the next day in Vladivostok (UTC+10)
+        await cursor.execute(
+            "INSERT INTO diary_entries (user_id, timestamp, entry_text) "
+            "VALUES (1, '2024-03-01 20:00:00', 'text')"
+        )
+
+    await run_migrations(manager)
+    async with manager.get_cursor(readonly=True) as cursor:
+        await cursor.execute("SELECT day_ordinal FROM daily_activity")
+        assert (await cursor.fetchone())[0] == date(2024, 3, 1).toordinal()
+        await cursor.execute("SELECT day_ordinal FROM diary_entries")
+        assert (await cursor.fetchone())[0] == date(2024, 3, 2).toordinal()
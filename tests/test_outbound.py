@@ -0,0 +1,151 @@
+"""
+Tests for the outbound queue, run against a local fake Bot API server.
+"""
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from src.bot.outbound import OutboundMiddleware, OutboundQueue, Priority, priority
+from src.utils.performance import TokenBucket
+
+
+DEFAULTS = {
+    "chat_rate": 20.0, "chat_burst": 1, "group_rate": 20.0, "group_burst": 1,
+    "max_in_flight": 30, "max_retries": 3, "scan_limit": 256, "drain_timeout": 5.0,
+}
+
+
+class FakeBotAPI:
+    """Minimal Bot API server recording every call; can answer 429 to the next calls."""
+
+    def __init__(self):
+        self.calls = []
+        self.flood_responses = 0
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(self.app)
+
+    async def start(self) -> str:
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        if self.flood_responses:
+            self.flood_responses -= 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        self.calls.append((method, data.get("chat_id"), data.get("text"), time.monotonic()))
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "FarnPathBot"}
+        else:
+            chat_id = int(data["chat_id"])
+            result = {
+                "message_id": len(self.calls), "date": 0, "text": data.get("text"),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            }
+        return web.json_response({"ok": True, "result": result})
+
+
+@pytest_asyncio.fixture
+async def api():
+    server = FakeBotAPI()
+    base_url = await server.start()
+    server.base_url = base_url
+    yield server
+    await server.runner.cleanup()
+
+
+async def make_bot(api, queue):
+    bot = Bot("123456:TEST-TOKEN", session=AiohttpSession(api=TelegramAPIServer.from_base(api.base_url)))
+    bot.session.middleware(OutboundMiddleware(queue))
+    await queue.start()
+    return bot
+
+
+async def shutdown(bot, queue):
+    await queue.close()
+    await bot.session.close()
+
+
+def test_token_bucket_refills_up_to_capacity():
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, capacity=3, clock=lambda: now[0])
+    assert all(bucket.try_acquire() for _ in range(3))
+    assert not bucket.try_acquire()
+    assert bucket.wait_time() == pytest.approx(0.5)
+
+    now[0] = 0.5
+    assert bucket.try_acquire() and not bucket.try_acquire()
+    now[0] = 100.0
+    assert bucket.full and bucket.tokens == 3
+
+
+@pytest.mark.asyncio
+async def test_chats_are_paced_and_ordered(api, make_settings):
+    queue = OutboundQueue(make_settings(DEFAULTS), global_bucket=TokenBucket(1000, 1000))
+    bot = await make_bot(api, queue)
+    await asyncio.gather(*(bot.send_message(chat_id, f"{chat_id}:{i}") for i in range(5) for chat_id in (1, 2)))
+    await shutdown(bot, queue)
+
+    for chat_id in ("1", "2"):
+        calls = [call for call in api.calls if call[1] == chat_id]
+        assert [text for _, _, text, _ in calls] == [f"{chat_id}:{i}" for i in range(5)]
+        # 20 messages/s per chat with no burst: at least 50 ms apart
+        gaps = [b[3] - a[3] for a, b in zip(calls, calls[1:])]
+        assert min(gaps) > 0.04
+    assert queue.stats.sent == 10 and queue.get_stats()["p99_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_replies_overtake_broadcasts(api, make_settings):
+    # 20 messages/s overall: the broadcast backlog has to wait in its lane
+    queue = OutboundQueue(make_settings(DEFAULTS), global_bucket=TokenBucket(20, 1))
+    bot = await make_bot(api, queue)
+    with priority(Priority.BROADCAST):
+        broadcast = [asyncio.create_task(bot.send_message(chat_id, "broadcast")) for chat_id in range(100, 110)]
+    await asyncio.sleep(0.06)
+    assert queue.get_stats()["broadcast_depth"] > 5
+
+    await bot.send_message(1, "reply")
+    await asyncio.gather(*broadcast)
+    await shutdown(bot, queue)
+
+    texts = [text for _, _, text, _ in api.calls]
+    assert texts.index("reply") <= 3
+    assert texts.count("broadcast") == 10
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_and_retries(api, make_settings):
+    queue = OutboundQueue(make_settings(DEFAULTS), global_bucket=TokenBucket(1000, 1000))
+    bot = await make_bot(api, queue)
+    api.flood_responses = 1
+
+    started = time.monotonic()
+    message = await bot.send_message(1, "after flood")
+    assert time.monotonic() - started >= 1.0
+    assert message.text == "after flood"
+    await shutdown(bot, queue)
+    assert queue.stats.retry_after == 1 and queue.stats.retried == 1 and queue.stats.sent == 1
+
+
+@pytest.mark.asyncio
+async def test_calls_without_a_chat_bypass_the_queue(api, make_settings):
+    queue = OutboundQueue(make_settings(DEFAULTS), global_bucket=TokenBucket(1000, 1000))
+    bot = await make_bot(api, queue)
+    me = await bot.get_me()
+    await shutdown(bot, queue)
+    assert me.first_name == "FarnPathBot"
+    assert queue.stats.sent == 0 and [call[0] for call in api.calls] == ["getMe"]
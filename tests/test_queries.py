@@ -0,0 +1,41 @@
+"""
+Tests for the named query catalog.
+"""
+import pytest
+
+from src.database.queries import query_catalog
+from src.database.repository import MantraRepository, UserRepository
+
+
+@pytest.mark.asyncio
+async def test_catalog_records_per_query_metrics(db):
+    """Repository calls are counted, timed and row-counted under their query name."""
+    before = query_catalog.get_stats().get("user_data", {}).get("count", 0)
+    await UserRepository.add_user_if_not_exists(1, "Алан")
+    await UserRepository.get_user_data(2)
+    await UserRepository.get_user_data(3)
+
+    stats = query_catalog.get_stats()
+    assert stats["user_data"]["count"] == before + 2
+    assert stats["user_data"]["p50"] <= stats["user_data"]["p99"]
+    assert stats["upsert_user"]["rows"] >= 1
+
+    mantras = await MantraRepository.get_random_mantras_by_categories(["Экология", "нет такой"])
+    assert mantras[0].category == "Экология"
+    assert mantras[1] is not None
+
+
+@pytest.mark.asyncio
+async def test_catalog_explains_every_query(db):
+    """Every registered statement prepares against the migrated schema."""
+    plans = await query_catalog.explain_all()
+    assert set(plans) == set(query_catalog.queries)
+    assert plans["user_data"] == ["SEARCH users USING INTEGER PRIMARY KEY (rowid=?)"]
+
+
+def test_catalog_rejects_duplicates_and_misuse():
+    """Names are unique and must be registered before use."""
+    with pytest.raises(ValueError):
+        query_catalog.register("user_data", "SELECT 1")
+    with pytest.raises(KeyError):
+        query_catalog.get("no_such_query")
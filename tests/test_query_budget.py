@@ -0,0 +1,122 @@
+"""
+Tests for per-handler query budgets.
+"""
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+
+from src.bot import main
+from src.bot.messages import render_daily_plan
+from src.database import instrumentation
+from src.database.instrumentation import QueryBudgetExceeded, query_budget
+from src.database.models import category_bit
+from src.database.repository import UserRepository
+from src.database.user_cache import user_cache
+from src.utils.keyboards import keyboard_registry
+
+
+def fake_message(text: str = "", user_id: int = 1) -> SimpleNamespace:
+    """Minimal stand-in for aiogram's Message: only what the handlers touch."""
+    return SimpleNamespace(
+        text=text,
+        from_user=SimpleNamespace(id=user_id, first_name="Алан"),
+        location=SimpleNamespace(latitude=43.0, longitude=44.6),
+        answer=AsyncMock(),
+    )
+
+
+@pytest.fixture(autouse=True)
+def strict_budgets(monkeypatch):
+    monkeypatch.setattr(instrumentation, "STRICT_BUDGETS", True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_handler_stats():
+    """Handler accounting is global; start every test from zero."""
+    instrumentation.reset_handler_stats()
+    yield
+    instrumentation.reset_handler_stats()
+
+
+@pytest.mark.asyncio
+async def test_handlers_stay_within_budget(db):
+    """Every handler's real query count fits the budget it declares."""
+    await main.handle_start(fake_message("/start"), AsyncMock())
+    await main.handle_mantras_button(fake_message())
+    await main.handle_daily_plan(fake_message())
+    plan = fake_message()
+    plan.md_text = render_daily_plan(date.today(), "Москва", "04:22", "19:40", None, None, {})
+    plan.edit_text = AsyncMock()
+    callback = SimpleNamespace(
+        data="log_activity:nature", from_user=SimpleNamespace(id=1),
+        message=plan, answer=AsyncMock(),
+    )
+    await main.process_log_activity_callback(callback)
+    await main.process_diary_entry_message(fake_message("Спасибо"), AsyncMock())
+    await main.handle_mydiary(fake_message())
+    await main.handle_user_location(fake_message())
+    await main.handle_stats_button(fake_message())
+
+    stats = instrumentation.get_handler_stats()
+    # Profile cached by /start and mantras in memory: only today's mask is read
+    assert stats["handle_daily_plan"]["max_queries"] == 1
+    assert all(s["over_budget"] == 0 for s in stats.values())
+    # One write unit per tap; the plan is edited in place rather than sent again
+    assert stats["process_log_activity_callback"]["max_queries"] <= 2
+    assert stats["process_log_activity_callback"]["updates"] == 1
+    # The error branch answers with show_alert; success never does
+    callback.answer.assert_awaited_once_with("✅ Природа отмечено!")
+    plan.answer.assert_not_awaited()
+    edited_text = plan.edit_text.await_args.args[0]
+    assert edited_text == render_daily_plan(
+        date.today(), "Москва", "04:22", "19:40", None, None, {"nature": True}
+    )
+    assert plan.edit_text.await_args.kwargs["reply_markup"] is keyboard_registry.activity_keyboard(
+        category_bit("nature")
+    )
+
+
+@pytest.mark.asyncio
+async def test_activity_callback_fits_budget_with_a_cold_cache(db):
+    """After a restart the profile isn't cached: the timezone read still fits the budget."""
+    await main.handle_start(fake_message("/start"), AsyncMock())
+    user_cache.clear()
+    callback = SimpleNamespace(
+        data="log_activity:nature", from_user=SimpleNamespace(id=1),
+        message=None, answer=AsyncMock(),
+    )
+    await main.process_log_activity_callback(callback)
+    stats = instrumentation.get_handler_stats()["process_log_activity_callback"]
+    assert stats["max_queries"] == 3 and stats["over_budget"] == 0
+    callback.answer.assert_awaited_once_with("✅ Природа отмечено!")
+
+
+@pytest.mark.asyncio
+async def test_failed_plan_edit_answers_the_callback_once(db):
+    """The tap is answered once even when the plan can no longer be edited."""
+    await main.handle_start(fake_message("/start"), AsyncMock())
+    plan = fake_message()
+    plan.md_text = render_daily_plan(date.today(), "Москва", "04:22", "19:40", None, None, {})
+    plan.edit_text = AsyncMock(side_effect=TelegramBadRequest(None, "message can't be edited"))
+    callback = SimpleNamespace(
+        data="log_activity:nature", from_user=SimpleNamespace(id=1),
+        message=plan, answer=AsyncMock(),
+    )
+    await main.process_log_activity_callback(callback)
+    plan.edit_text.assert_awaited_once()
+    callback.answer.assert_awaited_once_with("✅ Природа отмечено!")
+
+
+@pytest.mark.asyncio
+async def test_budget_exceeded_is_reported(db):
+    """A handler issuing more queries than declared fails in strict mode."""
+    @query_budget(1)
+    async def chatty_handler():
+        await UserRepository.get_user_data(1)
+        await UserRepository.get_timezone(1)
+
+    with pytest.raises(QueryBudgetExceeded):
+        await chatty_handler()
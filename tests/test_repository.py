@@ -0,0 +1,45 @@
+"""
+Tests for repository read and write paths.
+"""
+from datetime import date
+
+import pytest
+
+from src.database.models import category_bit, mask_to_status
+from src.database.repository import ActivityRepository, StatsRepository, UserRepository
+
+
+@pytest.mark.asyncio
+async def test_activity_history_survives_compaction(db):
+    """Compacting raw activity keeps the per-day bitmask history intact."""
+    assert await UserRepository.add_user_if_not_exists(1, "Алан") is True
+    assert await UserRepository.add_user_if_not_exists(1, "Алан") is False
+    await UserRepository.update_user_location(1, 43.0, 44.6, "Владикавказ", "UTC")
+
+    await ActivityRepository.log_daily_activity(1, "nature")
+    await ActivityRepository.log_daily_activity(1, "service")
+    await ActivityRepository.log_daily_activity(1, "nature")
+    status = await ActivityRepository.get_daily_activity_status(1)
+    assert status == {"mindfulness": False, "nature": True, "service": True}
+
+    removed = await ActivityRepository.compact_activity_history(date.today().toordinal() + 1)
+    assert removed == 2
+
+    stats = await ActivityRepository.get_user_weekly_stats(1)
+    assert stats.days_active == 1
+    assert stats.categories_done == {"mindfulness": 0, "nature": 1, "service": 1}
+    assert stats.tasks_done_total == 2
+
+    group = await StatsRepository.get_group_yearly_stats()
+    assert group.total_users_active == 1
+    assert group.total_tasks_done == 2
+
+
+@pytest.mark.asyncio
+async def test_logging_returns_todays_mask(db):
+    await UserRepository.add_user_if_not_exists(1, "Алан")
+    assert await ActivityRepository.log_daily_activity_and_get_mask(1, "nature") == category_bit("nature")
+    mask = await ActivityRepository.log_daily_activity_and_get_mask(1, "service")
+    assert mask == category_bit("nature") | category_bit("service")
+    assert mask_to_status(mask) == await ActivityRepository.get_daily_activity_status(1)
+    assert await ActivityRepository.log_daily_activity_and_get_mask(1, "unknown") is None
@@ -0,0 +1,70 @@
+"""
+Tests for the analytics snapshot database.
+"""
+import pytest
+
+from src.database.repository import ActivityRepository, StatsRepository, UserRepository
+from src.database.snapshot import AnalyticsSnapshot
+
+
+@pytest.mark.asyncio
+async def test_snapshot_serves_reads_until_stale(db, tmp_path):
+    """Snapshot reads see the data as of the last refresh, within the staleness bound."""
+    snapshot = AnalyticsSnapshot(db, {
+        "snapshot_file": str(tmp_path / "analytics.db"),
+        "max_staleness_seconds": 60,
+        "backup_pages_per_step": 1,
+        "backup_step_sleep_ms": 0,
+    })
+    try:
+        await UserRepository.add_user_if_not_exists(1, "Алан")
+        await ActivityRepository.log_daily_activity(1, "nature")
+        await snapshot.refresh()
+        await ActivityRepository.log_daily_activity(1, "service")
+
+        async with snapshot.get_cursor() as cursor:
+            await cursor.execute("SELECT categories_mask FROM daily_summary")
+            assert (await cursor.fetchone())[0] == 2
+        assert snapshot.get_stats()["fallbacks"] == 0
+
+        snapshot.settings["max_staleness_seconds"] = -1
+        async with snapshot.get_cursor() as cursor:
+            await cursor.execute("SELECT categories_mask FROM daily_summary")
+            assert (await cursor.fetchone())[0] == 6
+        assert snapshot.get_stats()["fallbacks"] == 1
+    finally:
+        await snapshot.close()
+
+
+@pytest.mark.asyncio
+async def test_refresh_swaps_a_self_contained_file(db, tmp_path):
+    """The snapshot has no WAL side files and the previous generation is closed before the swap."""
+    path = tmp_path / "analytics.db"
+    snapshot = AnalyticsSnapshot(db, {
+        "snapshot_file": str(path),
+        "max_staleness_seconds": 60,
+        "backup_pages_per_step": 100,
+        "backup_step_sleep_ms": 0,
+    })
+    try:
+        await UserRepository.add_user_if_not_exists(1, "Алан")
+        await snapshot.refresh()
+        first = snapshot._current
+        async with snapshot.get_cursor() as cursor:
+            await cursor.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "delete"
+        await snapshot.refresh()
+        assert first.closed.is_set() and snapshot._current is not first
+        assert sorted(p.name for p in tmp_path.iterdir() if p.name.startswith("analytics")) == ["analytics.db"]
+    finally:
+        await snapshot.close()
+
+
+@pytest.mark.asyncio
+async def test_group_stats_fall_back_to_live_data(db):
+    """Without a snapshot, community stats are still answered from the live pool."""
+    await UserRepository.add_user_if_not_exists(1, "Алан")
+    await ActivityRepository.log_daily_activity(1, "mindfulness")
+    stats = await StatsRepository.get_group_weekly_stats()
+    assert stats.total_users_active == 1
+    assert stats.categories_done["mindfulness"] == 1
@@ -0,0 +1,64 @@
+"""
+Tests for the vectorized sunrise/sunset calculator, validated against astral.
+"""
+import datetime as dt
+
+import numpy as np
+from astral import Observer
+from astral.sun import sunrise, sunset
+
+from src.utils.solar import sun_events
+
+DATES = [dt.date(2026, 1, 1), dt.date(2026, 3, 20), dt.date(2026, 6, 21),
+         dt.date(2026, 9, 23), dt.date(2026, 11, 5), dt.date(2026, 12, 21)]
+
+
+def astral_event(func, lat, lon, day, offset_minutes):
+    """astral's event time in naive UTC, or the reason it has none."""
+    tz = dt.timezone(dt.timedelta(minutes=offset_minutes))
+    try:
+        return func(Observer(lat, lon), day, tz).astimezone(dt.timezone.utc).replace(tzinfo=None)
+    except ValueError as e:
+        return str(e)
+
+
+def test_matches_astral_on_a_global_grid():
+    lat, lon, day = np.meshgrid(
+        np.arange(-85.0, 86.0, 10.0), np.arange(-180.0, 180.0, 30.0),
+        np.array(DATES, dtype="datetime64[D]"), indexing="ij",
+    )
+    # Local dates in each longitude's nominal zone, so events land on neighbouring UTC days too
+    offsets = (np.round(lon / 15.0) * 60).astype(int)
+    events = sun_events(lat, lon, day, offsets)
+    assert events.sunrise.shape == lat.shape and events.sunrise.dtype == np.dtype("datetime64[s]")
+
+    compared = 0
+    for idx in np.ndindex(lat.shape):
+        for func, times in ((sunrise, events.sunrise), (sunset, events.sunset)):
+            expected = astral_event(func, lat[idx], lon[idx], day[idx].item(), int(offsets[idx]))
+            mine = times[idx]
+            if isinstance(expected, str):
+                assert np.isnat(mine), (idx, expected)
+                assert events.polar_night[idx] == ("below" in expected)
+                assert events.polar_day[idx] == ("above" in expected)
+                continue
+            assert not np.isnat(mine), (idx, expected)
+            assert abs((mine.item() - expected).total_seconds()) < 60
+            compared += 1
+    assert compared > 0.8 * 2 * lat.size
+
+
+def test_polar_day_and_night_are_flagged():
+    events = sun_events(78.22, 15.65, ["2026-12-21", "2026-06-21", "2026-03-20"], 60)
+    assert events.polar_night.tolist() == [True, False, False]
+    assert events.polar_day.tolist() == [False, True, False]
+    assert np.isnat(events.sunrise[:2]).all() and np.isnat(events.sunset[:2]).all()
+    assert events.sunrise[2] < events.sunset[2]
+
+
+def test_scalar_inputs_broadcast():
+    events = sun_events(43.02, 44.68, dt.date(2026, 6, 21), 180)
+    assert events.sunrise.shape == ()
+    local_sunrise = events.sunrise.item() + dt.timedelta(hours=3)
+    assert local_sunrise.date() == dt.date(2026, 6, 21)
+    assert dt.time(4, 0) < local_sunrise.time() < dt.time(4, 45)
@@ -0,0 +1,75 @@
+"""
+Tests for the sun times cache and its daily precomputation.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from src.database.repository import UserRepository
+from src.utils import sun_times
+from src.utils.sun_times import SunTimesService
+from src.utils.utils import get_sun_times
+
+
+@pytest.fixture
+def astral_calls(monkeypatch):
+    """Count calls that reach astral."""
+    calls = []
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return get_sun_times(*args, **kwargs)
+
+    monkeypatch.setattr(sun_times, "get_sun_times", counting)
+    return calls
+
+
+def test_nearby_locations_share_one_calculation(astral_calls):
+    service = SunTimesService()
+    day = date(2026, 6, 21)
+    first = service.get(43.0241, 44.6818, "Europe/Moscow", day)
+    # ~200 m away: same key, no new calculation
+    assert service.get(43.0229, 44.6803, "Europe/Moscow", day) is first
+    assert len(astral_calls) == 1
+    assert first == get_sun_times(43.02, 44.68, "Europe/Moscow", target_date=day)
+
+    service.get(43.0241, 44.6818, "Europe/Moscow", day + timedelta(days=1))
+    service.get(None, None, None, day)
+    assert len(astral_calls) == 3
+    assert service.get_stats()["hits"] == 1
+
+
+def test_polar_night_is_cached_as_empty(astral_calls):
+    service = SunTimesService()
+    times = service.get(78.22, 15.65, "Arctic/Longyearbyen", date(2026, 12, 21))
+    assert times == {"sunrise": None, "sunset": None}
+    service.get(78.22, 15.65, "Arctic/Longyearbyen", date(2026, 12, 21))
+    assert len(astral_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_precompute_covers_every_user_location(db, astral_calls):
+    for user_id, (lat, lon, tz) in enumerate([
+        (43.0241, 44.6818, "Europe/Moscow"),
+        (43.0239, 44.6821, "Europe/Moscow"),
+        (55.7558, 37.6173, "Europe/Moscow"),
+        (-33.8688, 151.2093, "Australia/Sydney"),
+    ], start=1):
+        await UserRepository.add_user_if_not_exists(user_id, "Алан")
+        await UserRepository.update_user_location(user_id, lat, lon, "Город", tz)
+    # A new user starts at the default location (Moscow)
+    await UserRepository.add_user_if_not_exists(5, "Без локации")
+
+    service = SunTimesService()
+    # Three distinct places, two days each
+    assert await service.precompute() == 6
+    assert await service.precompute() == 0
+    calls = len(astral_calls)
+
+    service.get(43.0241, 44.6818, "Europe/Moscow")
+    service.get(-33.8688, 151.2093, "Australia/Sydney")
+    service.get(55.7558, 37.6173, "Europe/Moscow")
+    assert len(astral_calls) == calls
+    assert service.get_stats()["hits"] == 3
+
+    assert service.purge(date.today() + timedelta(days=5)) == 6
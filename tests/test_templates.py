@@ -0,0 +1,69 @@
+"""
+Tests for precompiled MarkdownV2 templates.
+
+Rendered messages must match the string-concatenation builders in
+benchmarks/legacy_messages.py byte for byte.
+"""
+from datetime import date, datetime
+
+import pytest
+
+from benchmarks.legacy_messages import legacy_daily_plan, legacy_diary, legacy_group_stats, legacy_user_stats
+from src.bot import messages
+from src.config.config import ACTIVITY_CATEGORIES
+from src.database.models import DiaryEntry, GroupStats, UserStats
+from src.utils.templates import MarkdownTemplate, Static
+from src.utils.utils import escape_md
+
+
+TRICKY_TEXTS = ["Фарн", "Хорз_уæд! (1+1=2) [ссылка] *жирный* `код` #тег", "a.b-c!d{e}f|g~h>", "\\_уже\\_", ""]
+
+
+@pytest.mark.parametrize("text", TRICKY_TEXTS, ids=range(len(TRICKY_TEXTS)))
+@pytest.mark.parametrize("status", [{}, {"mindfulness": True}, {cat: True for cat in ACTIVITY_CATEGORIES}])
+def test_daily_plan_matches_legacy(text, status):
+    args = (date(2026, 3, 9), text or "Неизвестно", "06:41", "н/д", text or None, None, status)
+    assert messages.render_daily_plan(*args) == legacy_daily_plan(*args)
+    args = (date(2026, 12, 31), "Владикавказ", "08:02", "16:55", "Мæ зæрдæ", text, status)
+    assert messages.render_daily_plan(*args) == legacy_daily_plan(*args)
+
+
+@pytest.mark.parametrize("text", TRICKY_TEXTS, ids=range(len(TRICKY_TEXTS)))
+def test_progress_rings_are_replaced_in_place(text):
+    args = (date(2026, 3, 9), text or "Неизвестно", "06:41", "н/д", text or None, text or None)
+    sent = messages.render_daily_plan(*args, {})
+    done = {"nature": True, "service": True}
+    assert messages.replace_progress_rings(sent, done) == messages.render_daily_plan(*args, done)
+    assert messages.replace_progress_rings(escape_md(text), done) is None
+
+
+@pytest.mark.parametrize("categories_done", [{}, {"nature": 3}, {cat: i for i, cat in enumerate(ACTIVITY_CATEGORIES)}])
+def test_stats_match_legacy(categories_done):
+    user_stats = UserStats(days_active=4, diary_entries=12, tasks_done_total=9, categories_done=categories_done, streak=-1)
+    assert messages.render_user_stats(user_stats) == legacy_user_stats(user_stats)
+    group_stats = GroupStats(total_users_active=1500, total_tasks_done=3.5, categories_done=categories_done)
+    assert messages.render_group_stats(group_stats) == legacy_group_stats(group_stats)
+
+
+@pytest.mark.parametrize("count", [1, 5])
+@pytest.mark.parametrize("text", TRICKY_TEXTS + ["(" * 3000], ids=range(len(TRICKY_TEXTS) + 1))
+def test_diary_matches_legacy(count, text):
+    entries = [
+        DiaryEntry(entry_id=i, user_id=1, timestamp=datetime(2026, 5, i + 1, 7, 30), entry_text=f"{text} {i}")
+        for i in range(count)
+    ]
+    assert messages.render_diary(entries) == legacy_diary(entries)
+
+
+def test_template_fields():
+    template = MarkdownTemplate("*{name}* {{literal}} ", Static("1+1=2 "), "{body!r}")
+    assert template.fields == {"name", "body"}
+    assert template.render(name="a_b", body="_raw_") == "*a\\_b* {literal} 1\\+1\\=2 _raw_"
+    with pytest.raises(KeyError):
+        template.render(name="x")
+
+
+@pytest.mark.parametrize("text", ["{value:>10}", "{value!s}", "{value.attr}", "{0}"])
+def test_template_rejects_unsupported_fields(text):
+    with pytest.raises(ValueError):
+        MarkdownTemplate(text)
@@ -0,0 +1,113 @@
+"""
+Tests for the keyed GCRA rate limiter and the anti-flood middleware.
+"""
+import pytest
+import pytest_asyncio
+from aiogram import Bot, Dispatcher, F
+from aiogram.types import CallbackQuery, Message, Update
+
+from src.bot.throttling import THROTTLED_NOTICE, ThrottlingMiddleware
+from src.utils.performance import KeyedRateLimiter, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_burst_then_steady_rate():
+    clock = FakeClock()
+    limiter = KeyedRateLimiter(rate=2.0, burst=3, clock=clock)
+    assert [limiter.hit("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.hit("a") == pytest.approx(0.5)
+    # Denied hits are not counted
+    assert limiter.hit("a") == pytest.approx(0.5)
+    # Other keys have their own budget
+    assert limiter.hit("b") == 0.0
+
+    clock.now = 0.5
+    assert limiter.hit("a") == 0.0
+    assert limiter.hit("a") > 0
+
+
+def test_idle_keys_are_evicted_and_store_is_bounded():
+    clock = FakeClock()
+    limiter = KeyedRateLimiter(rate=1.0, burst=2, max_keys=3, clock=clock)
+    for user_id in range(10):
+        limiter.hit(user_id)
+    assert len(limiter) == 3
+
+    clock.now = 10.0
+    limiter.hit("fresh")
+    assert len(limiter) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_keeps_its_interface():
+    limiter = RateLimiter(max_calls=5, time_window=1)
+    assert all([await limiter.acquire() for _ in range(5)])
+
+
+def make_message_update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "📊 Статистика",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Алан"},
+        },
+    })
+
+
+def make_callback_update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "chat_instance": "1", "data": "show_group_stats",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Алан"},
+        },
+    })
+
+
+@pytest_asyncio.fixture
+async def bot():
+    bot = Bot("123456:TEST-TOKEN")
+    bot.sent = []
+
+    async def record(make_request, bot_, method):
+        # Nothing leaves the process: record the call and report success
+        bot.sent.append(method)
+        return True
+
+    bot.session.middleware(record)
+    yield bot
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_middleware_drops_excess_updates_before_handlers(bot):
+    handled = []
+    dp = Dispatcher()
+    throttling = ThrottlingMiddleware({"rate": 1.0, "burst": 2, "max_keys": 100})
+    dp.update.outer_middleware(throttling)
+
+    @dp.message()
+    async def on_message(message: Message):
+        handled.append(message.from_user.id)
+
+    @dp.callback_query(F.data == "show_group_stats")
+    async def on_callback(callback_query: CallbackQuery):
+        handled.append(callback_query.data)
+
+    for i in range(5):
+        await dp.feed_update(bot, make_message_update(i, user_id=1))
+    await dp.feed_update(bot, make_message_update(10, user_id=2))
+    assert handled == [1, 1, 2]
+
+    await dp.feed_update(bot, make_callback_update(20, user_id=1))
+    assert handled == [1, 1, 2]
+    assert [method.text for method in bot.sent] == [THROTTLED_NOTICE]
+    assert throttling.get_stats() == {"throttled": 4, "tracked_users": 2}
@@ -0,0 +1,59 @@
+"""
+Tests for the user profile cache.
+"""
+import asyncio
+
+import pytest
+
+from src.database.instrumentation import query_budget
+from src.database.models import User
+from src.database.repository import UserRepository
+from src.database.user_cache import UserProfileCache, user_cache
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_never_reach_the_database(db):
+    """After a write-through, profile reads and location updates stay in memory."""
+    await UserRepository.add_user_if_not_exists(1, "Алан")
+
+    @query_budget(1)
+    async def handler():
+        for _ in range(5):
+            user = await UserRepository.get_user_data(1)
+        assert user.first_name == "Алан"
+        await UserRepository.update_user_location(1, 43.0, 44.6, "Владикавказ", "Europe/Moscow")
+        assert (await UserRepository.get_timezone(1)) == "Europe/Moscow"
+
+    await handler()
+    assert user_cache.get_stats()["hits"] >= 6
+
+    # The cache and the database agree after the update
+    user_cache.clear()
+    assert (await UserRepository.get_user_data(1)).location_city == "Владикавказ"
+
+
+def test_profile_updates_only_touch_cached_users():
+    cache = UserProfileCache(max_size=10, ttl=60)
+    cache.put(User(user_id=1, current_phase="p", timezone="UTC"))
+    cache.update_profile(1, timezone="Europe/Moscow")
+    cache.update_profile(2, timezone="Europe/Moscow")
+    assert cache.get(1).timezone == "Europe/Moscow"
+    assert cache.get(2) is None
+
+
+@pytest.mark.asyncio
+async def test_write_during_load_wins():
+    """A load that started before a write never overwrites the written profile."""
+    cache = UserProfileCache(max_size=10, ttl=60)
+    release = asyncio.Event()
+
+    async def stale_loader():
+        await release.wait()
+        return User(user_id=1, current_phase="p", timezone="UTC")
+
+    load = asyncio.create_task(cache.get_or_load(1, stale_loader))
+    await asyncio.sleep(0)
+    cache.put(User(user_id=1, current_phase="p", timezone="Asia/Tokyo"))
+    release.set()
+    await load
+    assert cache.get(1).timezone == "Asia/Tokyo"
@@ -1,8 +1,19 @@
 """
 Tests for utility functions.
 """
-import pytest
-from src.utils.utils import escape_md, get_sun_times
+import re
+
+from hypothesis import given, strategies as st
+
+from src.utils.utils import _ESCAPE_CHARS, escape_md, get_sun_times
+
+SPECIAL = _ESCAPE_CHARS + "\\"
+
+# Cyrillic (with Ossetian æ), ASCII and every character MarkdownV2 reserves
+md_text = st.text(alphabet=st.sampled_from(
+    "абвгдежзийклмнопрстуфхцчшщъыьэюяАБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯæÆ abcXYZ0123456789,:;?'\"\n🙏"
+    + SPECIAL
+))
 
 
 def test_escape_md():
@@ -10,6 +21,30 @@ def test_escape_md():
     assert escape_md("Hello *world*") == "Hello \\*world\\*"
     assert escape_md("Test [link](url)") == "Test \\[link\\]\\(url\\)"
     assert escape_md("Normal text") == "Normal text"
+    # Consecutive special characters are each escaped
+    assert escape_md("Ура!!") == "Ура\\!\\!"
+    assert escape_md("a\\.") == "a\\\\\\."
+    assert escape_md(-5) == "\\-5"
+
+
+@given(md_text)
+def test_escape_md_matches_per_character_model(text):
+    """Every reserved character, and only those, gets exactly one backslash."""
+    expected = "".join("\\" + ch if ch in SPECIAL else ch for ch in text)
+    assert escape_md(text) == expected
+
+
+@given(md_text)
+def test_escape_md_round_trips(text):
+    """Dropping the escaping backslashes restores the text; nothing reserved is left bare."""
+    escaped = escape_md(text)
+    assert re.sub(r"\\(.)", r"\1", escaped, flags=re.DOTALL) == text
+    assert re.fullmatch(r"(?:\\.|[^" + re.escape(SPECIAL) + r"])*", escaped, flags=re.DOTALL)
+
+
+@given(st.text(alphabet=st.characters(blacklist_characters=SPECIAL)))
+def test_escape_md_fast_path_returns_text_unchanged(text):
+    assert escape_md(text) is text
 
 
 def test_get_sun_times():
@@ -0,0 +1,136 @@
+"""
+Tests for the webhook server, driven by a local fake Telegram client.
+"""
+import asyncio
+
+import aiohttp
+import pytest
+import pytest_asyncio
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+
+from src.bot.webhook import SECRET_HEADER, WebhookServer
+
+SECRET = "test_secret-123"
+
+
+DEFAULTS = {
+    "base_url": "", "path": "/telegram/webhook", "host": "127.0.0.1", "port": 0,
+    "secret_token": SECRET, "queue_size": 100, "workers": 4, "drain_timeout": 5.0,
+    "drop_pending_updates": True,
+}
+
+
+def make_update(update_id: int, text: str = "hi") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Алан"},
+        },
+    }
+
+
+class FakeTelegram:
+    """Posts updates to the webhook the way Telegram does."""
+
+    def __init__(self, server: WebhookServer):
+        self.url = f"http://127.0.0.1:{server.port}{server.settings['path']}"
+        self.session = aiohttp.ClientSession()
+
+    async def post(self, payload, secret: str = SECRET) -> int:
+        headers = {SECRET_HEADER: secret} if secret is not None else {}
+        async with self.session.post(self.url, json=payload, headers=headers) as response:
+            return response.status
+
+
+@pytest_asyncio.fixture
+async def bot():
+    bot = Bot("123456:TEST-TOKEN")
+    yield bot
+    await bot.session.close()
+
+
+async def start_server(bot, handler, settings):
+    dp = Dispatcher()
+    dp.message.register(handler)
+    server = WebhookServer(dp, bot, settings)
+    await server.start(register_webhook=False)
+    return server, FakeTelegram(server)
+
+
+@pytest.mark.asyncio
+async def test_updates_are_acknowledged_and_processed(bot, make_settings):
+    seen = []
+
+    async def handler(message: Message):
+        await asyncio.sleep(0.01)
+        seen.append(message.text)
+
+    server, telegram = await start_server(bot, handler, make_settings(DEFAULTS))
+    statuses = await asyncio.gather(*(telegram.post(make_update(i, f"m{i}")) for i in range(20)))
+    assert statuses == [200] * 20
+
+    await server.stop()
+    await telegram.session.close()
+    assert sorted(seen) == sorted(f"m{i}" for i in range(20))
+    stats = server.get_stats()
+    assert stats["received"] == stats["processed"] == 20
+    assert stats["queue_depth"] == 0 and stats["p99_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_bad_secret_and_malformed_updates(bot, make_settings):
+    seen = []
+
+    async def handler(message: Message):
+        seen.append(message.text)
+
+    server, telegram = await start_server(bot, handler, make_settings(DEFAULTS))
+    assert await telegram.post(make_update(1), secret="wrong") == 401
+    assert await telegram.post(make_update(2), secret=None) == 401
+    # Malformed updates are acknowledged so Telegram does not redeliver them forever
+    assert await telegram.post({"update_id": "x", "message": 5}) == 200
+
+    await server.stop()
+    await telegram.session.close()
+    assert seen == []
+    assert server.stats.rejected == 2 and server.stats.invalid == 1 and server.stats.received == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_answers_503_and_stop_drains(bot, make_settings):
+    release = asyncio.Event()
+    seen = []
+
+    async def handler(message: Message):
+        await release.wait()
+        seen.append(message.text)
+
+    server, telegram = await start_server(bot, handler, make_settings(DEFAULTS, workers=1, queue_size=2))
+    assert await telegram.post(make_update(1)) == 200
+    await asyncio.sleep(0.05)  # the worker takes update 1 and blocks
+    assert await telegram.post(make_update(2)) == 200
+    assert await telegram.post(make_update(3)) == 200
+    assert await telegram.post(make_update(4)) == 503
+    assert server.get_stats()["queue_depth"] == 2
+
+    stopping = asyncio.create_task(server.stop())
+    await asyncio.sleep(0.05)
+    # While draining, new updates are refused so Telegram keeps them for later
+    assert await telegram.post(make_update(5)) == 503
+    assert not stopping.done()
+
+    release.set()
+    await stopping
+    await telegram.session.close()
+    assert len(seen) == 3
+    assert server.stats.overflows == 1 and server.stats.processed == 3
+
+
+@pytest.mark.asyncio
+async def test_start_requires_secret(bot, make_settings):
+    server = WebhookServer(Dispatcher(), bot, make_settings(DEFAULTS, secret_token=""))
+    with pytest.raises(ValueError):
+        await server.start(register_webhook=False)
@@ -0,0 +1,67 @@
+"""
+Tests for the group-commit write queue.
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.database.connection import DatabaseManager
+from src.database.write_queue import GroupCommitWriter
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_group_committed(tmp_path):
+    """Concurrent writes share commits and each caller gets its own result."""
+    manager = DatabaseManager(str(tmp_path / "queue.db"), pool_size=2)
+    writer = GroupCommitWriter(manager, max_batch_size=20, max_delay=0.01)
+    try:
+        async with manager.get_cursor() as cursor:
+            await cursor.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+
+        results = await asyncio.gather(*(
+            writer.execute("INSERT INTO t (x) VALUES (?)", (i,)) for i in range(50)
+        ))
+        assert all(r.rowcount == 1 for r in results)
+
+        stats = writer.get_stats()
+        assert stats["statements"] == 50
+        assert stats["max_batch_size"] == 20
+        assert stats["batches"] < 50
+
+        async with manager.get_cursor(readonly=True) as cursor:
+            await cursor.execute("SELECT COUNT(*) FROM t")
+            assert (await cursor.fetchone())[0] == 50
+    finally:
+        await writer.close()
+        await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_statement_only_fails_its_caller(tmp_path):
+    """A constraint violation rolls back its own unit, not the whole batch."""
+    manager = DatabaseManager(str(tmp_path / "queue.db"), pool_size=1)
+    writer = GroupCommitWriter(manager, max_batch_size=10, max_delay=0.01)
+    try:
+        async with manager.get_cursor() as cursor:
+            await cursor.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+
+        results = await asyncio.gather(
+            writer.execute("INSERT INTO t (x) VALUES (1)"),
+            writer.execute_unit([
+                ("INSERT INTO t (x) VALUES (2)", ()),
+                ("INSERT INTO t (x) VALUES (1)", ()),
+            ]),
+            writer.execute("INSERT INTO t (x) VALUES (3) RETURNING x", fetch=True),
+            return_exceptions=True,
+        )
+        assert results[0].rowcount == 1
+        assert isinstance(results[1], sqlite3.IntegrityError)
+        assert results[2].rows == [(3,)]
+
+        async with manager.get_cursor(readonly=True) as cursor:
+            await cursor.execute("SELECT x FROM t ORDER BY x")
+            assert [row[0] for row in await cursor.fetchall()] == [1, 3]
+    finally:
+        await writer.close()
+        await manager.close()